@@ -7,6 +7,7 @@ from fastapi.security import OAuth2PasswordBearer
 import os
 
 from models import TokenData, UserInDB
+import user_cache
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-2024")
@@ -46,24 +47,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=None) -> User
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    user_id = user_cache.get_token_user_id(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+            user_cache.set_token_user_id(token, user_id, payload.get("exp"))
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except JWTError:
-        raise credentials_exception
+    token_data = TokenData(user_id=user_id)
     
     # Get user from database
     if db is None:
         raise credentials_exception
     
+    cached_user = user_cache.get_user(token_data.user_id)
+    if cached_user is not None:
+        return cached_user
+    
     user = await db.users.find_one({"id": token_data.user_id}, {"_id": 0})
     if user is None:
         raise credentials_exception
     
-    return UserInDB(**user)
+    user_in_db = UserInDB(**user)
+    user_cache.set_user(user_in_db)
+    return user_in_db
 
 
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
@@ -0,0 +1,49 @@
+"""
+Script to add GeoJSON location points to existing users.
+Run this once so users created before location search are found by the
+users.location 2dsphere index.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+from utils import geo_point
+
+load_dotenv(Path(__file__).parent / '.env')
+
+BATCH_SIZE = 500
+
+
+async def backfill_geo_points():
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    query = {
+        "latitude": {"$ne": None},
+        "longitude": {"$ne": None},
+        "location": {"$exists": False}
+    }
+    print(f"📊 Found {await db.users.count_documents(query)} users without a location point")
+    
+    updated = 0
+    batch = []
+    async for user in db.users.find(query, {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}):
+        batch.append(UpdateOne(
+            {"id": user["id"]},
+            {"$set": {"location": geo_point(user["latitude"], user["longitude"])}}
+        ))
+        if len(batch) >= BATCH_SIZE:
+            updated += (await db.users.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.users.bulk_write(batch, ordered=False)).modified_count
+    
+    print(f"✅ Added location points to {updated} users")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(backfill_geo_points())
@@ -0,0 +1,50 @@
+"""
+Background Jobs
+Periodic in-process jobs started with the application and cancelled on shutdown.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+_tasks: List[asyncio.Task] = []
+
+
+def start_periodic(name: str, interval_seconds: float, job: Callable[[], Awaitable]) -> asyncio.Task:
+    """
+    Run `job` every `interval_seconds` until shutdown.
+    
+    A failing run is logged and the job keeps its schedule.
+    """
+    async def runner():
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Background job {name} failed: {str(e)}", exc_info=True)
+
+    task = asyncio.create_task(runner(), name=name)
+    _tasks.append(task)
+    logger.info(f"Started background job {name} (every {interval_seconds}s)")
+    return task
+
+
+def start_loop(name: str, loop: Callable[[], Awaitable]) -> asyncio.Task:
+    """Run a long-lived coroutine that schedules itself until shutdown."""
+    task = asyncio.create_task(loop(), name=name)
+    _tasks.append(task)
+    logger.info(f"Started background loop {name}")
+    return task
+
+
+async def stop_all():
+    """Cancel every background job and wait for them to finish."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
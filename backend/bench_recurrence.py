@@ -0,0 +1,61 @@
+"""
+Benchmark for recurrence.expand().
+Expands a synthetic mix of recurring schedules (every frequency, a few
+timezones, month-end days) and fails if it takes longer than the budget.
+
+    python bench_recurrence.py [schedules] [occurrences] [budget_seconds]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import recurrence
+
+FREQUENCIES = ("daily", "weekly", "biweekly", "monthly")
+TIMEZONES = (None, "Africa/Abidjan", "Africa/Dakar", "Europe/Paris", "America/New_York")
+
+
+def make_schedules(count: int, now: datetime):
+    rng = random.Random(42)
+    schedules = []
+    for _ in range(count):
+        frequency = rng.choice(FREQUENCIES)
+        schedules.append({
+            "frequency": frequency,
+            "next_occurrence": now + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+            "scheduled_time": f"{rng.randrange(24):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+            "day_of_month": rng.choice((1, 15, 28, 29, 30, 31)) if frequency == "monthly" else None,
+            "timezone": rng.choice(TIMEZONES),
+        })
+    return schedules
+
+
+def bench_recurrence(schedule_count: int = 100_000, occurrences: int = 10, budget_seconds: float = 2.0) -> bool:
+    now = datetime.utcnow()
+    schedules = make_schedules(schedule_count, now)
+
+    started = time.perf_counter()
+    expanded = recurrence.expand(schedules, now, occurrences)
+    elapsed = time.perf_counter() - started
+
+    assert expanded.shape == (schedule_count, occurrences)
+    assert (expanded[:, 1:] > expanded[:, :-1]).all(), "occurrences must be increasing"
+
+    print(f"📊 Expanded {schedule_count} schedules x {occurrences} occurrences in {elapsed:.3f}s "
+          f"({schedule_count / elapsed:,.0f} schedules/s)")
+    if elapsed > budget_seconds:
+        print(f"❌ Over the {budget_seconds}s budget")
+        return False
+    print(f"✅ Within the {budget_seconds}s budget")
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ok = bench_recurrence(
+        int(args[0]) if len(args) > 0 else 100_000,
+        int(args[1]) if len(args) > 1 else 10,
+        float(args[2]) if len(args) > 2 else 2.0
+    )
+    sys.exit(0 if ok else 1)
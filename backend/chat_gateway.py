@@ -0,0 +1,106 @@
+"""
+Chat Gateway
+WebSocket endpoint for real-time task chat.
+
+Clients connect to /ws/chat/{task_id}?token=<JWT> (the legacy
+/ws/chat/{task_id}/{user_id} path is also accepted) and join the task's
+room. Messages persisted through this socket or through POST /api/messages
+are fanned out to everyone in the room, and read receipts are pushed as
+"messages_read" events.
+
+Client -> server frames:
+    {"content": "..."}   send a message
+    {"type": "read"}     mark received messages as read
+    {"type": "ping"}     keep-alive, answered with {"type": "pong"}
+
+Server -> client frames:
+    {"type": "new_message", "message": {...}}    message from the other party
+    {"type": "message_sent", "message": {...}}   echo of the user's own message
+    {"type": "messages_read", ...}               read receipt
+    {"type": "error", "detail": "..."}
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from database import get_database
+from message_routes import chat_room, ensure_task_participant, persist_message, mark_messages_read
+from realtime import hub
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["chat"])
+
+
+async def _forward_events(websocket: WebSocket, queue: asyncio.Queue, user_id: str):
+    """Relay room events to the socket, tagging the user's own messages."""
+    while True:
+        event = await queue.get()
+        if event.get("type") == "new_message" and event["message"]["sender_id"] == user_id:
+            event = {**event, "type": "message_sent"}
+        await websocket.send_json(event)
+
+
+@router.websocket("/ws/chat/{task_id}")
+@router.websocket("/ws/chat/{task_id}/{user_id}")
+async def chat_websocket(
+    websocket: WebSocket,
+    task_id: str,
+    user_id: Optional[str] = None,
+    token: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Authenticate, join the task's chat room and relay messages both ways."""
+    from auth import get_current_user as get_user
+
+    await websocket.accept()
+
+    try:
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
+        current_user = await get_user(token, db)
+        if user_id and user_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+        task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+        if not task:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        ensure_task_participant(task, current_user)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    room = chat_room(task_id)
+    queue = hub.subscribe(room)
+    forwarder = asyncio.create_task(_forward_events(websocket, queue, current_user.id))
+    logger.info(f"WebSocket connected: {room} user {current_user.id}")
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+            frame_type = data.get("type", "message")
+
+            if frame_type == "ping":
+                await websocket.send_json({"type": "pong"})
+            elif frame_type == "read":
+                await mark_messages_read(db, task_id, current_user.id)
+            elif frame_type == "message":
+                content = (data.get("content") or "").strip()
+                if not content:
+                    continue
+                try:
+                    await persist_message(db, task, current_user, content)
+                except HTTPException as e:
+                    await websocket.send_json({"type": "error", "detail": e.detail})
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket disconnected: {room} user {current_user.id}")
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+    finally:
+        forwarder.cancel()
+        hub.unsubscribe(room, queue)
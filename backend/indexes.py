@@ -0,0 +1,266 @@
+"""
+Index Management
+Declares the MongoDB indexes every collection needs, builds them idempotently
+and reports drift between the declared and the actual indexes.
+
+Usage:
+    python indexes.py           # build any missing indexes
+    python indexes.py --check   # only report drift, exit 1 if any
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Any
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def _index(name: str, keys: List[tuple], unique: bool = False, **options) -> Dict[str, Any]:
+    """Build a declared index spec."""
+    return {"name": name, "keys": keys, "unique": unique, **options}
+
+
+# Declared indexes per collection. Names are explicit so drift can be
+# detected by name and so renaming an index is a visible change.
+INDEXES: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("email_unique", [("email", ASCENDING)], unique=True),
+        _index("role_city_country", [("role", ASCENDING), ("city", ASCENDING), ("country", ASCENDING)]),
+        _index("role_rating_id", [("role", ASCENDING), ("search.rating", DESCENDING), ("id", ASCENDING)]),
+        _index(
+            "role_available_rating_id",
+            [("role", ASCENDING), ("search.is_available", ASCENDING), ("search.rating", DESCENDING), ("id", ASCENDING)],
+        ),
+        _index(
+            "role_service_available_rating_id",
+            [
+                ("role", ASCENDING),
+                ("search.service_keys", ASCENDING),
+                ("search.is_available", ASCENDING),
+                ("search.rating", DESCENDING),
+                ("id", ASCENDING),
+            ],
+        ),
+        _index(
+            "role_category_available_rating_id",
+            [
+                ("role", ASCENDING),
+                ("search.category_ids", ASCENDING),
+                ("search.is_available", ASCENDING),
+                ("search.rating", DESCENDING),
+                ("id", ASCENDING),
+            ],
+        ),
+        _index("location_2dsphere", [("location", GEOSPHERE)]),
+    ],
+    "tasks": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("client_created", [("client_id", ASCENDING), ("created_at", DESCENDING)]),
+        _index(
+            "tasker_status_paid_completed",
+            [
+                ("assigned_tasker_id", ASCENDING),
+                ("status", ASCENDING),
+                ("is_paid", ASCENDING),
+                ("completed_at", DESCENDING),
+            ],
+        ),
+        _index("status_created", [("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "task_applications": [
+        _index("task_tasker_unique", [("task_id", ASCENDING), ("tasker_id", ASCENDING)], unique=True),
+        _index("tasker_created", [("tasker_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "notifications": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("user_created_id", [("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+        _index("user_unread", [("user_id", ASCENDING), ("is_read", ASCENDING)]),
+    ],
+    "messages": [
+        _index("task_created_id", [("task_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+        _index("receiver_unread", [("receiver_id", ASCENDING), ("is_read", ASCENDING)]),
+    ],
+    "reviews": [
+        _index("task_client_unique", [("task_id", ASCENDING), ("client_id", ASCENDING)], unique=True),
+        _index(
+            "tasker_verified_created",
+            [("tasker_id", ASCENDING), ("verified_booking", ASCENDING), ("created_at", DESCENDING)],
+        ),
+    ],
+    "favorites": [
+        _index("user_tasker_unique", [("user_id", ASCENDING), ("tasker_id", ASCENDING)], unique=True),
+        _index("user_added", [("user_id", ASCENDING), ("added_at", DESCENDING)]),
+    ],
+    "tasker_locations": [
+        _index("tasker_task_unique", [("tasker_id", ASCENDING), ("task_id", ASCENDING)], unique=True),
+    ],
+    "location_tracks": [
+        _index("task_first", [("task_id", ASCENDING), ("first_at", ASCENDING)]),
+    ],
+    "tasker_bookings": [
+        _index("tasker_start_end", [("tasker_id", ASCENDING), ("start", ASCENDING), ("end", ASCENDING)]),
+        _index("start_end", [("start", ASCENDING), ("end", ASCENDING)]),
+        _index(
+            "task_tasker_start_unique",
+            [("task_id", ASCENDING), ("tasker_id", ASCENDING), ("start", ASCENDING)],
+            unique=True,
+        ),
+    ],
+    "payments": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("task", [("task_id", ASCENDING)]),
+    ],
+    "paydunya_payments": [
+        _index("token_unique", [("paydunya_token", ASCENDING)], unique=True),
+        _index("client_created", [("client_id", ASCENDING), ("created_at", DESCENDING)]),
+        _index("tasker_created", [("tasker_id", ASCENDING), ("created_at", DESCENDING)]),
+        _index("status_updated", [("status", ASCENDING), ("updated_at", ASCENDING), ("paydunya_token", ASCENDING)]),
+    ],
+    "paydunya_webhooks": [
+        _index(
+            "dedupe_unique", [("dedupe_key", ASCENDING)], unique=True,
+            partialFilterExpression={"dedupe_key": {"$exists": True}}
+        ),
+        _index("state_created", [("state", ASCENDING), ("created_at", ASCENDING)]),
+        _index("state_retry", [("state", ASCENDING), ("retry_at", ASCENDING)]),
+    ],
+    "coin_transactions": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("user_created", [("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "disputes": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("task", [("task_id", ASCENDING)]),
+        _index("client_created", [("client_id", ASCENDING), ("created_at", DESCENDING)]),
+        _index("tasker_created", [("tasker_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "recurring_tasks": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+        _index("client_next", [("client_id", ASCENDING), ("next_occurrence", ASCENDING)]),
+        _index("tasker_next", [("assigned_tasker_id", ASCENDING), ("next_occurrence", ASCENDING)]),
+        _index("active_next", [("is_active", ASCENDING), ("next_occurrence", ASCENDING)]),
+    ],
+    "outbox": [
+        _index("status_available", [("status", ASCENDING), ("available_at", ASCENDING)]),
+        _index("status_locked", [("status", ASCENDING), ("locked_until", ASCENDING)]),
+        _index("done_ttl", [("done_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "leases": [
+        _index("name_unique", [("name", ASCENDING)], unique=True),
+    ],
+    "job_checkpoints": [
+        _index("name_unique", [("name", ASCENDING)], unique=True),
+    ],
+    "service_categories": [
+        _index("id_unique", [("id", ASCENDING)], unique=True),
+    ],
+    "unread_counters": [
+        _index("user_unique", [("user_id", ASCENDING)], unique=True),
+    ],
+    "ai_chat_history": [
+        _index("user_session_time", [("user_id", ASCENDING), ("session_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+}
+
+
+def _to_index_model(spec: Dict[str, Any]) -> IndexModel:
+    """Convert a declared spec to a pymongo IndexModel."""
+    options = {k: v for k, v in spec.items() if k not in ("keys", "unique")}
+    if spec.get("unique"):
+        options["unique"] = True
+    return IndexModel(spec["keys"], **options)
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """
+    Create every declared index that does not exist yet.
+
+    Index creation is idempotent, so this is safe to run on every startup.
+    A failing index (e.g. duplicates blocking a unique index) is logged and
+    skipped so one bad collection never prevents the API from starting.
+
+    Returns:
+        Mapping of collection name to the index names that failed to build
+    """
+    failures: Dict[str, List[str]] = {}
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            try:
+                await db[collection].create_indexes([_to_index_model(spec)])
+            except OperationFailure as e:
+                logger.error(f"Failed to build index {collection}.{spec['name']}: {str(e)}")
+                failures.setdefault(collection, []).append(spec["name"])
+    logger.info("Database indexes ensured")
+    return failures
+
+
+async def index_drift(db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compare declared indexes against the ones present in the database.
+
+    Returns:
+        Per collection: "missing" (declared, not built), "changed" (same name,
+        different keys or uniqueness) and "extra" (built, not declared).
+        Collections without drift are omitted.
+    """
+    drift: Dict[str, Dict[str, List[str]]] = {}
+    for collection, specs in INDEXES.items():
+        actual = await db[collection].index_information()
+        actual.pop("_id_", None)
+
+        missing, changed = [], []
+        for spec in specs:
+            info = actual.get(spec["name"])
+            if info is None:
+                missing.append(spec["name"])
+                continue
+            same_keys = [tuple(k) for k in info["key"]] == [tuple(k) for k in spec["keys"]]
+            if not same_keys or bool(info.get("unique")) != spec["unique"]:
+                changed.append(spec["name"])
+
+        declared_names = {spec["name"] for spec in specs}
+        extra = [name for name in actual if name not in declared_names]
+
+        if missing or changed or extra:
+            drift[collection] = {"missing": missing, "changed": changed, "extra": extra}
+    return drift
+
+
+async def main(check_only: bool = False) -> int:
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if not check_only:
+            failures = await ensure_indexes(db)
+            for collection, names in failures.items():
+                print(f"❌ {collection}: failed to build {', '.join(names)}")
+
+        drift = await index_drift(db)
+        if not drift:
+            print("✅ All declared indexes are in place")
+            return 0
+
+        for collection, report in drift.items():
+            for kind, names in report.items():
+                if names:
+                    print(f"⚠️  {collection}: {kind} {', '.join(names)}")
+        return 1
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(check_only="--check" in sys.argv)))
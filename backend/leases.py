@@ -0,0 +1,52 @@
+"""
+Leases
+Named, expiring leader leases in the leases collection, so a job that must
+run on only one replica at a time (e.g. the recurring task scheduler) can be
+started on every worker.
+
+A lease is held by one owner until it expires; the holder renews it well
+before then. If the holder dies, another worker takes over once the lease
+has expired.
+"""
+
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease(db: AsyncIOMotorDatabase, name: str, ttl_seconds: float, owner: str = WORKER_ID) -> bool:
+    """
+    Take or renew a lease.
+
+    Returns:
+        True if `owner` holds the lease for the next ttl_seconds
+    """
+    now = datetime.utcnow()
+    try:
+        await db.leases.update_one(
+            {"name": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds), "renewed_at": now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Held by someone else and not expired: the upsert hit the unique name
+        return False
+    return True
+
+
+async def release_lease(db: AsyncIOMotorDatabase, name: str, owner: str = WORKER_ID):
+    """Give a lease up so another worker can take it over immediately."""
+    await db.leases.update_one(
+        {"name": name, "owner": owner},
+        {"$set": {"expires_at": datetime.utcnow()}}
+    )
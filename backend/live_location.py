@@ -0,0 +1,236 @@
+"""
+Live Location Store
+In-memory latest GPS fix per task, fed by the tasker location endpoints.
+
+Updates are accepted at full rate and only touch memory: each fix gets a
+per-task sequence number and the task is marked dirty. flush() runs on an
+interval and writes the latest fix of every dirty task in one bulk write per
+collection (tasks.current_* and tasker_locations), so a tasker sending a
+fix every 5 seconds costs one write per flush interval instead of one per
+fix. Reads (tracking status, tasker location) are served from memory.
+
+Every accepted fix is also buffered for the task's location track and
+appended by the same flush (see location_tracks), so coalescing the latest
+position never loses the route.
+
+The task fields the endpoints check on every fix (participants, job
+coordinates, is_tracking) are cached for TASK_CACHE_TTL_SECONDS and dropped
+whenever tracking starts or stops or the task is (re)assigned.
+
+Like the realtime hub this state is per process; with several workers a
+task's fixes must be routed to the same worker (sticky sessions).
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from cachetools import TTLCache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+import location_tracks
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LIVE_LOCATION_FLUSH_SECONDS", "5"))
+TASK_CACHE_TTL_SECONDS = int(os.getenv("LIVE_LOCATION_TASK_CACHE_TTL_SECONDS", "60"))
+TASK_CACHE_MAX_SIZE = 10000
+IDLE_FIX_SECONDS = 3600  # Fixes not updated for this long are dropped from memory
+MAX_PENDING_TRACK_POINTS = 1000  # Per task, bounds memory while MongoDB is unreachable
+
+# Task fields needed to authorize and enrich a fix
+TASK_FIELDS = {
+    "_id": 0,
+    "id": 1,
+    "client_id": 1,
+    "assigned_tasker_id": 1,
+    "latitude": 1,
+    "longitude": 1,
+    "city": 1,
+    "is_tracking": 1,
+    "tracking_started_at": 1,
+    "current_latitude": 1,
+    "current_longitude": 1,
+    "last_location_update": 1,
+}
+
+
+class LiveLocationStore:
+    """Latest fix per task plus the set of tasks not yet written to MongoDB."""
+
+    def __init__(self):
+        self._fixes: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._track_points: Dict[str, List[list]] = {}
+        self._track_taskers: Dict[str, str] = {}
+        self._tasks: TTLCache = TTLCache(maxsize=TASK_CACHE_MAX_SIZE, ttl=TASK_CACHE_TTL_SECONDS)
+        self._flush_lock = asyncio.Lock()
+        self.received = 0
+        self.stale = 0
+        self.written = 0
+
+    async def get_task(self, db: AsyncIOMotorDatabase, task_id: str) -> Optional[Dict[str, Any]]:
+        """Cached tracking view of a task, or None if it does not exist."""
+        task = self._tasks.get(task_id)
+        if task is None:
+            task = await db.tasks.find_one({"id": task_id}, TASK_FIELDS)
+            if task is None:
+                return None
+            self._tasks[task_id] = task
+        return task
+
+    def forget_task(self, task_id: str):
+        """Drop the cached task view, e.g. after tracking started or stopped."""
+        self._tasks.pop(task_id, None)
+
+    def update(
+        self,
+        task_id: str,
+        tasker_id: str,
+        latitude: float,
+        longitude: float,
+        recorded_at: Optional[datetime] = None,
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """
+        Record a fix and return the task's latest fix.
+
+        A fix recorded before the current one (late delivery on a flaky
+        connection) is ignored and the current fix is returned unchanged.
+        """
+        self.received += 1
+        now = datetime.utcnow()
+        recorded_at = recorded_at or now
+        current = self._fixes.get(task_id)
+        if current is not None and recorded_at < current["recorded_at"]:
+            self.stale += 1
+            return current
+
+        fix = {
+            "task_id": task_id,
+            "tasker_id": tasker_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "recorded_at": recorded_at,
+            "received_at": now,
+            "seq": (current["seq"] + 1) if current else 1,
+            **extra,
+        }
+        self._fixes[task_id] = fix
+        self._dirty.add(task_id)
+
+        pending = self._track_points.setdefault(task_id, [])
+        pending.append([latitude, longitude, recorded_at])
+        if len(pending) > MAX_PENDING_TRACK_POINTS:
+            del pending[0]
+        self._track_taskers[task_id] = tasker_id
+        return fix
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Latest fix of a task, if one was received by this process."""
+        return self._fixes.get(task_id)
+
+    def pending_track(self, task_id: str) -> List[list]:
+        """Track points of a task received but not flushed yet."""
+        return list(self._track_points.get(task_id, []))
+
+    def discard(self, task_id: str):
+        """Forget a task's latest fix without writing it (tracking stopped); its track points are still written."""
+        self._fixes.pop(task_id, None)
+        self._dirty.discard(task_id)
+        self.forget_task(task_id)
+
+    async def flush(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Write the latest fix of every dirty task.
+
+        Returns:
+            Number of tasks written
+        """
+        async with self._flush_lock:
+            await self._flush_tracks(db)
+            if not self._dirty:
+                return 0
+            batch = [self._fixes[task_id] for task_id in self._dirty if task_id in self._fixes]
+            self._dirty = set()
+
+            task_updates = []
+            location_upserts = []
+            for fix in batch:
+                task_updates.append(UpdateOne(
+                    {"id": fix["task_id"], "is_tracking": True},
+                    {"$set": {
+                        "current_latitude": fix["latitude"],
+                        "current_longitude": fix["longitude"],
+                        "last_location_update": fix["recorded_at"],
+                        "location_seq": fix["seq"]
+                    }}
+                ))
+                location_upserts.append(UpdateOne(
+                    {"tasker_id": fix["tasker_id"], "task_id": fix["task_id"]},
+                    {
+                        "$set": {
+                            "latitude": fix["latitude"],
+                            "longitude": fix["longitude"],
+                            "timestamp": fix["recorded_at"],
+                            "is_en_route": True,
+                            "estimated_arrival_minutes": fix.get("eta_minutes"),
+                            "seq": fix["seq"]
+                        },
+                        "$setOnInsert": {"id": str(uuid.uuid4())}
+                    },
+                    upsert=True
+                ))
+
+            try:
+                await db.tasks.bulk_write(task_updates, ordered=False)
+                await db.tasker_locations.bulk_write(location_upserts, ordered=False)
+            except Exception:
+                # Retry these tasks on the next flush
+                self._dirty.update(fix["task_id"] for fix in batch)
+                raise
+
+            self.written += len(batch)
+            self._evict_idle()
+            return len(batch)
+
+    async def _flush_tracks(self, db: AsyncIOMotorDatabase):
+        """Append buffered fixes to the location tracks."""
+        if not self._track_points:
+            return
+        pending, taskers = self._track_points, self._track_taskers
+        self._track_points, self._track_taskers = {}, {}
+        try:
+            await location_tracks.append_points(
+                db, [(task_id, taskers[task_id], points) for task_id, points in pending.items()]
+            )
+        except Exception:
+            # Put the points back ahead of anything received meanwhile
+            for task_id, points in pending.items():
+                merged = points + self._track_points.get(task_id, [])
+                self._track_points[task_id] = merged[-MAX_PENDING_TRACK_POINTS:]
+                self._track_taskers.setdefault(task_id, taskers[task_id])
+            raise
+
+    def _evict_idle(self):
+        """Drop written fixes of tasks that stopped sending without stopping tracking."""
+        cutoff = datetime.utcnow() - timedelta(seconds=IDLE_FIX_SECONDS)
+        for task_id in [t for t, fix in self._fixes.items() if fix["received_at"] < cutoff and t not in self._dirty]:
+            del self._fixes[task_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tasks": len(self._fixes),
+            "dirty": len(self._dirty),
+            "pending_track_points": sum(len(points) for points in self._track_points.values()),
+            "received": self.received,
+            "stale": self.stale,
+            "written": self.written,
+        }
+
+
+live_locations = LiveLocationStore()
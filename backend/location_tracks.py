@@ -0,0 +1,149 @@
+"""
+Location Tracks
+Every GPS fix of a tracked task, stored as bucketed documents so a route can
+be replayed and measured after the fact.
+
+    location_tracks {
+        task_id, tasker_id,
+        points: [[latitude, longitude, recorded_at], ...]   in recorded order
+        count, first_at, last_at
+    }
+
+Fixes are appended by the live location flush, one $push per task per
+flush, into the task's open bucket; once a bucket holds BUCKET_SIZE points
+the next flush starts a new one. A job with thousands of fixes is therefore
+a handful of documents, each well under the 16 MB document limit, read back
+with one indexed query.
+
+Reads are simplified server-side with Douglas-Peucker and returned as an
+encoded polyline (precision 5, the format Mapbox and Google decode), so the
+payload stays small however long the job ran.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SIZE = 500
+DEFAULT_TOLERANCE_M = 10.0
+EARTH_RADIUS_M = 6371000
+
+Point = Sequence[Any]  # [latitude, longitude, recorded_at]
+
+
+async def append_points(db: AsyncIOMotorDatabase, tracks: Iterable[Tuple[str, str, List[list]]]) -> int:
+    """
+    Append fixes to their tasks' open buckets.
+
+    Args:
+        tracks: (task_id, tasker_id, points) per task, points in recorded order
+
+    Returns:
+        Number of points written
+    """
+    operations = []
+    written = 0
+    for task_id, tasker_id, points in tracks:
+        if not points:
+            continue
+        operations.append(UpdateOne(
+            {"task_id": task_id, "count": {"$lt": BUCKET_SIZE}},
+            {
+                "$push": {"points": {"$each": points}},
+                "$inc": {"count": len(points)},
+                "$min": {"first_at": points[0][2]},
+                "$max": {"last_at": points[-1][2]},
+                "$setOnInsert": {"tasker_id": tasker_id}
+            },
+            upsert=True
+        ))
+        written += len(points)
+
+    if operations:
+        await db.location_tracks.bulk_write(operations, ordered=False)
+    return written
+
+
+async def load_track(db: AsyncIOMotorDatabase, task_id: str) -> List[Point]:
+    """All stored fixes of a task, oldest first."""
+    points: List[Point] = []
+    async for bucket in db.location_tracks.find(
+        {"task_id": task_id}, {"_id": 0, "points": 1}
+    ).sort("first_at", 1):
+        points.extend(bucket["points"])
+    return points
+
+
+def _to_xy(points: Sequence[Point]) -> np.ndarray:
+    """Project to metres on a local equirectangular plane (fine at city scale)."""
+    coords = np.radians(np.asarray([(p[0], p[1]) for p in points], dtype=np.float64))
+    cos_lat = np.cos(coords[0, 0])
+    return np.column_stack((coords[:, 1] * EARTH_RADIUS_M * cos_lat, coords[:, 0] * EARTH_RADIUS_M))
+
+
+def _segment_distances(xy: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance from each row of xy to the segment a-b, in the projection's units."""
+    ab = b - a
+    length_sq = float(ab @ ab)
+    if length_sq == 0:
+        return np.hypot(*(xy - a).T)
+    t = np.clip((xy - a) @ ab / length_sq, 0.0, 1.0)
+    return np.hypot(*(xy - (a + t[:, np.newaxis] * ab)).T)
+
+
+def simplify_track(points: Sequence[Point], tolerance_m: float = DEFAULT_TOLERANCE_M) -> List[Point]:
+    """
+    Douglas-Peucker simplification.
+
+    Keeps the first and last fix and every fix that deviates more than
+    tolerance_m from the simplified line. Iterative, so long tracks cannot
+    hit the recursion limit.
+    """
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+
+    xy = _to_xy(points)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(xy[start + 1:end], xy[start], xy[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            farthest += start + 1
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _encode_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def encode_polyline(points: Sequence[Point], precision: int = 5) -> str:
+    """Encode [latitude, longitude, ...] points with the encoded polyline algorithm."""
+    factor = 10 ** precision
+    encoded = []
+    prev_lat = prev_lng = 0
+    for point in points:
+        lat, lng = round(point[0] * factor), round(point[1] * factor)
+        encoded.append(_encode_value(lat - prev_lat))
+        encoded.append(_encode_value(lng - prev_lng))
+        prev_lat, prev_lng = lat, lng
+    return "".join(encoded)
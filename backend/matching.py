@@ -0,0 +1,284 @@
+"""
+Tasker Matching
+Ranks available taskers for a booking request (category, location, date)
+from an in-memory candidate index, so a match costs no database reads.
+
+The index holds one NumPy feature table per service category, built from
+the precomputed tasker search document (see tasker_search / tasker_stats):
+home location, travel reach, rating, review count, completion rate, the
+tasker's price in that category, service keys and weekly availability.
+It is rebuilt every MATCH_INDEX_REFRESH_SECONDS and, when a tasker profile
+changes, on the next match (at most every MATCH_INDEX_MIN_REBUILD_SECONDS).
+
+A candidate qualifies when the job is within its max_travel_distance (and
+radius_km, if given), it offers the subcategory and it works on the job's
+weekday and time. Qualifying taskers are scored in [0, 1]:
+
+    distance     1 - distance / reach
+    rating       Bayesian average (PRIOR_RATING, PRIOR_REVIEWS) / 5
+    completion   (completed + 1) / (assigned + 2)
+    price        cheapest candidate 1, most expensive 0
+
+weighted by MATCH_WEIGHTS. Like the other in-process caches the index is
+per worker.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils import calculate_eta_batch, haversine_km
+
+logger = logging.getLogger(__name__)
+
+MATCH_INDEX_REFRESH_SECONDS = int(os.getenv("MATCH_INDEX_REFRESH_SECONDS", "60"))
+MATCH_INDEX_MIN_REBUILD_SECONDS = 5
+DEFAULT_MAX_TRAVEL_KM = 50.0  # Matches TaskerProfile.max_travel_distance default
+PRIOR_RATING = 4.0
+PRIOR_REVIEWS = 5
+
+MATCH_WEIGHTS = {
+    "distance": 0.35,
+    "rating": 0.30,
+    "completion": 0.15,
+    "price": 0.20,
+}
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Feature fields read from the user document
+CANDIDATE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "location": 1,
+    "tasker_profile.max_travel_distance": 1,
+    "tasker_profile.hourly_rate": 1,
+    "tasker_profile.total_tasks": 1,
+    "tasker_profile.availability": 1,
+    "search": 1,
+}
+
+Availability = Optional[List[List[Tuple[int, int]]]]  # Minute ranges per weekday, None = any time
+
+
+def _parse_minutes(value: str) -> int:
+    hours, _, minutes = value.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def parse_availability(availability: Optional[Dict[str, Any]]) -> Availability:
+    """
+    Convert {"monday": ["9:00-17:00"], ...} to minute ranges per weekday.
+
+    An empty or unreadable schedule means the tasker never restricted their
+    hours, so they count as available any time.
+    """
+    if not availability:
+        return None
+    week: List[List[Tuple[int, int]]] = []
+    try:
+        for day in WEEKDAYS:
+            ranges = availability.get(day) or []
+            if isinstance(ranges, str):
+                ranges = [ranges]
+            day_ranges = []
+            for item in ranges:
+                start, _, end = str(item).partition("-")
+                day_ranges.append((_parse_minutes(start), _parse_minutes(end) if end else 24 * 60))
+            week.append(day_ranges)
+    except (ValueError, AttributeError):
+        return None
+    return week if any(week) else None
+
+
+def is_available_at(availability: Availability, when: datetime) -> bool:
+    """Whether a parsed schedule covers `when` (a date at midnight only checks the weekday)."""
+    if availability is None:
+        return True
+    ranges = availability[when.weekday()]
+    if not ranges:
+        return False
+    minute = when.hour * 60 + when.minute
+    if minute == 0:
+        return True
+    return any(start <= minute < end for start, end in ranges)
+
+
+class _CategoryCandidates:
+    """Column-oriented features of the taskers offering one category."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.ids = [row["id"] for row in rows]
+        self.service_keys = [row["service_keys"] for row in rows]
+        self.availability = [row["availability"] for row in rows]
+        for name in ("latitude", "longitude", "reach_km", "rating", "reviews", "completion", "price"):
+            setattr(self, name, np.array([row[name] for row in rows], dtype=np.float64))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class MatchIndex:
+    """Candidate feature tables per category, rebuilt from MongoDB in the background."""
+
+    def __init__(self):
+        self._categories: Dict[str, _CategoryCandidates] = {}
+        self._built_at: Optional[float] = None
+        self._stale = False
+        self._lock = asyncio.Lock()
+        self.taskers = 0
+        self.matches = 0
+
+    def invalidate(self):
+        """Rebuild before the next match, e.g. after a tasker changed their profile."""
+        self._stale = True
+
+    async def ensure_fresh(self, db: AsyncIOMotorDatabase):
+        """Build the index if it was never built or was invalidated long enough ago."""
+        if self._built_at is None:
+            await self.rebuild(db)
+        elif self._stale and time.monotonic() - self._built_at >= MATCH_INDEX_MIN_REBUILD_SECONDS:
+            await self.rebuild(db)
+
+    async def rebuild(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Reload every available, located tasker.
+
+        Returns:
+            Number of taskers indexed
+        """
+        async with self._lock:
+            rows_by_category: Dict[str, List[Dict[str, Any]]] = {}
+            taskers = 0
+            self._stale = False
+            async for user in db.users.find(
+                {"role": "tasker", "search.is_available": True, "location": {"$ne": None}},
+                CANDIDATE_PROJECTION
+            ):
+                coordinates = (user.get("location") or {}).get("coordinates")
+                if not coordinates:
+                    continue
+                search = user.get("search") or {}
+                profile = user.get("tasker_profile") or {}
+                completed = search.get("completed_tasks") or 0
+                assigned = max(profile.get("total_tasks") or 0, completed)
+                category_prices = search.get("category_prices") or {}
+                base = {
+                    "id": user["id"],
+                    "latitude": coordinates[1],
+                    "longitude": coordinates[0],
+                    "reach_km": profile.get("max_travel_distance") or DEFAULT_MAX_TRAVEL_KM,
+                    "rating": search.get("rating") or 0.0,
+                    "reviews": search.get("total_reviews") or 0,
+                    "completion": (completed + 1) / (assigned + 2),
+                    "service_keys": frozenset(key.lower() for key in search.get("service_keys") or []),
+                    "availability": parse_availability(profile.get("availability")),
+                }
+                fallback_price = search.get("min_price") or profile.get("hourly_rate") or 0.0
+                for category_id in search.get("category_ids") or []:
+                    rows_by_category.setdefault(category_id, []).append(
+                        {**base, "price": category_prices.get(category_id, fallback_price)}
+                    )
+                taskers += 1
+
+            self._categories = {
+                category_id: _CategoryCandidates(rows)
+                for category_id, rows in rows_by_category.items()
+            }
+            self._built_at = time.monotonic()
+            self.taskers = taskers
+        logger.info(f"Rebuilt match index: {taskers} taskers in {len(self._categories)} categories")
+        return taskers
+
+    def match(
+        self,
+        category_id: str,
+        latitude: float,
+        longitude: float,
+        subcategory: Optional[str] = None,
+        task_date: Optional[datetime] = None,
+        radius_km: Optional[float] = None,
+        max_price: Optional[float] = None,
+        city: Optional[str] = None,
+        exclude: Optional[Set[str]] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Top taskers for a job, best first. Taskers in exclude (e.g. already
+        booked at that time) are skipped.
+
+        Returns:
+            Dicts with id, score, distance_km, eta_minutes and price
+        """
+        self.matches += 1
+        candidates = self._categories.get(category_id)
+        if not candidates:
+            return []
+
+        distances = haversine_km(candidates.latitude, candidates.longitude, latitude, longitude)
+        reach = candidates.reach_km if radius_km is None else np.minimum(candidates.reach_km, radius_km)
+        eligible = distances <= reach
+        if max_price is not None:
+            eligible &= candidates.price <= max_price
+
+        indices = np.flatnonzero(eligible)
+        if subcategory or task_date or exclude:
+            wanted = subcategory.lower() if subcategory else None
+            indices = np.array([
+                i for i in indices
+                if (wanted is None or wanted in candidates.service_keys[i])
+                and (task_date is None or is_available_at(candidates.availability[i], task_date))
+                and (not exclude or candidates.ids[i] not in exclude)
+            ], dtype=np.int64)
+        if indices.size == 0:
+            return []
+
+        distance = distances[indices]
+        reviews = candidates.reviews[indices]
+        rating = (candidates.rating[indices] * reviews + PRIOR_RATING * PRIOR_REVIEWS) / (reviews + PRIOR_REVIEWS)
+        price = candidates.price[indices]
+        price_range = price.max() - price.min()
+        price_score = 1.0 - (price - price.min()) / price_range if price_range > 0 else np.ones_like(price)
+
+        score = (
+            MATCH_WEIGHTS["distance"] * (1.0 - distance / np.maximum(reach[indices], 1e-9))
+            + MATCH_WEIGHTS["rating"] * rating / 5.0
+            + MATCH_WEIGHTS["completion"] * candidates.completion[indices]
+            + MATCH_WEIGHTS["price"] * price_score
+        )
+
+        if score.size > limit:
+            top = np.argpartition(-score, limit - 1)[:limit]
+        else:
+            top = np.arange(score.size)
+        top = top[np.lexsort((distance[top], -score[top]))]
+
+        eta = calculate_eta_batch(distance[top], city=city)
+        return [
+            {
+                "id": candidates.ids[indices[i]],
+                "score": round(float(score[i]), 4),
+                "distance_km": round(float(distance[i]), 2),
+                "eta_minutes": int(minutes),
+                "price": float(price[i]),
+            }
+            for i, minutes in zip(top, eta)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "taskers": self.taskers,
+            "categories": len(self._categories),
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+            "stale": self._stale,
+            "matches": self.matches,
+        }
+
+
+match_index = MatchIndex()
@@ -3,14 +3,18 @@ Message Routes
 Handles in-app messaging between clients and taskers.
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Tuple
+import base64
 import logging
 
 from database import get_database
-from models import Message, MessageCreate, UserRole
+from models import Message, MessageCreate, MessagePage, User, UserRole
+from realtime import hub
+import unread_counters
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -18,42 +22,104 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 router = APIRouter(prefix="/api", tags=["messages"])
 
 
-@router.post("/messages", response_model=Message, status_code=status.HTTP_201_CREATED)
-async def send_message(
-    message: MessageCreate,
-    db: AsyncIOMotorDatabase = Depends(get_database),
-    token: str = Depends(oauth2_scheme)
-):
-    """Send a message in a task chat."""
-    from auth import get_current_user as get_user
-    current_user = await get_user(token, db)
-    
-    # Get task to determine receiver
-    task = await db.tasks.find_one({"id": message.task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+def chat_room(task_id: str) -> str:
+    """Realtime hub room for a task's chat."""
+    return f"chat:{task_id}"
+
+
+def ensure_task_participant(task: dict, user: User):
+    """Raise 403 unless the user is the task's client or assigned tasker."""
+    if user.role == UserRole.CLIENT and task["client_id"] != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
+    if user.role == UserRole.TASKER and task.get("assigned_tasker_id") != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+def encode_cursor(message: dict) -> str:
+    """Opaque keyset cursor for a message's (created_at, id) position."""
+    raw = f"{message['created_at'].isoformat()}|{message['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises 400 on a malformed cursor."""
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), message_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def persist_message(db: AsyncIOMotorDatabase, task: dict, sender: User, content: str) -> Message:
+    """Store a chat message and push it to everyone connected to the task's chat."""
     # Determine receiver based on sender role
-    if current_user.role == UserRole.CLIENT:
+    if sender.role == UserRole.CLIENT:
         if not task.get("assigned_tasker_id"):
             raise HTTPException(status_code=400, detail="Task has no assigned tasker")
         receiver_id = task["assigned_tasker_id"]
     else:
         receiver_id = task["client_id"]
     
-    # Create message
     new_message = Message(
-        **message.model_dump(),
-        sender_id=current_user.id,
+        task_id=task["id"],
+        content=content,
+        sender_id=sender.id,
         receiver_id=receiver_id
     )
     
     await db.messages.insert_one(new_message.model_dump())
-    logger.info(f"Message sent in task {message.task_id}")
+    await unread_counters.increment(db, receiver_id, unread_counters.MESSAGES)
+    logger.info(f"Message sent in task {task['id']}")
     
+    hub.publish(chat_room(task["id"]), {
+        "type": "new_message",
+        "message": new_message.model_dump(mode="json")
+    })
     return new_message
 
 
+async def mark_messages_read(db: AsyncIOMotorDatabase, task_id: str, reader_id: str) -> int:
+    """Mark the reader's unread messages in a task as read and push a read receipt."""
+    result = await db.messages.update_many(
+        {
+            "task_id": task_id,
+            "receiver_id": reader_id,
+            "is_read": False
+        },
+        {"$set": {"is_read": True}}
+    )
+    
+    if result.modified_count:
+        await unread_counters.increment(db, reader_id, unread_counters.MESSAGES, -result.modified_count)
+        hub.publish(chat_room(task_id), {
+            "type": "messages_read",
+            "task_id": task_id,
+            "reader_id": reader_id,
+            "count": result.modified_count,
+            "read_at": datetime.utcnow().isoformat()
+        })
+    return result.modified_count
+
+
+@router.post("/messages", response_model=Message, status_code=status.HTTP_201_CREATED)
+async def send_message(
+    message: MessageCreate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
+):
+    """Send a message in a task chat."""
+    from auth import get_current_user as get_user
+    current_user = await get_user(token, db)
+    
+    # Get task to determine receiver
+    task = await db.tasks.find_one({"id": message.task_id}, {"_id": 0})
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return await persist_message(db, task, current_user, message.content)
+
+
 @router.get("/messages/task/{task_id}", response_model=List[Message])
 async def get_task_messages(
     task_id: str,
@@ -69,11 +135,7 @@ async def get_task_messages(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    if current_user.role == UserRole.CLIENT and task["client_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    if current_user.role == UserRole.TASKER and task.get("assigned_tasker_id") != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    ensure_task_participant(task, current_user)
     
     # Get messages
     messages = await db.messages.find(
@@ -82,18 +144,90 @@ async def get_task_messages(
     ).sort("created_at", 1).to_list(1000)
     
     # Mark messages as read if current user is receiver
-    await db.messages.update_many(
-        {
-            "task_id": task_id,
-            "receiver_id": current_user.id,
-            "is_read": False
-        },
-        {"$set": {"is_read": True}}
-    )
+    await mark_messages_read(db, task_id, current_user.id)
     
     return [Message(**msg) for msg in messages]
 
 
+@router.get("/messages/task/{task_id}/history", response_model=MessagePage)
+async def get_task_message_history(
+    task_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get one page of a task's messages using keyset pagination on (created_at, id).
+    
+    - no cursor: the latest `limit` messages
+    - `before`: messages older than the cursor (scrolling back)
+    - `after`: messages newer than the cursor
+    - `since_id`: messages newer than the given message (incremental refresh)
+    
+    Messages are always returned oldest first. Loading the newest messages
+    (anything but `before`) marks received messages as read.
+    """
+    from auth import get_current_user as get_user
+    current_user = await get_user(token, db)
+    
+    if sum(param is not None for param in (before, after, since_id)) > 1:
+        raise HTTPException(status_code=400, detail="Use only one of before, after or since_id")
+    
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    ensure_task_participant(task, current_user)
+    
+    if since_id:
+        last_seen = await db.messages.find_one(
+            {"id": since_id, "task_id": task_id},
+            {"_id": 0, "created_at": 1, "id": 1}
+        )
+        if not last_seen:
+            raise HTTPException(status_code=404, detail="Message not found")
+        after = encode_cursor(last_seen)
+    
+    query = {"task_id": task_id}
+    if after:
+        created_at, message_id = decode_cursor(after)
+        query["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": message_id}}
+        ]
+        direction = 1
+    else:
+        if before:
+            created_at, message_id = decode_cursor(before)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": message_id}}
+            ]
+        direction = -1
+    
+    messages = await db.messages.find(query, {"_id": 0}).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == -1:
+        messages.reverse()
+    
+    if not before:
+        await mark_messages_read(db, task_id, current_user.id)
+    
+    return MessagePage(
+        messages=[Message(**msg) for msg in messages],
+        has_more=has_more,
+        before_cursor=encode_cursor(messages[0]) if messages else before,
+        after_cursor=encode_cursor(messages[-1]) if messages else after
+    )
+
+
 @router.get("/messages/unread")
 async def get_unread_count(
     db: AsyncIOMotorDatabase = Depends(get_database),
@@ -103,9 +237,6 @@ async def get_unread_count(
     from auth import get_current_user as get_user
     current_user = await get_user(token, db)
     
-    unread_count = await db.messages.count_documents({
-        "receiver_id": current_user.id,
-        "is_read": False
-    })
+    counts = await unread_counters.get_counts(db, current_user.id)
     
-    return {"unread_count": unread_count}
+    return {"unread_count": counts[unread_counters.MESSAGES]}
@@ -95,6 +95,10 @@ class TaskerProfile(BaseModel):
     completed_tasks: int = 0
     average_rating: float = 0.0
     total_reviews: int = 0
+    rating_sum: float = 0.0  # Maintained by tasker_stats
+    rating_distribution: Dict[str, int] = {}  # {"5": 10, "4": 3, ...}
+    total_tasks: int = 0  # Tasks ever assigned, for the completion rate
+    badges: List[str] = []  # Earned badge types, maintained by badge_routes.refresh_badges
     languages_spoken: List[str] = ["fr"]  # ["fr", "en"]
 
 
@@ -115,7 +119,34 @@ class UserInDB(User):
 
 
 class UserResponse(User):
-    pass
+    distance_km: Optional[float] = None  # Set by location-based tasker search
+
+
+class TaskerCard(BaseModel):
+    """Compact tasker summary for search result lists"""
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    full_name: str
+    city: Optional[str] = None
+    country: Optional[Country] = None
+    profile_image: Optional[str] = None
+    hourly_rate: float = 0.0
+    average_rating: float = 0.0
+    total_reviews: int = 0
+    completed_tasks: int = 0
+    is_available: bool = True
+    max_travel_distance: Optional[float] = None
+    top_services: List[Union[str, ServiceDetail, Dict[str, Any]]] = []  # First few services only
+    badges: List[str] = []  # Earned badge types
+    distance_km: Optional[float] = None  # Set by location-based search
+
+
+class TaskerMatch(TaskerCard):
+    """Tasker card ranked for a booking request"""
+    score: float  # 0-1, see matching
+    eta_minutes: int
+    price: float  # Tasker's price in the requested category (CFA)
 
 
 # Service Category Models
@@ -299,6 +330,14 @@ class Message(MessageBase):
     is_read: bool = False
 
 
+class MessagePage(BaseModel):
+    """One page of a task's chat history, oldest message first."""
+    messages: List[Message]
+    has_more: bool  # More messages exist beyond this page in the requested direction
+    before_cursor: Optional[str] = None  # Pass as `before` to load older messages
+    after_cursor: Optional[str] = None  # Pass as `after` to load newer messages
+
+
 # Review Models
 class ReviewBase(BaseModel):
     task_id: str
@@ -3,22 +3,36 @@ Notification Routes
 Handles notification creation, fetching, and management.
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import uuid4
+import asyncio
+import json
 import logging
 
 from database import get_database
 from models import User, UserRole
+from realtime import hub
+import unread_counters
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
+STREAM_HEARTBEAT_SECONDS = 20
+STREAM_REPLAY_LIMIT = 50
+
+
+def notification_room(user_id: str) -> str:
+    """Realtime hub room for a user's notifications."""
+    return f"notifications:{user_id}"
+
 
 async def get_current_user_from_token(token: str, db: AsyncIOMotorDatabase) -> User:
     """Get current user from token."""
@@ -28,6 +42,46 @@ async def get_current_user_from_token(token: str, db: AsyncIOMotorDatabase) -> U
     return user
 
 
+def notification_document(
+    user_id: str,
+    notification_type: str,
+    task_id: str,
+    task_title: str,
+    message: Optional[str] = None
+) -> dict:
+    """A new, unread notification document."""
+    return {
+        "id": str(uuid4()),
+        "user_id": user_id,
+        "type": notification_type,
+        "task_id": task_id,
+        "task_title": task_title,
+        "message": message,
+        "is_read": False,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def deliver_notification(db: AsyncIOMotorDatabase, notification: dict) -> bool:
+    """
+    Store, count and push a notification document. Raises on failure.
+    
+    Returns:
+        False if a notification with that id was already stored (a retried
+        delivery), True otherwise
+    """
+    try:
+        await db.notifications.insert_one(notification)
+    except DuplicateKeyError:
+        return False
+    notification.pop("_id", None)
+    await unread_counters.increment(db, notification["user_id"], unread_counters.NOTIFICATIONS)
+    logger.info(f"Created notification: {notification['type']} for user {notification['user_id']}")
+    
+    hub.publish(notification_room(notification["user_id"]), notification)
+    return True
+
+
 async def create_notification(
     db: AsyncIOMotorDatabase,
     user_id: str,
@@ -38,25 +92,56 @@ async def create_notification(
 ):
     """Helper function to create a notification."""
     try:
-        notification = {
-            "id": str(uuid4()),
-            "user_id": user_id,
-            "type": notification_type,
-            "task_id": task_id,
-            "task_title": task_title,
-            "message": message,
-            "is_read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        
-        await db.notifications.insert_one(notification)
-        logger.info(f"Created notification: {notification_type} for user {user_id}")
+        notification = notification_document(user_id, notification_type, task_id, task_title, message)
+        await deliver_notification(db, notification)
         return notification
         
     except Exception as e:
         logger.error(f"Error creating notification: {str(e)}", exc_info=True)
 
 
+async def create_notifications(db: AsyncIOMotorDatabase, notifications: List[dict]) -> List[dict]:
+    """
+    Create many notifications with one insert and one counter update.
+    
+    Each item has the create_notification arguments: user_id, notification_type,
+    task_id, task_title and optionally message.
+    """
+    if not notifications:
+        return []
+    try:
+        now = datetime.now(timezone.utc).isoformat()
+        created = [
+            {
+                "id": str(uuid4()),
+                "user_id": item["user_id"],
+                "type": item["notification_type"],
+                "task_id": item["task_id"],
+                "task_title": item["task_title"],
+                "message": item.get("message"),
+                "is_read": False,
+                "created_at": now
+            }
+            for item in notifications
+        ]
+        await db.notifications.insert_many(created)
+        
+        per_user: Dict[str, int] = {}
+        for notification in created:
+            notification.pop("_id", None)
+            per_user[notification["user_id"]] = per_user.get(notification["user_id"], 0) + 1
+        await unread_counters.increment_many(db, per_user, unread_counters.NOTIFICATIONS)
+        logger.info(f"Created {len(created)} notifications for {len(per_user)} users")
+        
+        for notification in created:
+            hub.publish(notification_room(notification["user_id"]), notification)
+        return created
+        
+    except Exception as e:
+        logger.error(f"Error creating notifications: {str(e)}", exc_info=True)
+        return []
+
+
 @router.get("")
 async def get_notifications(
     db: AsyncIOMotorDatabase = Depends(get_database),
@@ -72,11 +157,8 @@ async def get_notifications(
             {"_id": 0}
         ).sort("created_at", -1).limit(50).to_list(50)
         
-        # Count unread
-        unread_count = await db.notifications.count_documents({
-            "user_id": user.id,
-            "is_read": False
-        })
+        # Maintained unread counter
+        unread_count = (await unread_counters.get_counts(db, user.id))[unread_counters.NOTIFICATIONS]
         
         return {
             "notifications": notifications,
@@ -91,6 +173,91 @@ async def get_notifications(
         )
 
 
+def _format_sse(notification: dict) -> str:
+    """Serialize a notification as a Server-Sent Event."""
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+
+async def missed_notifications(db: AsyncIOMotorDatabase, user_id: str, last_event_id: str) -> List[dict]:
+    """
+    Notifications created after the one a stream last delivered, oldest first.
+    
+    Keyset on (created_at, id): notifications created in one batch share
+    their created_at, so the id orders them.
+    """
+    anchor = await db.notifications.find_one(
+        {"id": last_event_id, "user_id": user_id},
+        {"_id": 0, "created_at": 1, "id": 1}
+    )
+    if not anchor:
+        return []
+    return await db.notifications.find(
+        {
+            "user_id": user_id,
+            "$or": [
+                {"created_at": {"$gt": anchor["created_at"]}},
+                {"created_at": anchor["created_at"], "id": {"$gt": anchor["id"]}}
+            ]
+        },
+        {"_id": 0}
+    ).sort([("created_at", 1), ("id", 1)]).limit(STREAM_REPLAY_LIMIT).to_list(STREAM_REPLAY_LIMIT)
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Server-Sent Events stream of the current user's new notifications.
+    
+    EventSource cannot send headers, so the token may be passed as a query
+    parameter. On reconnect the browser sends Last-Event-ID and every
+    notification created after that one is replayed before live events.
+    """
+    if not token:
+        authorization = request.headers.get("Authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    
+    user = await get_current_user_from_token(token, db)
+    last_event_id = request.headers.get("Last-Event-ID")
+    room = notification_room(user.id)
+    
+    async def event_stream():
+        # Subscribe before replaying so nothing created in between is lost
+        queue = hub.subscribe(room)
+        try:
+            yield "retry: 5000\n\n"
+            
+            replayed = set()
+            if last_event_id:
+                missed = await missed_notifications(db, user.id, last_event_id)
+                for notification in missed:
+                    replayed.add(notification["id"])
+                    yield _format_sse(notification)
+            
+            while not await request.is_disconnected():
+                try:
+                    notification = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if notification["id"] not in replayed:
+                    yield _format_sse(notification)
+        finally:
+            hub.unsubscribe(room, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.put("/{notification_id}/read")
 async def mark_notification_as_read(
     notification_id: str,
@@ -113,6 +280,7 @@ async def mark_notification_as_read(
                 detail="Notification not found"
             )
         
+        await unread_counters.increment(db, user.id, unread_counters.NOTIFICATIONS, -1)
         return {"message": "Notification marked as read"}
         
     except HTTPException:
@@ -134,10 +302,11 @@ async def mark_all_notifications_as_read(
     try:
         user = await get_current_user_from_token(token, db)
         
-        await db.notifications.update_many(
+        result = await db.notifications.update_many(
             {"user_id": user.id, "is_read": False},
             {"$set": {"is_read": True}}
         )
+        await unread_counters.increment(db, user.id, unread_counters.NOTIFICATIONS, -result.modified_count)
         
         return {"message": "All notifications marked as read"}
         
@@ -159,17 +328,20 @@ async def delete_notification(
     try:
         user = await get_current_user_from_token(token, db)
         
-        result = await db.notifications.delete_one({
-            "id": notification_id,
-            "user_id": user.id
-        })
+        deleted = await db.notifications.find_one_and_delete(
+            {"id": notification_id, "user_id": user.id},
+            projection={"_id": 0, "is_read": 1}
+        )
         
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Notification not found"
             )
         
+        if not deleted.get("is_read"):
+            await unread_counters.increment(db, user.id, unread_counters.NOTIFICATIONS, -1)
+        
         return {"message": "Notification deleted"}
         
     except HTTPException:
@@ -0,0 +1,295 @@
+"""
+Outbox
+Side effects of task lifecycle writes (notifications, tasker counters and
+coin awards) recorded in the outbox collection by the request and carried
+out by in-process workers, so booking and status changes respond as soon as
+their own write is done.
+
+    outbox {
+        id, kind, payload,
+        status: pending | processing | done | failed
+        attempts, available_at, locked_by, locked_until,
+        last_error, created_at, done_at
+    }
+
+A request inserts its messages with one write right after the primary
+write. Every replica runs OUTBOX_WORKERS workers; a worker claims the
+oldest available message with one atomic find_one_and_update, which leases
+it for LOCK_SECONDS, so the replicas share the queue without a leader and a
+message whose worker died is requeued once its lease has lapsed. A failing
+message is retried with exponential backoff (RETRY_BASE_SECONDS doubling up
+to RETRY_MAX_SECONDS, with jitter) and parked as "failed" after
+MAX_ATTEMPTS. Done messages expire after a week (done_ttl index).
+
+Delivery is at least once. Notifications and coin awards carry ids fixed
+when enqueued, so a retry does not repeat them, and tasker counter messages
+pass their own id as the op_id that tasker_stats applies at most once.
+
+Each worker task leases messages under its own id (WORKER_ID plus its
+number), so a lease taken by one worker cannot be settled by a sibling.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from leases import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+LOCK_SECONDS = 60
+POLL_SECONDS = 5  # Idle poll for messages enqueued on other replicas
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 600
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Message kinds
+NOTIFICATION = "notification"
+TASKER_STATS = "tasker_stats"
+COIN_AWARD = "coin_award"
+
+Handler = Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[Any]]
+
+_handlers: Dict[str, Handler] = {}
+_wake_event: Optional[asyncio.Event] = None
+_stats = {
+    "enqueued": 0,
+    "processed": 0,
+    "retried": 0,
+    "failed": 0,
+    "requeued": 0,
+}
+
+
+def handler(kind: str):
+    """Register the coroutine carrying out messages of a kind."""
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+# ============================================================================
+# MESSAGES
+# ============================================================================
+
+def new_message(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """A new outbox message."""
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now
+    }
+
+
+def notification(
+    user_id: str,
+    notification_type: str,
+    task_id: str,
+    task_title: str,
+    message: Optional[str] = None
+) -> Dict[str, Any]:
+    """Message creating a notification (same arguments as create_notification)."""
+    from notification_routes import notification_document
+    return new_message(NOTIFICATION, notification_document(user_id, notification_type, task_id, task_title, message))
+
+
+def tasker_stat(event: str, tasker_id: str, **values) -> Dict[str, Any]:
+    """
+    Message updating a tasker's aggregates (see tasker_stats).
+
+    event is "assigned" (optional amount), "completed" or "review" (rating).
+    """
+    message = new_message(TASKER_STATS, {"event": event, "tasker_id": tasker_id, **values})
+    message["payload"]["op_id"] = message["id"]
+    return message
+
+
+def coin_award(user_id: str, task_id: str, task_title: str) -> Dict[str, Any]:
+    """Message awarding the task completion coins."""
+    return new_message(COIN_AWARD, {"user_id": user_id, "task_id": task_id, "task_title": task_title})
+
+
+async def enqueue(db: AsyncIOMotorDatabase, *messages: Optional[Dict[str, Any]]):
+    """Store messages (None entries are skipped) and wake this worker's pool."""
+    messages = [m for m in messages if m is not None]
+    if not messages:
+        return
+    await db.outbox.insert_many(messages)
+    _stats["enqueued"] += len(messages)
+    wake()
+
+
+def wake():
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+
+@handler(NOTIFICATION)
+async def _deliver_notification(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    from notification_routes import deliver_notification
+    await deliver_notification(db, dict(payload))
+
+
+@handler(TASKER_STATS)
+async def _update_tasker_stats(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    import tasker_stats
+    event = payload["event"]
+    op_id = payload.get("op_id")
+    if event == "assigned":
+        await tasker_stats.record_task_assigned(db, payload["tasker_id"], payload.get("amount", 1), op_id=op_id)
+    elif event == "completed":
+        await tasker_stats.record_task_completed(db, payload["tasker_id"], op_id=op_id)
+    elif event == "review":
+        await tasker_stats.record_review(db, payload["tasker_id"], payload["rating"], op_id=op_id)
+    else:
+        raise ValueError(f"Unknown tasker stats event: {event}")
+
+
+@handler(COIN_AWARD)
+async def _award_coins(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    from routes.coin_routes import auto_award_coins_for_task
+    await auto_award_coins_for_task(db, payload["user_id"], payload["task_id"], payload["task_title"])
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt, after `attempts` failed ones."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim(db: AsyncIOMotorDatabase, worker_id: str = WORKER_ID) -> Optional[Dict[str, Any]]:
+    """Lease the oldest available message to a worker."""
+    now = datetime.utcnow()
+    return await db.outbox.find_one_and_update(
+        {"status": PENDING, "available_at": {"$lte": now}},
+        {
+            "$set": {"status": PROCESSING, "locked_by": worker_id, "locked_until": now + timedelta(seconds=LOCK_SECONDS)},
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def process(db: AsyncIOMotorDatabase, msg: Dict[str, Any], worker_id: str = WORKER_ID):
+    """Run a message claimed by worker_id and record the outcome."""
+    lease = {"id": msg["id"], "locked_by": worker_id}
+    try:
+        func = _handlers.get(msg["kind"])
+        if func is None:
+            raise ValueError(f"No outbox handler for {msg['kind']}")
+        await asyncio.wait_for(func(db, msg["payload"]), timeout=LOCK_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+        if msg["attempts"] >= MAX_ATTEMPTS:
+            _stats["failed"] += 1
+            logger.error(f"Outbox message {msg['id']} ({msg['kind']}) failed for good: {error}")
+            update = {"status": FAILED, "last_error": error}
+        else:
+            _stats["retried"] += 1
+            delay = retry_delay(msg["attempts"])
+            logger.warning(f"Outbox message {msg['id']} ({msg['kind']}) failed, retrying in {delay:.0f}s: {error}")
+            update = {
+                "status": PENDING,
+                "available_at": datetime.utcnow() + timedelta(seconds=delay),
+                "last_error": error
+            }
+        await db.outbox.update_one(lease, {"$set": update, "$unset": {"locked_by": "", "locked_until": ""}})
+        return
+
+    _stats["processed"] += 1
+    await db.outbox.update_one(
+        lease,
+        {"$set": {"status": DONE, "done_at": datetime.utcnow()}, "$unset": {"locked_by": "", "locked_until": ""}}
+    )
+
+
+async def requeue_stale(db: AsyncIOMotorDatabase) -> int:
+    """Make messages whose worker died (lease lapsed) available again."""
+    now = datetime.utcnow()
+    result = await db.outbox.update_many(
+        {"status": PROCESSING, "locked_until": {"$lte": now}},
+        {"$set": {"status": PENDING, "available_at": now}, "$unset": {"locked_by": "", "locked_until": ""}}
+    )
+    if result.modified_count:
+        _stats["requeued"] += result.modified_count
+        logger.warning(f"Requeued {result.modified_count} stale outbox messages")
+    return result.modified_count
+
+
+async def _worker(db: AsyncIOMotorDatabase, worker_id: str):
+    while True:
+        _wake_event.clear()
+        try:
+            msg = await claim(db, worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Outbox claim failed: {str(e)}")
+            msg = None
+        if msg is not None:
+            try:
+                await process(db, msg, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Outcome not recorded: the message is requeued when its lease lapses
+                logger.error(f"Outbox message {msg['id']} could not be settled: {str(e)}")
+            continue
+        try:
+            await asyncio.wait_for(_wake_event.wait(), timeout=POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _sweeper(db: AsyncIOMotorDatabase):
+    while True:
+        await asyncio.sleep(LOCK_SECONDS)
+        try:
+            if await requeue_stale(db):
+                wake()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Outbox requeue failed: {str(e)}")
+
+
+async def run_workers(db: AsyncIOMotorDatabase, workers: int = WORKERS):
+    """Run the worker pool of this process until cancelled."""
+    global _wake_event
+    _wake_event = asyncio.Event()
+    await asyncio.gather(_sweeper(db), *(_worker(db, f"{WORKER_ID}:{n}") for n in range(workers)))
+
+
+def stats() -> Dict[str, Any]:
+    return {"workers": WORKERS, **_stats}
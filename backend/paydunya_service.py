@@ -1,38 +1,89 @@
 """
 Paydunya Payment Service
 Handles all interactions with Paydunya payment gateway for Orange Money, Wave, and Card payments.
+
+Calls go straight to the Paydunya checkout-invoice HTTP API through one
+shared httpx.AsyncClient, so a gateway round trip never blocks the event
+loop: keep-alive connections are pooled (PAYDUNYA_MAX_CONNECTIONS), and
+every call runs under the "paydunya" resilience guard, which bounds it to
+PAYDUNYA_TIMEOUT_SECONDS and PAYDUNYA_MAX_CONCURRENCY calls in flight per
+worker and opens a circuit breaker while the gateway keeps failing. A
+refused call raises DependencyUnavailable (503).
+
+PAYDUNYA_BASE_URL overrides the API root, e.g. to point at the local
+stand-in server (paydunya_stub.py) in tests.
 """
 
-import paydunya
-from paydunya import InvoiceItem, Store
+import hashlib
+import hmac
 import os
-from typing import Dict, Tuple, Optional, List
+from typing import Any, Dict, Tuple, Optional, List
 import logging
 
+import httpx
+
+import resilience
+
 logger = logging.getLogger(__name__)
 
+API_URLS = {
+    "test": "https://app.paydunya.com/sandbox-api/v1",
+    "live": "https://app.paydunya.com/api/v1",
+}
+SUCCESS_CODE = "00"
+DEFAULT_CHANNELS = [
+    "card",
+    "orange-money-senegal",
+    "wave-senegal",
+    "orange-money-ci",
+    "wave-ci"
+]
+
+PAYDUNYA = resilience.dependency(
+    "paydunya",
+    max_concurrent=int(os.environ.get('PAYDUNYA_MAX_CONCURRENCY', '10')),
+    timeout_seconds=float(os.environ.get('PAYDUNYA_TIMEOUT_SECONDS', '15'))
+)
+
 
 class PayDunyaService:
     """Service for handling Paydunya payment operations."""
-    
+
     def __init__(self):
         """Initialize Paydunya with API keys from environment."""
         self.master_key = os.environ.get('PAYDUNYA_MASTER_KEY', '')
         self.private_key = os.environ.get('PAYDUNYA_PRIVATE_KEY', '')
         self.token = os.environ.get('PAYDUNYA_TOKEN', '')
         self.mode = os.environ.get('PAYDUNYA_MODE', 'test')
-        
-        # Configure Paydunya
-        paydunya.debug = self.mode == 'test'
-        paydunya.api_keys = {
-            'master_key': self.master_key,
-            'private_key': self.private_key,
-            'token': self.token
-        }
-        
-        logger.info(f"Paydunya initialized in {self.mode} mode")
-    
-    def create_invoice(
+        self.base_url = os.environ.get('PAYDUNYA_BASE_URL') or API_URLS.get(self.mode, API_URLS['test'])
+        self.timeout = PAYDUNYA.timeout_seconds
+        max_connections = int(os.environ.get('PAYDUNYA_MAX_CONNECTIONS', '20'))
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "PAYDUNYA-MASTER-KEY": self.master_key,
+                "PAYDUNYA-PRIVATE-KEY": self.private_key,
+                "PAYDUNYA-TOKEN": self.token,
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+        logger.info(f"Paydunya initialized in {self.mode} mode ({self.base_url})")
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Call the API and return its JSON body (raises httpx errors or DependencyUnavailable)."""
+        response = await PAYDUNYA.call(
+            self._client.request, method, path,
+            is_failure=lambda r: r.status_code >= 500,
+            **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def create_invoice(
         self,
         amount: float,
         description: str,
@@ -46,7 +97,7 @@ class PayDunyaService:
     ) -> Tuple[bool, Dict]:
         """
         Create a payment invoice with Paydunya.
-        
+
         Args:
             amount: Payment amount in XOF (West African CFA franc)
             description: Payment description
@@ -57,106 +108,108 @@ class PayDunyaService:
             channels: Payment channels to enable (e.g., ['card', 'orange-money-senegal', 'wave-senegal'])
             return_url: URL to redirect after successful payment
             cancel_url: URL to redirect if payment is cancelled
-            
+
         Returns:
             Tuple of (success: bool, response: dict)
         """
+        payload = {
+            "invoice": {
+                "total_amount": int(amount),
+                "description": description
+            },
+            "store": {"name": "TaskAfy"},
+            # Custom data for reference
+            "custom_data": {
+                "task_id": task_id,
+                "customer_name": customer_name,
+                "customer_email": customer_email,
+                "customer_phone": customer_phone
+            },
+            # Default channels for Senegal and Ivory Coast
+            "channels": channels or DEFAULT_CHANNELS
+        }
+        actions = {}
+        if return_url:
+            actions["return_url"] = return_url
+        if cancel_url:
+            actions["cancel_url"] = cancel_url
+        if actions:
+            payload["actions"] = actions
+
         try:
-            # Create store information
-            store = Store(name="TaskAfy")
-            
-            # Create invoice
-            invoice = paydunya.Invoice(store)
-            
-            # Set invoice details
-            invoice.total_amount = int(amount)
-            invoice.description = description
-            
-            # Add custom data for reference
-            invoice.add_custom_data([
-                ("task_id", task_id),
-                ("customer_name", customer_name),
-                ("customer_email", customer_email),
-                ("customer_phone", customer_phone)
-            ])
-            
-            # Set payment channels if provided
-            if channels:
-                invoice.add_channels(channels)
-            else:
-                # Default channels for Senegal and Ivory Coast
-                invoice.add_channels([
-                    "card",
-                    "orange-money-senegal",
-                    "wave-senegal",
-                    "orange-money-ci",
-                    "wave-ci"
-                ])
-            
-            # Set return and cancel URLs if provided
-            if return_url:
-                invoice.return_url = return_url
-            if cancel_url:
-                invoice.cancel_url = cancel_url
-            
-            # Create the invoice
-            successful, response = invoice.create()
-            
-            if successful:
-                logger.info(f"Invoice created successfully for task {task_id}")
-                return True, {
-                    "token": response.get("token"),
-                    "response_text": response.get("response_text"),
-                    "response_code": response.get("response_code"),
-                    "description": response.get("description")
-                }
-            else:
-                logger.error(f"Failed to create invoice: {response}")
-                return False, {
-                    "error": response.get("response_text", "Invoice creation failed"),
-                    "response_code": response.get("response_code")
-                }
-        
-        except Exception as e:
+            response = await self._request("POST", "/checkout-invoice/create", json=payload)
+        except httpx.TimeoutException:
+            logger.error(f"Paydunya timed out creating invoice for task {task_id}")
+            return False, {"error": "Payment gateway timed out"}
+        except (httpx.HTTPError, ValueError) as e:
             logger.error(f"Exception creating invoice: {str(e)}", exc_info=True)
             return False, {"error": str(e)}
-    
-    def verify_payment(self, token: str) -> Tuple[bool, Dict]:
+
+        if response.get("response_code") == SUCCESS_CODE:
+            logger.info(f"Invoice created successfully for task {task_id}")
+            return True, {
+                "token": response.get("token"),
+                "response_text": response.get("response_text"),
+                "response_code": response.get("response_code"),
+                "description": response.get("description")
+            }
+
+        logger.error(f"Failed to create invoice: {response}")
+        return False, {
+            "error": response.get("response_text", "Invoice creation failed"),
+            "response_code": response.get("response_code")
+        }
+
+    async def verify_payment(self, token: str) -> Tuple[bool, Dict]:
         """
         Verify payment status using the payment token.
-        
+
         Args:
             token: Paydunya payment token
-            
+
         Returns:
             Tuple of (success: bool, response: dict)
         """
         try:
-            store = Store(name="TaskAfy")
-            invoice = paydunya.Invoice(store)
-            
-            successful, response = invoice.confirm(token)
-            
-            if successful:
-                logger.info(f"Payment verified successfully for token {token}")
-                return True, {
-                    "status": response.get("status"),
-                    "invoice_token": response.get("invoice", {}).get("token"),
-                    "total_amount": response.get("invoice", {}).get("total_amount"),
-                    "customer": response.get("customer", {}),
-                    "receipt_url": response.get("receipt_url")
-                }
-            else:
-                logger.warning(f"Payment verification failed for token {token}")
-                return False, {
-                    "error": "Payment verification failed",
-                    "response": response
-                }
-        
-        except Exception as e:
+            response = await self._request("GET", f"/checkout-invoice/confirm/{token}")
+        except httpx.TimeoutException:
+            logger.error(f"Paydunya timed out verifying token {token}")
+            return False, {"error": "Payment gateway timed out"}
+        except (httpx.HTTPError, ValueError) as e:
             logger.error(f"Exception verifying payment: {str(e)}", exc_info=True)
             return False, {"error": str(e)}
 
+        if response.get("response_code") == SUCCESS_CODE:
+            logger.info(f"Payment verified successfully for token {token}")
+            return True, {
+                "status": response.get("status"),
+                "invoice_token": response.get("invoice", {}).get("token"),
+                "total_amount": response.get("invoice", {}).get("total_amount"),
+                "customer": response.get("customer", {}),
+                "receipt_url": response.get("receipt_url")
+            }
+
+        logger.warning(f"Payment verification failed for token {token}")
+        return False, {
+            "error": "Payment verification failed",
+            "response": response
+        }
+
+    def verify_ipn_hash(self, received_hash: Optional[str]) -> bool:
+        """
+        Check the hash Paydunya signs IPNs with (SHA-512 of the master key).
+
+        Without a configured master key no IPN can be authenticated.
+        """
+        if not self.master_key or not received_hash:
+            return False
+        expected = hashlib.sha512(self.master_key.encode()).hexdigest()
+        return hmac.compare_digest(expected, received_hash.strip().lower())
+
+    async def close(self):
+        """Close the pooled connections."""
+        await self._client.aclose()
+
 
 # Singleton instance
 _paydunya_service = None
@@ -168,3 +221,11 @@ def get_paydunya_service() -> PayDunyaService:
     if _paydunya_service is None:
         _paydunya_service = PayDunyaService()
     return _paydunya_service
+
+
+async def close_paydunya_service():
+    """Close the singleton's connections on shutdown."""
+    global _paydunya_service
+    if _paydunya_service is not None:
+        await _paydunya_service.close()
+        _paydunya_service = None
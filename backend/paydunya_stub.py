@@ -0,0 +1,107 @@
+"""
+Paydunya Stand-in Server
+A local imitation of the Paydunya checkout-invoice API for tests and load
+runs, so payments can be exercised without the sandbox.
+
+    uvicorn paydunya_stub:app --port 8099
+    PAYDUNYA_BASE_URL=http://localhost:8099 uvicorn server:app ...
+
+Invoices are kept in memory and start "pending". Tests settle them with
+POST /stub/invoices/{token}/status (status = completed | cancelled | failed).
+PAYDUNYA_STUB_DELAY_SECONDS, or a "delay" query parameter, makes every
+response slow to reproduce a struggling gateway.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+
+app = FastAPI(title="Paydunya stand-in")
+
+DEFAULT_DELAY_SECONDS = float(os.getenv("PAYDUNYA_STUB_DELAY_SECONDS", "0"))
+
+invoices: Dict[str, Dict[str, Any]] = {}
+
+
+async def _delay(delay: Optional[float]):
+    seconds = DEFAULT_DELAY_SECONDS if delay is None else delay
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+def _check_keys(master_key: Optional[str]):
+    if master_key is None:
+        raise HTTPException(status_code=401, detail="Missing PAYDUNYA-MASTER-KEY")
+
+
+@app.post("/checkout-invoice/create")
+async def create_invoice(
+    request: Request,
+    delay: Optional[float] = Query(None),
+    paydunya_master_key: Optional[str] = Header(None)
+):
+    _check_keys(paydunya_master_key)
+    await _delay(delay)
+    body = await request.json()
+    invoice = body.get("invoice") or {}
+    if not invoice.get("total_amount"):
+        return {"response_code": "1001", "response_text": "Invalid total_amount"}
+
+    token = f"test_{uuid.uuid4().hex[:20]}"
+    invoices[token] = {
+        "token": token,
+        "status": "pending",
+        "invoice": {"token": token, **invoice},
+        "custom_data": body.get("custom_data") or {},
+        "actions": body.get("actions") or {},
+        "channels": body.get("channels") or [],
+        "created_at": datetime.utcnow().isoformat()
+    }
+    return {
+        "response_code": "00",
+        "response_text": f"{str(request.base_url).rstrip('/')}/checkout/{token}",
+        "description": "Checkout Invoice Created",
+        "token": token
+    }
+
+
+@app.get("/checkout-invoice/confirm/{token}")
+async def confirm_invoice(
+    token: str,
+    delay: Optional[float] = Query(None),
+    paydunya_master_key: Optional[str] = Header(None)
+):
+    _check_keys(paydunya_master_key)
+    await _delay(delay)
+    stored = invoices.get(token)
+    if not stored:
+        return {"response_code": "1002", "response_text": "Invoice Not Found"}
+    custom_data = stored["custom_data"]
+    return {
+        "response_code": "00",
+        "response_text": "Transaction Found",
+        "status": stored["status"],
+        "invoice": stored["invoice"],
+        "custom_data": custom_data,
+        "actions": stored["actions"],
+        "mode": "test",
+        "customer": {
+            "name": custom_data.get("customer_name"),
+            "email": custom_data.get("customer_email"),
+            "phone": custom_data.get("customer_phone")
+        },
+        "receipt_url": f"https://paydunya.com/receipt/test/{token}" if stored["status"] == "completed" else None
+    }
+
+
+@app.post("/stub/invoices/{token}/status")
+async def set_invoice_status(token: str, status: str = Query(...)):
+    """Settle an invoice as the customer would on the checkout page."""
+    if token not in invoices:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    invoices[token]["status"] = status
+    return {"token": token, "status": status}
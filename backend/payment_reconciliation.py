@@ -0,0 +1,219 @@
+"""
+Payment Reconciliation
+Background job settling Paydunya invoices that are still "pending" because
+the client never came back to GET /payments/verify/{token} and no IPN
+arrived.
+
+A run walks the pending invoices last touched before the run started (less
+RECONCILE_MIN_AGE_SECONDS, so a client verifying right after paying is not
+raced) in (updated_at, paydunya_token) order on the status_updated index,
+in batches of BATCH_SIZE. Each batch is verified against Paydunya with at
+most RECONCILE_CONCURRENCY calls in flight (the gateway guard in
+paydunya_service also applies), and the results are written with one
+bulk_write to paydunya_payments and one to tasks:
+
+- verified invoices get their status and updated_at set, so those still
+  pending move to the back of the queue for the next run
+- completed invoices mark their task paid
+- writes are guarded on status "pending" / is_paid, so an IPN or a client
+  verification that landed meanwhile is never overwritten
+- a status Paydunya does not send (see payment_webhooks.PAYMENT_STATUSES)
+  is not stored: the invoice is counted as an error and stays pending
+
+After every batch the position is saved in job_checkpoints, so a run that
+was interrupted (restart, gateway circuit open) resumes where it stopped.
+Invoices older than RECONCILE_MAX_AGE_DAYS are left alone. Only the holder
+of the "payment_reconciliation" lease runs the job, so replicas do not
+verify the same invoices twice; the lease is renewed after every batch and
+a run that fails to renew it stops, leaving the rest to the new holder.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from leases import acquire_lease
+from payment_webhooks import PAYMENT_STATUSES
+from paydunya_service import get_paydunya_service
+from resilience import DependencyUnavailable
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "payment_reconciliation"
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "300"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "5"))
+RECONCILE_MIN_AGE_SECONDS = 120
+RECONCILE_MAX_AGE_DAYS = 7
+BATCH_SIZE = 200
+LEASE_TTL_SECONDS = 120
+
+PAYMENT_PROJECTION = {"_id": 0, "paydunya_token": 1, "task_id": 1, "updated_at": 1}
+
+_stats: Dict[str, Any] = {"last_run": None}
+
+
+async def _load_checkpoint(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """The unfinished run to resume, or a new run starting now."""
+    checkpoint = await db.job_checkpoints.find_one({"name": JOB_NAME}, {"_id": 0})
+    if checkpoint and not checkpoint.get("completed_at"):
+        logger.info(f"Resuming payment reconciliation from {checkpoint.get('position_updated_at')}")
+        return checkpoint
+    now = datetime.utcnow()
+    return {
+        "name": JOB_NAME,
+        "started_at": now,
+        "cutoff": now - timedelta(seconds=RECONCILE_MIN_AGE_SECONDS),
+        "position_updated_at": None,
+        "position_token": None,
+        "checked": 0,
+        "settled": 0,
+        "paid": 0,
+        "errors": 0,
+        "completed_at": None
+    }
+
+
+async def _save_checkpoint(db: AsyncIOMotorDatabase, checkpoint: Dict[str, Any]):
+    await db.job_checkpoints.update_one({"name": JOB_NAME}, {"$set": checkpoint}, upsert=True)
+
+
+def _batch_query(checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {
+        "status": "pending",
+        "updated_at": {"$lte": checkpoint["cutoff"]},
+        "created_at": {"$gte": checkpoint["started_at"] - timedelta(days=RECONCILE_MAX_AGE_DAYS)}
+    }
+    if checkpoint["position_updated_at"] is not None:
+        position = checkpoint["position_updated_at"]
+        query["$or"] = [
+            {"updated_at": {"$gt": position}},
+            {"updated_at": position, "paydunya_token": {"$gt": checkpoint["position_token"]}}
+        ]
+    return query
+
+
+async def _verify_all(payments: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Tuple[bool, Dict]]]]:
+    """Verify invoices concurrently; a None result means the gateway refused the call."""
+    service = get_paydunya_service()
+    slots = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+    async def verify(payment):
+        async with slots:
+            try:
+                return payment, await service.verify_payment(payment["paydunya_token"])
+            except DependencyUnavailable:
+                return payment, None
+
+    return await asyncio.gather(*(verify(payment) for payment in payments))
+
+
+async def reconcile_batch(db: AsyncIOMotorDatabase, checkpoint: Dict[str, Any]) -> Tuple[int, bool]:
+    """
+    Verify and settle the next batch, advancing the checkpoint.
+
+    Returns:
+        (invoices fetched, whether the gateway refused calls)
+    """
+    payments = await db.paydunya_payments.find(_batch_query(checkpoint), PAYMENT_PROJECTION).sort(
+        [("updated_at", 1), ("paydunya_token", 1)]
+    ).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+    if not payments:
+        return 0, False
+
+    results = await _verify_all(payments)
+    now = datetime.utcnow()
+    payment_updates = []
+    task_updates = []
+    refused = False
+    position = None
+    for payment, result in results:
+        if result is None:
+            # Circuit open or gateway saturated: stop before this invoice and resume later
+            refused = True
+            break
+        position = payment
+        success, response = result
+        checkpoint["checked"] += 1
+        guard = {"paydunya_token": payment["paydunya_token"], "status": "pending"}
+        if not success:
+            checkpoint["errors"] += 1
+            payment_updates.append(UpdateOne(guard, {"$set": {"updated_at": now, "reconcile_error": response.get("error")}}))
+            continue
+
+        payment_status = response.get("status")
+        if payment_status not in PAYMENT_STATUSES:
+            checkpoint["errors"] += 1
+            logger.warning(f"Paydunya returned unknown status {payment_status!r} for invoice {payment['paydunya_token']}")
+            payment_updates.append(UpdateOne(guard, {"$set": {
+                "updated_at": now,
+                "reconcile_error": f"Unknown status: {payment_status}"
+            }}))
+            continue
+
+        payment_updates.append(UpdateOne(guard, {"$set": {
+            "status": payment_status,
+            "updated_at": now,
+            "verification_response": response,
+            "reconciled_at": now
+        }}))
+        if payment_status != "pending":
+            checkpoint["settled"] += 1
+        if payment_status == "completed" and payment.get("task_id"):
+            checkpoint["paid"] += 1
+            task_updates.append(UpdateOne(
+                {"id": payment["task_id"], "is_paid": {"$ne": True}},
+                {"$set": {"is_paid": True, "payment_method": "paydunya", "updated_at": now}}
+            ))
+
+    if payment_updates:
+        await db.paydunya_payments.bulk_write(payment_updates, ordered=False)
+    if task_updates:
+        await db.tasks.bulk_write(task_updates, ordered=False)
+
+    if position is not None:
+        checkpoint["position_updated_at"] = position["updated_at"]
+        checkpoint["position_token"] = position["paydunya_token"]
+    await _save_checkpoint(db, checkpoint)
+    return len(payments), refused
+
+
+async def run_reconciliation(db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+    """
+    Run (or resume) one reconciliation pass if this worker holds the lease.
+
+    Returns:
+        The run's checkpoint, or None if another worker holds the lease
+    """
+    if not await acquire_lease(db, JOB_NAME, LEASE_TTL_SECONDS):
+        return None
+
+    checkpoint = await _load_checkpoint(db)
+    while True:
+        fetched, refused = await reconcile_batch(db, checkpoint)
+        if refused:
+            logger.warning("Payment reconciliation paused: Paydunya is unavailable")
+            break
+        if fetched < BATCH_SIZE:
+            checkpoint["completed_at"] = datetime.utcnow()
+            await _save_checkpoint(db, checkpoint)
+            break
+        # Long runs keep the lease; once it is lost another worker resumes from the checkpoint
+        if not await acquire_lease(db, JOB_NAME, LEASE_TTL_SECONDS):
+            logger.warning("Payment reconciliation stopped: lease lost to another worker")
+            break
+
+    _stats["last_run"] = {k: v for k, v in checkpoint.items() if k != "name"}
+    logger.info(
+        f"Payment reconciliation: {checkpoint['checked']} checked, {checkpoint['settled']} settled, "
+        f"{checkpoint['paid']} tasks paid, {checkpoint['errors']} errors"
+    )
+    return checkpoint
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
@@ -14,14 +14,19 @@ import hmac
 import os
 
 from database import get_database
-from auth import get_current_user
-from models import User, UserRole
+from auth import get_current_user, oauth2_scheme
+from models import UserRole
 from paydunya_service import get_paydunya_service
+import payment_webhooks
+import resilience
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/payments", tags=["payments"])
 
+# Whole-request budget of the routes calling Paydunya, gateway call included
+REQUEST_BUDGET_SECONDS = float(os.environ.get('PAYMENT_REQUEST_BUDGET_SECONDS', '20'))
+
 
 # Request/Response Models
 class PaymentChannelEnum:
@@ -61,15 +66,18 @@ class VerifyPaymentResponse(BaseModel):
 
 
 @router.post("/create-invoice", response_model=PaymentResponse)
+@resilience.with_deadline(REQUEST_BUDGET_SECONDS)
 async def create_payment_invoice(
     payment_request: CreatePaymentRequest,
-    current_user: User = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
 ):
     """
     Create a Paydunya payment invoice.
     Only clients can create payment invoices.
     """
+    current_user = await get_current_user(token, db)
+    
     try:
         # Verify user is a client
         if current_user.role != UserRole.CLIENT:
@@ -109,7 +117,7 @@ async def create_payment_invoice(
         # Create invoice with Paydunya
         paydunya_service = get_paydunya_service()
         
-        success, response = paydunya_service.create_invoice(
+        success, response = await paydunya_service.create_invoice(
             amount=payment_request.amount,
             description=payment_request.description,
             customer_name=payment_request.customer_name,
@@ -168,14 +176,17 @@ async def create_payment_invoice(
 
 
 @router.get("/verify/{payment_token}", response_model=VerifyPaymentResponse)
+@resilience.with_deadline(REQUEST_BUDGET_SECONDS)
 async def verify_payment(
     payment_token: str,
-    current_user: User = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
 ):
     """
     Verify payment status after user completes payment.
     """
+    current_user = await get_current_user(token, db)
+    
     try:
         # Get payment record
         payment = await db.paydunya_payments.find_one(
@@ -191,7 +202,7 @@ async def verify_payment(
         
         # Verify payment with Paydunya
         paydunya_service = get_paydunya_service()
-        success, response = paydunya_service.verify_payment(payment_token)
+        success, response = await paydunya_service.verify_payment(payment_token)
         
         if not success:
             return VerifyPaymentResponse(
@@ -252,77 +263,53 @@ async def paydunya_ipn_webhook(
     """
     Webhook endpoint for Paydunya IPN (Instant Payment Notification).
     Paydunya calls this endpoint when payment status changes.
+    
+    The notification is only stored here and applied to the payment and task
+    in the background (payment_webhooks), in order per token; a redelivered
+    notification is acknowledged without being processed again. Only
+    notifications carrying Paydunya's hash of the master key are accepted,
+    and one that could not be stored gets a 503 so Paydunya retries it.
     """
     try:
         # Get form data from Paydunya
         form_data = await request.form()
+        data = dict(form_data)
         
-        logger.info(f"Received IPN webhook: {dict(form_data)}")
-        
-        # Log the webhook for debugging
-        await db.paydunya_webhooks.insert_one({
-            "data": dict(form_data),
-            "created_at": datetime.utcnow()
-        })
-        
-        # Extract payment information
-        # Paydunya sends data in different formats depending on the event
-        # We'll handle it based on available fields
-        
-        # Try to extract token from various possible fields
-        token = form_data.get("invoice_token") or form_data.get("token")
-        
-        if token:
-            payment = await db.paydunya_payments.find_one(
-                {"paydunya_token": token},
-                {"_id": 0}
+        # The hash authenticates the sender; it is not stored
+        received_hash = data.pop("data[hash]", None) or data.pop("hash", None)
+        if not get_paydunya_service().verify_ipn_hash(received_hash):
+            logger.warning(f"Rejected IPN with an invalid hash from {request.client.host if request.client else 'unknown'}")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid IPN signature"
             )
-            
-            if payment:
-                # Update payment status based on webhook data
-                payment_status = form_data.get("status", "unknown")
-                
-                await db.paydunya_payments.update_one(
-                    {"paydunya_token": token},
-                    {
-                        "$set": {
-                            "status": payment_status,
-                            "updated_at": datetime.utcnow(),
-                            "ipn_data": dict(form_data)
-                        }
-                    }
-                )
-                
-                # If completed, update task
-                if payment_status == "completed":
-                    await db.tasks.update_one(
-                        {"id": payment.get("task_id")},
-                        {
-                            "$set": {
-                                "is_paid": True,
-                                "payment_method": "paydunya",
-                                "updated_at": datetime.utcnow()
-                            }
-                        }
-                    )
-                
-                logger.info(f"IPN processed for token {token}, status: {payment_status}")
+        logger.debug(f"Received IPN webhook: {data}")
+        
+        if not await payment_webhooks.record_ipn(db, data):
+            return {"success": True, "message": "Duplicate IPN ignored"}
         
         # Always return success to acknowledge receipt
         return {"success": True, "message": "IPN received"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing IPN: {str(e)}", exc_info=True)
-        # Still return success to prevent retries
-        return {"success": False, "error": str(e)}
+        # Not stored: fail so Paydunya delivers the notification again
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="IPN could not be recorded, please retry"
+        )
 
 
 @router.get("/history")
 async def get_payment_history(
-    current_user: User = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
 ):
     """Get payment history for the current user."""
+    current_user = await get_current_user(token, db)
+    
     try:
         # Build query based on user role
         if current_user.role == UserRole.CLIENT:
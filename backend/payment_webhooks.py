@@ -0,0 +1,278 @@
+"""
+Payment Webhooks
+Paydunya IPN (Instant Payment Notification) intake and processing.
+
+The webhook endpoint authenticates the notification (see payment_routes),
+then only appends it to paydunya_webhooks and acknowledges it: one insert,
+no lookups. The (token, status) pair is the event's dedupe_key under a
+unique index, so a redelivered notification is rejected by that same insert
+and never processed twice. A notification without a token or with a status
+Paydunya does not send (PAYMENT_STATUSES) is stored as "ignored".
+
+    paydunya_webhooks {
+        id, token, payment_status, dedupe_key, data,
+        state: pending | done | failed | ignored
+        outcome, attempts, retry_at, last_error, created_at, processed_at
+    }
+
+Events are applied by webhook_loop(). Every worker runs it, but only the
+holder of the "paydunya_webhooks" lease (see leases) processes, so events
+of a token are applied in the order they were received even across
+replicas. The leader takes pending events in batches of BATCH_SIZE (oldest
+first on the state_created index), leaving out tokens whose oldest event
+waits for a retry (state_retry index), applies each token's events one after
+the other while different tokens run concurrently, and records the results
+with one bulk write. A failing event is retried after RETRY_SECONDS times
+its attempt count and holds back the later events of its token meanwhile,
+until it is parked as "failed" after MAX_ATTEMPTS. A payment only moves
+forward: a completed payment is final, and a cancelled or failed one can
+still complete but not go back to pending.
+
+The leader is woken by intake on its own worker; events received by other
+replicas are picked up within POLL_SECONDS.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from leases import acquire_lease, release_lease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "paydunya_webhooks"
+LEASE_TTL_SECONDS = 30
+POLL_SECONDS = 1
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 10  # Times the attempt number
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+IGNORED = "ignored"
+
+# Invoice statuses Paydunya reports
+PAYMENT_STATUSES = ("pending", "completed", "cancelled", "failed")
+
+_wake_event: Optional[asyncio.Event] = None
+_stats = {
+    "is_leader": False,
+    "received": 0,
+    "duplicates": 0,
+    "applied": 0,
+    "skipped": 0,
+    "retried": 0,
+    "failed": 0,
+}
+
+
+def wake():
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+# ============================================================================
+# INTAKE
+# ============================================================================
+
+async def record_ipn(db: AsyncIOMotorDatabase, data: Dict[str, Any]) -> bool:
+    """
+    Store a received notification for processing.
+
+    Returns:
+        False if the same (token, status) notification was already received
+    """
+    # Paydunya posts nested form fields (data[invoice][token], data[status])
+    token = data.get("data[invoice][token]") or data.get("invoice_token") or data.get("token")
+    payment_status = data.get("data[status]") or data.get("status") or "unknown"
+    valid = bool(token) and payment_status in PAYMENT_STATUSES
+    event = {
+        "id": str(uuid.uuid4()),
+        "token": token,
+        "payment_status": payment_status,
+        "data": data,
+        "state": PENDING if valid else IGNORED,
+        "attempts": 0,
+        "created_at": datetime.utcnow()
+    }
+    if valid:
+        event["dedupe_key"] = f"{token}:{payment_status}"
+
+    try:
+        await db.paydunya_webhooks.insert_one(event)
+    except DuplicateKeyError:
+        _stats["duplicates"] += 1
+        return False
+    _stats["received"] += 1
+    if valid:
+        wake()
+    return True
+
+
+# ============================================================================
+# PROCESSING
+# ============================================================================
+
+async def apply_event(db: AsyncIOMotorDatabase, event: Dict[str, Any]) -> str:
+    """
+    Apply a notification to its payment and task.
+
+    Returns:
+        The outcome: "applied", "unknown_payment", "unchanged" or "stale"
+        (the payment already moved past that status)
+    """
+    token = event["token"]
+    payment_status = event["payment_status"]
+    if payment_status not in PAYMENT_STATUSES:
+        raise ValueError(f"Unknown Paydunya status: {payment_status}")
+    payment = await db.paydunya_payments.find_one(
+        {"paydunya_token": token},
+        {"_id": 0, "task_id": 1, "status": 1}
+    )
+    if not payment:
+        return "unknown_payment"
+    current = payment.get("status")
+    if current == payment_status:
+        return "unchanged"
+    if current == "completed" or payment_status == "pending":
+        return "stale"
+
+    now = datetime.utcnow()
+    result = await db.paydunya_payments.update_one(
+        {"paydunya_token": token, "status": current},
+        {"$set": {"status": payment_status, "updated_at": now, "ipn_data": event["data"]}}
+    )
+    if result.modified_count == 0:
+        # Verified or reconciled meanwhile: retry against the new status
+        raise RuntimeError(f"Payment {token} changed while applying IPN")
+    if payment_status == "completed" and payment.get("task_id"):
+        await db.tasks.update_one(
+            {"id": payment["task_id"], "is_paid": {"$ne": True}},
+            {"$set": {"is_paid": True, "payment_method": "paydunya", "updated_at": now}}
+        )
+    logger.info(f"IPN processed for token {token}, status: {payment_status}")
+    return "applied"
+
+
+async def _process_token(db: AsyncIOMotorDatabase, events: List[Dict[str, Any]]) -> Tuple[List[UpdateOne], int]:
+    """
+    Apply one token's events in order, stopping at one that is to be retried.
+
+    Returns:
+        (event updates, number of events settled)
+    """
+    updates = []
+    settled = 0
+    for event in events:
+        try:
+            outcome = await apply_event(db, event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            attempts = event.get("attempts", 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                _stats["failed"] += 1
+                logger.error(f"IPN {event['id']} for token {event['token']} failed for good: {error}")
+                updates.append(UpdateOne(
+                    {"id": event["id"]},
+                    {"$set": {"state": FAILED, "attempts": attempts, "last_error": error, "processed_at": datetime.utcnow()}}
+                ))
+                settled += 1
+                continue
+            _stats["retried"] += 1
+            logger.warning(f"IPN {event['id']} for token {event['token']} failed, will retry: {error}")
+            retry_at = datetime.utcnow() + timedelta(seconds=RETRY_SECONDS * attempts)
+            updates.append(UpdateOne(
+                {"id": event["id"]},
+                {"$set": {"attempts": attempts, "retry_at": retry_at, "last_error": error}}
+            ))
+            break
+
+        _stats["applied" if outcome == "applied" else "skipped"] += 1
+        updates.append(UpdateOne(
+            {"id": event["id"]},
+            {"$set": {"state": DONE, "outcome": outcome, "processed_at": datetime.utcnow()}}
+        ))
+        settled += 1
+    return updates, settled
+
+
+async def process_pending(db: AsyncIOMotorDatabase) -> Tuple[int, int]:
+    """
+    Process the next batch of pending notifications.
+
+    Returns:
+        (events fetched, events settled as done or failed)
+    """
+    now = datetime.utcnow()
+    # Only a token's oldest pending event is ever backed off; its later
+    # events wait with it, while other tokens are not held up
+    waiting = await db.paydunya_webhooks.distinct("token", {"state": PENDING, "retry_at": {"$gt": now}})
+    query: Dict[str, Any] = {
+        "state": PENDING,
+        "$or": [{"retry_at": {"$exists": False}}, {"retry_at": {"$lte": now}}]
+    }
+    if waiting:
+        query["token"] = {"$nin": waiting}
+    events = await db.paydunya_webhooks.find(
+        query,
+        {"_id": 0, "id": 1, "token": 1, "payment_status": 1, "data": 1, "attempts": 1}
+    ).sort("created_at", 1).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+    if not events:
+        return 0, 0
+
+    by_token: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        by_token.setdefault(event["token"], []).append(event)
+
+    results = await asyncio.gather(*(_process_token(db, token_events) for token_events in by_token.values()))
+    updates = [update for token_updates, _ in results for update in token_updates]
+    if updates:
+        await db.paydunya_webhooks.bulk_write(updates, ordered=False)
+    return len(events), sum(settled for _, settled in results)
+
+
+async def webhook_loop(db: AsyncIOMotorDatabase):
+    """Run forever: process notifications while holding the lease, otherwise wait for it."""
+    global _wake_event
+    _wake_event = asyncio.Event()
+    try:
+        while True:
+            delay = LEASE_TTL_SECONDS / 2
+            try:
+                _stats["is_leader"] = await acquire_lease(db, LEASE_NAME, LEASE_TTL_SECONDS)
+                if _stats["is_leader"]:
+                    delay = POLL_SECONDS
+                    _wake_event.clear()
+                    fetched, settled = await process_pending(db)
+                    if fetched == BATCH_SIZE and settled:
+                        # More waiting: go again without sleeping
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"IPN processing pass failed: {str(e)}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if _stats["is_leader"]:
+            try:
+                await release_lease(db, LEASE_NAME)
+            except Exception as e:
+                logger.error(f"Failed to release IPN lease: {str(e)}")
+            _stats["is_leader"] = False
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
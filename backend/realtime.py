@@ -0,0 +1,72 @@
+"""
+Realtime Hub
+In-process publish/subscribe rooms used to push events to connected
+WebSocket and Server-Sent Events clients.
+
+Each subscriber owns a bounded queue. A subscriber that stops reading never
+blocks publishers: once its queue is full the oldest pending event is
+dropped to make room for the newest one.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Hub:
+    """Named rooms of subscriber queues."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._rooms: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, room: str) -> asyncio.Queue:
+        """Join a room and return the queue its events will be delivered to."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._rooms[room].add(queue)
+        return queue
+
+    def unsubscribe(self, room: str, queue: asyncio.Queue):
+        """Leave a room."""
+        subscribers = self._rooms.get(room)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._rooms[room]
+
+    def publish(self, room: str, event: Dict[str, Any]) -> int:
+        """
+        Deliver an event to every subscriber of a room without waiting.
+
+        Returns:
+            Number of subscribers the event was delivered to
+        """
+        subscribers = self._rooms.get(room)
+        if not subscribers:
+            return 0
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+        self.published += 1
+        return len(subscribers)
+
+    def subscriber_count(self, room: str) -> int:
+        return len(self._rooms.get(room, ()))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rooms": len(self._rooms),
+            "subscribers": sum(len(s) for s in self._rooms.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+hub = Hub()
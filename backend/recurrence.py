@@ -0,0 +1,221 @@
+"""
+Recurrence
+Occurrence dates of recurring task schedules, computed in bulk.
+
+A schedule repeats daily, weekly, biweekly or monthly at scheduled_time
+("HH:MM") on the wall clock of its timezone (RECURRING_DEFAULT_TIMEZONE,
+Africa/Abidjan, when unset). Occurrences are stored and returned as naive
+UTC datetimes, like every other date in the database.
+
+A schedule's sequence is anchored on its next_occurrence: daily, weekly and
+biweekly occurrences are whole numbers of days after it, so a biweekly
+schedule keeps its weeks, and monthly occurrences fall on day_of_month,
+clamped to the length of shorter months (31 -> Feb 28, Apr 30, ...) without
+shifting the following months.
+
+expand() works on NumPy datetime64 arrays over all schedules at once; the
+only per-value Python work is one UTC offset lookup per distinct hour and
+timezone, which also makes DST-observing timezones correct.
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+_UTC = ZoneInfo("UTC")
+
+DEFAULT_TIMEZONE = os.getenv("RECURRING_DEFAULT_TIMEZONE", "Africa/Abidjan")
+
+FREQUENCY_DAYS = {"daily": 1, "weekly": 7, "biweekly": 14}
+FREQUENCIES = ("daily", "weekly", "biweekly", "monthly")
+
+# Extra occurrences computed per schedule: stepping on the local clock can land
+# one before the start in a short month and one more around a DST change
+_SLACK = 2
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo for an IANA name (the default timezone for None); ValueError if unknown."""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def parse_scheduled_time(value: str) -> int:
+    """Minutes after midnight of an "HH:MM" time; ValueError if malformed."""
+    hours, separator, minutes = str(value).strip().partition(":")
+    if not separator or not hours.isdigit() or not minutes.isdigit():
+        raise ValueError(f"Invalid scheduled_time: {value}")
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"Invalid scheduled_time: {value}")
+    return hours * 60 + minutes
+
+
+def _minute_of_day(schedule: Dict[str, Any]) -> int:
+    """Scheduled minute of the day, or -1 to keep the time of next_occurrence."""
+    try:
+        return parse_scheduled_time(schedule.get("scheduled_time"))
+    except ValueError:
+        return -1
+
+
+def _utc_offsets(tz: ZoneInfo, values: np.ndarray, from_utc: bool) -> np.ndarray:
+    """
+    UTC offset of each datetime64 value, as timedelta64[s].
+
+    Values are UTC instants when from_utc, otherwise local wall times.
+    Offsets are looked up once per distinct hour.
+    """
+    hours, inverse = np.unique(values.astype("datetime64[h]"), return_inverse=True)
+    offsets = []
+    for hour in hours.astype("datetime64[s]").tolist():
+        if from_utc:
+            offset = hour.replace(tzinfo=_UTC).astimezone(tz).utcoffset()
+        else:
+            offset = tz.utcoffset(hour)
+        offsets.append(int(offset.total_seconds()))
+    return np.asarray(offsets, dtype="timedelta64[s]")[inverse.reshape(values.shape)]
+
+
+def _expand_local(
+    frequency: np.ndarray,
+    anchor: np.ndarray,
+    minute: np.ndarray,
+    day_of_month: np.ndarray,
+    start: np.ndarray,
+    width: int
+) -> np.ndarray:
+    """`width` local occurrences per schedule, from the last one before `start` at the earliest."""
+    anchor_day = anchor.astype("datetime64[D]")
+    minute = np.where(minute >= 0, minute, (anchor - anchor_day).astype(np.int64) // 60)
+    time_of_day = minute.astype("timedelta64[m]").astype("timedelta64[s]")
+    steps = np.arange(width)
+    local = np.empty((len(anchor), width), dtype="datetime64[s]")
+
+    step_days = np.array([FREQUENCY_DAYS.get(f, 0) for f in frequency], dtype=np.int64)
+    by_days = step_days > 0
+    if by_days.any():
+        step = step_days[by_days]
+        first = anchor_day[by_days] + time_of_day[by_days]
+        behind = (start[by_days] - first).astype(np.int64)
+        skip = np.maximum(-(-behind // (step * 86400)), 0)
+        offsets = ((skip[:, None] + steps) * step[:, None]).astype("timedelta64[D]")
+        local[by_days] = anchor_day[by_days][:, None] + offsets + time_of_day[by_days][:, None]
+
+    monthly = frequency == "monthly"
+    if monthly.any():
+        anchor_month = anchor_day[monthly].astype("datetime64[M]")
+        skip = np.maximum((start[monthly].astype("datetime64[M]") - anchor_month).astype(np.int64), 0)
+        months = anchor_month[:, None] + (skip[:, None] + steps).astype("timedelta64[M]")
+        month_starts = months.astype("datetime64[D]")
+        month_lengths = ((months + 1).astype("datetime64[D]") - month_starts).astype(np.int64)
+        anchor_dom = (anchor_day[monthly] - anchor_month.astype("datetime64[D]")).astype(np.int64) + 1
+        wanted = np.where(day_of_month[monthly] > 0, day_of_month[monthly], anchor_dom)
+        days = np.minimum(wanted[:, None], month_lengths) - 1
+        local[monthly] = month_starts + days.astype("timedelta64[D]") + time_of_day[monthly][:, None]
+
+    unknown = ~(by_days | monthly)
+    if unknown.any():
+        raise ValueError(f"Unknown frequency: {frequency[unknown][0]}")
+    return local
+
+
+def expand(
+    schedules: Sequence[Dict[str, Any]],
+    start: Union[datetime, Sequence[datetime]],
+    count: int = 1
+) -> np.ndarray:
+    """
+    The next `count` occurrences of each schedule.
+
+    Args:
+        schedules: Schedule documents (frequency, next_occurrence, scheduled_time,
+            day_of_month, timezone)
+        start: UTC datetime, or one per schedule; occurrences are at or after
+            it, and never before the schedule's next_occurrence
+
+    Returns:
+        datetime64[s] array of shape (len(schedules), count), in UTC
+    """
+    size = len(schedules)
+    result = np.empty((size, count), dtype="datetime64[s]")
+    if size == 0 or count <= 0:
+        return result
+
+    anchors = np.array([s["next_occurrence"] for s in schedules], dtype="datetime64[s]")
+    starts = np.broadcast_to(np.asarray(start, dtype="datetime64[s]"), (size,))
+    starts = np.maximum(starts, anchors)
+    frequency = np.array([s["frequency"] for s in schedules])
+    minute = np.array([_minute_of_day(s) for s in schedules], dtype=np.int64)
+    day_of_month = np.array([s.get("day_of_month") or 0 for s in schedules], dtype=np.int64)
+    zones = np.array([s.get("timezone") or DEFAULT_TIMEZONE for s in schedules])
+
+    for zone in np.unique(zones):
+        rows = np.flatnonzero(zones == zone)
+        tz = get_timezone(str(zone))
+        local = _expand_local(
+            frequency[rows],
+            anchors[rows] + _utc_offsets(tz, anchors[rows], from_utc=True),
+            minute[rows],
+            day_of_month[rows],
+            starts[rows] + _utc_offsets(tz, starts[rows], from_utc=True),
+            count + _SLACK
+        )
+        utc = local - _utc_offsets(tz, local, from_utc=False)
+        first = np.argmax(utc >= starts[rows][:, None], axis=1)
+        result[rows] = np.take_along_axis(utc, first[:, None] + np.arange(count), axis=1)
+    return result
+
+
+def first_occurrence(
+    frequency: str,
+    scheduled_time: str,
+    day_of_week: Optional[int] = None,
+    day_of_month: Optional[int] = None,
+    timezone: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> datetime:
+    """
+    First occurrence of a new schedule, at or after now (UTC).
+
+    Weekly schedules need day_of_week (0 = Monday) and monthly ones
+    day_of_month (1-31); a biweekly one without day_of_week starts on the
+    current weekday. Raises ValueError on invalid input.
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Invalid frequency. Must be one of: {', '.join(FREQUENCIES)}")
+    if frequency == "weekly" and day_of_week is None:
+        raise ValueError("day_of_week required for weekly tasks")
+    if frequency == "monthly" and day_of_month is None:
+        raise ValueError("day_of_month required for monthly tasks")
+    if day_of_week is not None and not 0 <= day_of_week <= 6:
+        raise ValueError("day_of_week must be between 0 (Monday) and 6 (Sunday)")
+    if day_of_month is not None and not 1 <= day_of_month <= 31:
+        raise ValueError("day_of_month must be between 1 and 31")
+    parse_scheduled_time(scheduled_time)
+    tz = get_timezone(timezone)
+
+    now = now or datetime.utcnow()
+    today: date = now.replace(tzinfo=_UTC).astimezone(tz).date()
+    if frequency in ("weekly", "biweekly") and day_of_week is not None:
+        today += timedelta(days=(day_of_week - today.weekday()) % 7)
+    elif frequency == "monthly":
+        today = today.replace(day=1)
+    # Local midnight of the anchor day, in UTC
+    anchor = datetime.combine(today, time(), tzinfo=tz).astimezone(_UTC).replace(tzinfo=None)
+
+    schedule = {
+        "frequency": frequency,
+        "next_occurrence": anchor,
+        "scheduled_time": scheduled_time,
+        "day_of_month": day_of_month,
+        "timezone": timezone,
+    }
+    return expand([schedule], now)[0, 0].astype(datetime)
@@ -0,0 +1,279 @@
+"""
+Recurring Task Scheduler
+Turns recurring_tasks schedules into concrete tasks.
+
+Every worker runs scheduler_loop(), but only the holder of the
+"recurring_task_scheduler" lease (see leases) generates tasks; the others
+just retry the lease, so one replica takes over when the leader dies.
+
+The leader sleeps until the earliest active next_occurrence is within
+RECURRING_LEAD_HOURS (an indexed point read on is_active + next_occurrence),
+until wake() is called after a schedule changed on this worker, or until the
+lease must be renewed (LEASE_TTL_SECONDS / 2, which also bounds how late a
+schedule created on another replica is seen). Each pass loads only the due
+schedules, in batches of BATCH_SIZE, and expands them together (recurrence):
+
+- occurrences that were missed while nothing ran are skipped, not booked
+  in the past
+- every occurrence within the lead time becomes an assigned task, provided
+  the tasker's time is free (tasker_bookings); otherwise the client is told
+  that occurrence was skipped
+- tasks are written with one insert_many, schedules advanced with one bulk
+  write guarded by their previous next_occurrence, and notifications sent
+  in one batch
+
+Task ids are derived from (schedule id, occurrence), so a pass interrupted
+between inserting tasks and advancing schedules never books twice.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import recurrence
+import tasker_bookings
+import tasker_stats
+from leases import acquire_lease, release_lease
+from models import Task, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "recurring_task_scheduler"
+LEASE_TTL_SECONDS = 60
+LEAD_HOURS = float(os.getenv("RECURRING_LEAD_HOURS", "24"))
+BATCH_SIZE = 500
+# Enough occurrences of a daily schedule (the most frequent) to get past the lead window
+OCCURRENCES_PER_PASS = int(LEAD_HOURS // 24) + 3
+
+_TASK_ID_NAMESPACE = uuid.UUID("4f3c1f4e-2a47-4d8e-9a53-6f1e0b7c2d11")
+
+_wake_event: Optional[asyncio.Event] = None
+_stats = {
+    "is_leader": False,
+    "last_run_at": None,
+    "tasks_created": 0,
+    "schedules_caught_up": 0,
+    "conflicts": 0,
+}
+
+
+def wake():
+    """Re-plan now, e.g. after a schedule was created or reactivated on this worker."""
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+def occurrence_task_id(schedule_id: str, occurrence: datetime) -> str:
+    """Stable task id of one occurrence of a schedule."""
+    return str(uuid.uuid5(_TASK_ID_NAMESPACE, f"{schedule_id}:{occurrence.isoformat()}"))
+
+
+def _build_task(schedule: Dict[str, Any], occurrence: datetime, place: Dict[str, Any]) -> Dict[str, Any]:
+    task = Task(
+        id=occurrence_task_id(schedule["id"], occurrence),
+        title=schedule["title"],
+        description=schedule["description"],
+        category_id=schedule["category_id"],
+        duration_hours=schedule["estimated_hours"],
+        pricing_type="hourly",
+        hourly_rate=schedule["hourly_rate"],
+        task_date=occurrence,
+        address=place.get("address") or "",
+        city=place.get("city") or "",
+        latitude=place["latitude"],
+        longitude=place["longitude"],
+        client_id=schedule["client_id"],
+        assigned_tasker_id=schedule["assigned_tasker_id"],
+        total_cost=schedule["estimated_hours"] * schedule["hourly_rate"],
+        status=TaskStatus.ASSIGNED
+    ).model_dump()
+    task["recurring_task_id"] = schedule["id"]
+    return task
+
+
+def _place(schedule: Dict[str, Any], client: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Where occurrences happen: the schedule's own address, else the client's."""
+    for source in (schedule, client or {}):
+        if source.get("latitude") is not None and source.get("longitude") is not None:
+            return source
+    return None
+
+
+async def _run_batch(db: AsyncIOMotorDatabase, now: datetime) -> int:
+    """Generate the tasks of up to BATCH_SIZE due schedules. Returns the number of schedules handled."""
+    horizon = now + timedelta(hours=LEAD_HOURS)
+    schedules = await db.recurring_tasks.find(
+        {"is_active": True, "next_occurrence": {"$lte": horizon}},
+        {"_id": 0}
+    ).sort("next_occurrence", 1).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+    if not schedules:
+        return 0
+
+    client_ids = list({schedule["client_id"] for schedule in schedules})
+    clients = {
+        client["id"]: client
+        for client in await db.users.find(
+            {"id": {"$in": client_ids}},
+            {"_id": 0, "id": 1, "address": 1, "city": 1, "latitude": 1, "longitude": 1}
+        ).to_list(len(client_ids))
+    }
+
+    # Missed occurrences (nothing ran at the time) are skipped: expand from now
+    expanded = recurrence.expand(schedules, now, OCCURRENCES_PER_PASS)
+    due_counts = (expanded <= np.datetime64(horizon, "s")).sum(axis=1)
+
+    planned = []  # (schedule, [occurrences])
+    schedule_updates = []
+    notifications: List[Dict[str, Any]] = []
+    for schedule, row, due in zip(schedules, expanded.tolist(), due_counts.tolist()):
+        if schedule["next_occurrence"] < now:
+            _stats["schedules_caught_up"] += 1
+        occurrences = row[:due]
+
+        update = {"next_occurrence": row[due], "last_generated_at": now}
+        if occurrences and _place(schedule, clients.get(schedule["client_id"])) is None:
+            # No address to send the tasker to: pause instead of booking nowhere
+            update.update({"is_active": False, "paused_reason": "missing_location"})
+            occurrences = []
+            notifications.append({
+                "user_id": schedule["client_id"],
+                "notification_type": "recurring_task_paused",
+                "task_id": schedule["id"],
+                "task_title": schedule["title"],
+                "message": f"'{schedule['title']}' was paused: add an address to your profile to resume it"
+            })
+        planned.append((schedule, occurrences))
+        schedule_updates.append(UpdateOne(
+            {"id": schedule["id"], "next_occurrence": schedule["next_occurrence"]},
+            {"$set": update}
+        ))
+
+    # Occurrences already booked by an interrupted earlier pass
+    candidate_ids = [occurrence_task_id(s["id"], o) for s, occurrences in planned for o in occurrences]
+    existing = set(await db.tasks.distinct("id", {"id": {"$in": candidate_ids}})) if candidate_ids else set()
+
+    tasks: List[Dict[str, Any]] = []
+    assigned: Dict[str, int] = {}
+    for schedule, occurrences in planned:
+        place = _place(schedule, clients.get(schedule["client_id"]))
+        for occurrence in occurrences:
+            task = _build_task(schedule, occurrence, place)
+            if task["id"] in existing:
+                continue
+            start, end = tasker_bookings.booking_window(occurrence, schedule["estimated_hours"])
+            if await tasker_bookings.reserve(db, schedule["assigned_tasker_id"], task["id"], start, end):
+                _stats["conflicts"] += 1
+                notifications.append({
+                    "user_id": schedule["client_id"],
+                    "notification_type": "recurring_task_skipped",
+                    "task_id": task["id"],
+                    "task_title": schedule["title"],
+                    "message": f"'{schedule['title']}' on {occurrence:%Y-%m-%d %H:%M} was skipped: the tasker is already booked"
+                })
+                continue
+            tasks.append(task)
+            assigned[schedule["assigned_tasker_id"]] = assigned.get(schedule["assigned_tasker_id"], 0) + 1
+            notifications.append({
+                "user_id": schedule["assigned_tasker_id"],
+                "notification_type": "new_booking",
+                "task_id": task["id"],
+                "task_title": schedule["title"],
+                "message": f"Recurring booking: '{schedule['title']}' on {occurrence:%Y-%m-%d %H:%M}"
+            })
+
+    if tasks:
+        try:
+            await db.tasks.insert_many(tasks, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                for task in tasks:
+                    await tasker_bookings.release(db, task["id"])
+                raise
+    await db.recurring_tasks.bulk_write(schedule_updates, ordered=False)
+
+    for tasker_id, amount in assigned.items():
+        await tasker_stats.record_task_assigned(db, tasker_id, amount)
+
+    from notification_routes import create_notifications
+    await create_notifications(db, notifications)
+
+    _stats["tasks_created"] += len(tasks)
+    logger.info(f"Recurring scheduler: {len(schedules)} schedules, {len(tasks)} tasks created")
+    return len(schedules)
+
+
+async def run_due(db: AsyncIOMotorDatabase, now: Optional[datetime] = None) -> int:
+    """
+    Generate every task due within the lead time.
+
+    Returns:
+        Number of schedules handled
+    """
+    now = now or datetime.utcnow()
+    handled = 0
+    while True:
+        count = await _run_batch(db, now)
+        handled += count
+        if count < BATCH_SIZE:
+            break
+    _stats["last_run_at"] = now
+    return handled
+
+
+async def _seconds_until_due(db: AsyncIOMotorDatabase) -> Optional[float]:
+    """Seconds until the earliest active schedule enters the lead window, or None if there is none."""
+    earliest = await db.recurring_tasks.find_one(
+        {"is_active": True},
+        {"_id": 0, "next_occurrence": 1},
+        sort=[("next_occurrence", 1)]
+    )
+    if not earliest:
+        return None
+    due_at = earliest["next_occurrence"] - timedelta(hours=LEAD_HOURS)
+    return max((due_at - datetime.utcnow()).total_seconds(), 0.0)
+
+
+async def scheduler_loop(db: AsyncIOMotorDatabase):
+    """Run forever: generate due tasks while holding the lease, otherwise wait for it."""
+    global _wake_event
+    _wake_event = asyncio.Event()
+    try:
+        while True:
+            delay = LEASE_TTL_SECONDS / 2
+            try:
+                _stats["is_leader"] = await acquire_lease(db, LEASE_NAME, LEASE_TTL_SECONDS)
+                if _stats["is_leader"]:
+                    await run_due(db)
+                    # Renew the lease well before it expires, even when idle
+                    due_in = await _seconds_until_due(db)
+                    if due_in is not None:
+                        delay = min(due_in, delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Recurring scheduler pass failed: {str(e)}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            _wake_event.clear()
+    finally:
+        if _stats["is_leader"]:
+            try:
+                await release_lease(db, LEASE_NAME)
+            except Exception as e:
+                logger.error(f"Failed to release scheduler lease: {str(e)}")
+            _stats["is_leader"] = False
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
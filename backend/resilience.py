@@ -0,0 +1,267 @@
+"""
+Resilience
+Guards calls to third-party services (payment gateway, translator, LLM) so a
+slow or failing dependency degrades only the endpoints that need it.
+
+Each dependency gets:
+
+- a bulkhead: at most max_concurrent calls in flight per worker; a call
+  waits up to max_wait_seconds for a slot, then fails fast instead of
+  piling up
+- a deadline: every call is cut off after timeout_seconds, or earlier when
+  the enclosing deadline() budget of the request runs out (route handlers
+  calling out take one with @with_deadline, so time spent on auth, the
+  database or a bulkhead wait is not given to the dependency again)
+- a circuit breaker: failure_threshold consecutive failures (errors or
+  timeouts) open the circuit and calls fail fast for reset_seconds; then up
+  to half_open_max trial calls are let through (half-open), and the first
+  success closes the circuit again while a failure re-opens it
+
+Fast failures raise DependencyUnavailable, a 503 HTTPException with a
+Retry-After header, so routes that re-raise HTTPException surface it as is.
+State is per worker process and reported by stats() on /api/metrics.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Absolute time.monotonic() by which the current request must be done
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("resilience_deadline", default=None)
+
+
+class DependencyUnavailable(HTTPException):
+    """A dependency call was refused or cut off without a usable result."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: float = 1.0):
+        self.dependency = dependency
+        self.reason = reason
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{dependency} is temporarily unavailable ({reason}), please retry shortly",
+            headers={"Retry-After": str(max(int(retry_after + 0.999), 1))}
+        )
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Budget for everything awaited inside the block; nested budgets only shrink it."""
+    limit = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(limit if current is None else min(current, limit))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds: float):
+    """Decorator running an async route handler inside deadline(seconds)."""
+    def decorate(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current deadline() block, or None outside one."""
+    limit = _deadline.get()
+    return None if limit is None else limit - time.monotonic()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial phase."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, half_open_max: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_max = half_open_max
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.times_opened = 0
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (counts a half-open trial)."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+            self.trials = 0
+        if self.state == HALF_OPEN:
+            if self.trials >= self.half_open_max:
+                return False
+            self.trials += 1
+        return True
+
+    def release_trial(self):
+        """Give back a half-open trial whose call ended without an outcome."""
+        if self.state == HALF_OPEN and self.trials > 0:
+            self.trials -= 1
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class Dependency:
+    """Bulkhead, deadline and circuit breaker around one external service."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int = 10,
+        max_wait_seconds: float = 1.0,
+        timeout_seconds: float = 10.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        half_open_max: int = 1
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait_seconds = max_wait_seconds
+        self.timeout_seconds = timeout_seconds
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds, half_open_max)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = {"circuit_open": 0, "bulkhead_full": 0, "deadline": 0}
+
+    def _reject(self, reason: str, retry_after: float = 1.0):
+        self.rejected[reason] += 1
+        raise DependencyUnavailable(self.name, reason, retry_after)
+
+    async def call(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        is_failure: Optional[Callable[[Any], bool]] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Await func(*args, **kwargs) under the dependency's guards.
+
+        Exceptions raised by func count as failures and propagate; so do
+        results for which is_failure(result) is true (e.g. a 5xx response),
+        which are still returned.
+
+        Raises:
+            DependencyUnavailable: circuit open, no free slot in time, or the
+                deadline passed before or during the call
+        """
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            self._reject("deadline")
+        timeout = self.timeout_seconds if budget is None else min(self.timeout_seconds, budget)
+
+        if not self.breaker.allow():
+            self._reject("circuit_open", self.breaker.retry_after())
+
+        # A half-open trial that ends without a success or failure (no slot,
+        # deadline, cancellation) is given back so the next call can try
+        settled = False
+        try:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=min(self.max_wait_seconds, timeout))
+            except asyncio.TimeoutError:
+                self._reject("bulkhead_full")
+
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                self._slots.release()
+                self._reject("deadline")
+
+            self.active += 1
+            self.calls += 1
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout=remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                settled = True
+                self._failed()
+                logger.warning(f"{self.name} call timed out after {timeout:.1f}s")
+                self._reject("deadline", self.breaker.retry_after() if self.breaker.state == OPEN else 1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                settled = True
+                self._failed()
+                raise
+            finally:
+                self.active -= 1
+                self._slots.release()
+
+            settled = True
+            if is_failure is not None and is_failure(result):
+                self._failed()
+            else:
+                self.breaker.record_success()
+            return result
+        finally:
+            if not settled:
+                self.breaker.release_trial()
+
+    def _failed(self):
+        self.failures += 1
+        was_open = self.breaker.state == OPEN
+        self.breaker.record_failure()
+        if self.breaker.state == OPEN and not was_open:
+            logger.error(f"Circuit for {self.name} opened for {self.breaker.reset_seconds}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "times_opened": self.breaker.times_opened,
+            "retry_after_seconds": round(self.breaker.retry_after(), 1) if self.breaker.state == OPEN else 0,
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": dict(self.rejected),
+        }
+
+
+_dependencies: Dict[str, Dependency] = {}
+
+
+def dependency(name: str, **config) -> Dependency:
+    """The guard for a named dependency, created with `config` on first use."""
+    if name not in _dependencies:
+        _dependencies[name] = Dependency(name, **config)
+    return _dependencies[name]
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: dep.stats() for name, dep in _dependencies.items()}
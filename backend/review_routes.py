@@ -8,9 +8,13 @@ from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 from typing import List
+import asyncio
 import logging
 
 from database import get_database
+import outbox
+import resilience
+import tasker_stats
 from models import User, UserRole, Review, ReviewCreate, TaskerRating
 
 logger = logging.getLogger(__name__)
@@ -107,8 +111,9 @@ async def create_review(
         
         await db.reviews.insert_one(review.model_dump())
         
-        # Update tasker's rating summary
-        await update_tasker_rating(db, task.get("assigned_tasker_id"))
+        # Update tasker's rating aggregates in the background
+        if review.tasker_id:
+            await outbox.enqueue(db, outbox.tasker_stat("review", review.tasker_id, rating=review.rating))
         
         logger.info(f"Review created for task {review_data.task_id} by client {current_user.id}")
         
@@ -153,46 +158,13 @@ async def get_tasker_rating(
 ):
     """Get aggregated rating information for a tasker."""
     try:
-        # Get all reviews
-        reviews = await db.reviews.find(
-            {"tasker_id": tasker_id, "verified_booking": True},
-            {"_id": 0, "rating": 1}
-        ).to_list(1000)
-        
-        # Get total completed tasks
-        completed_tasks_count = await db.tasks.count_documents({
-            "assigned_tasker_id": tasker_id,
-            "status": "completed",
-            "is_paid": True
-        })
-        
-        if not reviews:
-            return TaskerRating(
-                tasker_id=tasker_id,
-                average_rating=0.0,
-                total_reviews=0,
-                total_completed_tasks=completed_tasks_count,
-                rating_distribution={1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-            )
-        
-        # Calculate statistics
-        total_reviews = len(reviews)
-        total_rating = sum(r["rating"] for r in reviews)
-        average_rating = round(total_rating / total_reviews, 1)
-        
-        # Rating distribution
-        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for review in reviews:
-            rating = review["rating"]
-            rating_distribution[rating] = rating_distribution.get(rating, 0) + 1
-        
-        return TaskerRating(
-            tasker_id=tasker_id,
-            average_rating=average_rating,
-            total_reviews=total_reviews,
-            total_completed_tasks=completed_tasks_count,
-            rating_distribution=rating_distribution
-        )
+        summary = await tasker_stats.get_rating_summary(db, tasker_id) or {
+            "average_rating": 0.0,
+            "total_reviews": 0,
+            "rating_distribution": {star: 0 for star in tasker_stats.STARS},
+            "total_completed_tasks": 0
+        }
+        return TaskerRating(tasker_id=tasker_id, **summary)
     
     except Exception as e:
         logger.error(f"Error calculating rating: {str(e)}", exc_info=True)
@@ -263,27 +235,6 @@ async def can_review_task(
         return {"can_review": False, "reason": "Error checking eligibility"}
 
 
-async def update_tasker_rating(db: AsyncIOMotorDatabase, tasker_id: str):
-    """Update cached tasker rating in tasker_profiles collection."""
-    try:
-        rating_info = await get_tasker_rating(tasker_id, db)
-        
-        await db.tasker_profiles.update_one(
-            {"user_id": tasker_id},
-            {
-                "$set": {
-                    "average_rating": rating_info.average_rating,
-                    "total_reviews": rating_info.total_reviews,
-                    "total_completed_tasks": rating_info.total_completed_tasks,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-    except Exception as e:
-        logger.error(f"Error updating tasker rating cache: {str(e)}")
-
-
-
 @router.get("/client/{client_id}/stats")
 async def get_client_stats(
     client_id: str,
@@ -313,6 +264,7 @@ async def get_client_stats(
 
 
 
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 
 class TranslateRequest(BaseModel):
@@ -320,7 +272,22 @@ class TranslateRequest(BaseModel):
     target_lang: str
 
 
+# Google Translate is best effort: give up quickly and show the original text
+TRANSLATOR = resilience.dependency("translator", max_concurrent=8, timeout_seconds=5, reset_seconds=60)
+TRANSLATE_BUDGET_SECONDS = 6
+
+# The translator client is synchronous and its threads cannot be cancelled,
+# so a timed-out call keeps running. A pool the size of the bulkhead caps
+# those threads and keeps them off the loop's default executor.
+_translate_pool = ThreadPoolExecutor(max_workers=TRANSLATOR.max_concurrent, thread_name_prefix="translator")
+
+
+async def _translate(translator, text: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_translate_pool, translator.translate, text)
+
+
 @router.post("/translate")
+@resilience.with_deadline(TRANSLATE_BUDGET_SECONDS)
 async def translate_review(request: TranslateRequest):
     """
     Translate review text between English and French.
@@ -339,9 +306,9 @@ async def translate_review(request: TranslateRequest):
         if not request.text or not request.text.strip():
             return {"translated_text": request.text}
         
-        # Translate the text
+        # Translate the text off the event loop (the client is synchronous)
         translator = GoogleTranslator(source='auto', target=request.target_lang)
-        translated_text = translator.translate(request.text)
+        translated_text = await TRANSLATOR.call(_translate, translator, request.text)
         
         return {
             "original_text": request.text,
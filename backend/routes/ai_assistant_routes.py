@@ -14,6 +14,7 @@ import logging
 import os
 
 from database import get_database
+import resilience
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,16 @@ router = APIRouter(prefix="/api/ai-assistant", tags=["ai_assistant"])
 # Get the Emergent LLM key from environment
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
+# LLM replies are slow at the best of times; cap how many requests wait on them
+LLM = resilience.dependency(
+    "llm",
+    max_concurrent=int(os.environ.get('AI_ASSISTANT_MAX_CONCURRENCY', '5')),
+    max_wait_seconds=2,
+    timeout_seconds=float(os.environ.get('AI_ASSISTANT_TIMEOUT_SECONDS', '45'))
+)
+# Whole-request budget: auth and the category lookup come out of the LLM's time
+CHAT_BUDGET_SECONDS = LLM.timeout_seconds + 5
+
 class ChatMessage(BaseModel):
     role: str  # 'user' or 'assistant'
     content: str
@@ -40,6 +51,7 @@ class ChatResponse(BaseModel):
 
 
 @router.post("/chat", response_model=ChatResponse)
+@resilience.with_deadline(CHAT_BUDGET_SECONDS)
 async def chat_with_assistant(
     request: ChatRequest,
     db: AsyncIOMotorDatabase = Depends(get_database),
@@ -99,7 +111,7 @@ Respond in the user's preferred language. Keep it BRIEF and ACTION-oriented."""
         user_message = UserMessage(text=request.message)
         
         # Send message and get response
-        response_text = await chat.send_message(user_message)
+        response_text = await LLM.call(chat.send_message, user_message)
         
         # Store chat history in database for persistence
         chat_record = {
@@ -117,6 +129,8 @@ Respond in the user's preferred language. Keep it BRIEF and ACTION-oriented."""
             session_id=request.session_id
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in AI chat: {str(e)}")
         raise HTTPException(
@@ -12,6 +12,9 @@ import os
 from pathlib import Path
 
 from database import get_database
+import user_cache
+import tasker_search
+from utils import geo_point
 from auth import create_access_token, get_current_user
 from models import (
     UserInDB, UserCreate, UserResponse, UserRole, Token,
@@ -35,7 +38,11 @@ async def register(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_data
     # Create user
     from models import UserInDB
     new_user = UserInDB(**user.model_dump())
-    await db.users.insert_one(new_user.model_dump())
+    user_doc = new_user.model_dump()
+    location = geo_point(new_user.latitude, new_user.longitude)
+    if location:
+        user_doc["location"] = location
+    await db.users.insert_one(user_doc)
     
     # Create tasker profile if role is tasker
     if user.role == UserRole.TASKER:
@@ -45,6 +52,7 @@ async def register(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_data
             hourly_rate=user.hourly_rate or 5000.0
         )
         await db.tasker_profiles.insert_one(tasker_profile.model_dump())
+        await tasker_search.sync_profile(db, new_user.id)
     
     logger.info(f"New user registered: {new_user.email}")
     return UserResponse(**new_user.model_dump())
@@ -111,6 +119,7 @@ async def update_profile(
         {"id": current_user.id},
         {"$set": update_data}
     )
+    user_cache.invalidate_user(current_user.id)
     
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
     return UserResponse(**updated_user)
@@ -132,9 +141,11 @@ async def update_user_location(
         {"$set": {
             "latitude": latitude,
             "longitude": longitude,
+            "location": geo_point(latitude, longitude),
             "updated_at": datetime.utcnow()
         }}
     )
+    user_cache.invalidate_user(current_user.id)
     
     logger.info(f"User {current_user.id} location updated")
     return {"message": "Location updated", "latitude": latitude, "longitude": longitude}
@@ -170,5 +181,6 @@ async def upload_profile_image(
         {"id": current_user.id},
         {"$set": {"profile_image": image_url}}
     )
+    user_cache.invalidate_user(current_user.id)
     
     return {"image_url": image_url}
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from uuid import uuid4
 from pydantic import BaseModel
 import logging
 
 from database import get_database
+import user_cache
 from models import UserRole
 
 logger = logging.getLogger(__name__)
@@ -94,61 +95,123 @@ BADGE_DEFINITIONS = {
 }
 
 
-@router.get("/tasker/{tasker_id}", response_model=List[Badge])
-async def get_tasker_badges(
-    tasker_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    """Get all badges earned by a tasker."""
-    tasker = await db.users.find_one({"id": tasker_id, "role": "tasker"}, {"_id": 0})
-    if not tasker:
-        raise HTTPException(status_code=404, detail="Tasker not found")
-    
-    profile = tasker.get("tasker_profile", {})
-    badges = []
+BATCH_MAX_TASKERS = 100
+
+# Fields the badge rules read; everything is precomputed on the user document
+BADGE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "is_verified": 1,
+    "verified_at": 1,
+    "tasker_profile.average_rating": 1,
+    "tasker_profile.total_reviews": 1,
+    "tasker_profile.completed_tasks": 1,
+    "tasker_profile.total_tasks": 1,
+    "tasker_profile.is_available": 1,
+    "tasker_profile.certifications": 1
+}
+
+
+class BadgeBatchRequest(BaseModel):
+    tasker_ids: List[str]
+
+
+def earned_badge_types(tasker: dict) -> List[str]:
+    """Badge types a tasker qualifies for, from the counters on their user document."""
+    profile = tasker.get("tasker_profile") or {}
+    earned = []
     
     # Check Verified badge
     if tasker.get("is_verified"):
-        badge = BADGE_DEFINITIONS[BadgeType.VERIFIED].copy()
-        badge.earned_at = tasker.get("verified_at")
-        badges.append(badge)
+        earned.append(BadgeType.VERIFIED)
     
     # Check Top Rated badge
     if profile.get("average_rating", 0) >= 4.5 and profile.get("total_reviews", 0) >= 10:
-        badge = BADGE_DEFINITIONS[BadgeType.TOP_RATED].copy()
-        badges.append(badge)
+        earned.append(BadgeType.TOP_RATED)
     
     # Check Experienced badge
     if profile.get("completed_tasks", 0) >= 50:
-        badge = BADGE_DEFINITIONS[BadgeType.EXPERIENCED].copy()
-        badges.append(badge)
+        earned.append(BadgeType.EXPERIENCED)
     
-    # Check Reliable badge (calculate completion rate)
-    total_tasks = await db.tasks.count_documents({"assigned_tasker_id": tasker_id})
-    completed_tasks = await db.tasks.count_documents({
-        "assigned_tasker_id": tasker_id,
-        "status": "completed"
-    })
-    if total_tasks > 0:
-        completion_rate = (completed_tasks / total_tasks) * 100
-        if completion_rate >= 95 and total_tasks >= 10:
-            badge = BADGE_DEFINITIONS[BadgeType.RELIABLE].copy()
-            badges.append(badge)
+    # Check Reliable badge (completion rate over every task ever assigned)
+    total_tasks = profile.get("total_tasks", 0)
+    if total_tasks >= 10 and profile.get("completed_tasks", 0) / total_tasks * 100 >= 95:
+        earned.append(BadgeType.RELIABLE)
     
     # Check Fast Responder badge (placeholder - would need response time tracking)
     # For now, we'll award it if tasker is available and has good rating
     if profile.get("is_available") and profile.get("average_rating", 0) >= 4.0:
-        badge = BADGE_DEFINITIONS[BadgeType.FAST_RESPONDER].copy()
-        badges.append(badge)
+        earned.append(BadgeType.FAST_RESPONDER)
     
     # Check Certified badge
-    if profile.get("certifications") and len(profile.get("certifications", [])) > 0:
-        badge = BADGE_DEFINITIONS[BadgeType.CERTIFIED].copy()
-        badges.append(badge)
+    if profile.get("certifications"):
+        earned.append(BadgeType.CERTIFIED)
     
+    return earned
+
+
+def badges_for(tasker: dict) -> List[Badge]:
+    """Badge objects earned by a tasker."""
+    badges = []
+    for badge_type in earned_badge_types(tasker):
+        badge = BADGE_DEFINITIONS[badge_type].copy()
+        if badge_type == BadgeType.VERIFIED:
+            badge.earned_at = tasker.get("verified_at")
+        badges.append(badge)
     return badges
 
 
+async def refresh_badges(db: AsyncIOMotorDatabase, tasker_id: str):
+    """
+    Recompute and persist tasker_profile.badges after an event that can
+    change them (review, task assignment or completion, verification,
+    profile update).
+    """
+    tasker = await db.users.find_one(
+        {"id": tasker_id, "role": "tasker", "tasker_profile": {"$type": "object"}},
+        {**BADGE_PROJECTION, "tasker_profile.badges": 1}
+    )
+    if tasker is None:
+        return
+    earned = earned_badge_types(tasker)
+    if earned != tasker["tasker_profile"].get("badges"):
+        await db.users.update_one({"id": tasker_id}, {"$set": {"tasker_profile.badges": earned}})
+        user_cache.invalidate_user(tasker_id)
+
+
+@router.get("/tasker/{tasker_id}", response_model=List[Badge])
+async def get_tasker_badges(
+    tasker_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get all badges earned by a tasker."""
+    tasker = await db.users.find_one({"id": tasker_id, "role": "tasker"}, BADGE_PROJECTION)
+    if not tasker:
+        raise HTTPException(status_code=404, detail="Tasker not found")
+    
+    return badges_for(tasker)
+
+
+@router.post("/batch", response_model=Dict[str, List[Badge]])
+async def get_badges_batch(
+    request: BadgeBatchRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Get the badges of many taskers with a single query.
+    Unknown ids are omitted from the response.
+    """
+    tasker_ids = list(dict.fromkeys(request.tasker_ids))
+    if len(tasker_ids) > BATCH_MAX_TASKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TASKERS} taskers per request")
+    
+    taskers = await db.users.find(
+        {"id": {"$in": tasker_ids}, "role": "tasker"},
+        BADGE_PROJECTION
+    ).to_list(len(tasker_ids))
+    return {tasker["id"]: badges_for(tasker) for tasker in taskers}
+
+
 @router.post("/verify/{tasker_id}")
 async def verify_tasker(
     tasker_id: str,
@@ -170,10 +233,13 @@ async def verify_tasker(
             "verified_at": datetime.utcnow()
         }}
     )
+    user_cache.invalidate_user(tasker_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Tasker not found")
     
+    await refresh_badges(db, tasker_id)
+    
     return {"message": "Tasker verified successfully"}
 
 
@@ -194,8 +260,11 @@ async def unverify_tasker(
         {"id": tasker_id, "role": "tasker"},
         {"$set": {"is_verified": False}, "$unset": {"verified_at": ""}}
     )
+    user_cache.invalidate_user(tasker_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Tasker not found")
     
+    await refresh_badges(db, tasker_id)
+    
     return {"message": "Verification removed successfully"}
@@ -6,12 +6,15 @@ Handles virtual currency for promotions and rewards.
 from fastapi import APIRouter, HTTPException, status, Depends, Form
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from typing import List, Optional
 from datetime import datetime
 from uuid import uuid4
 import logging
 
 from database import get_database
+import user_cache
 from models import UserRole
 from pydantic import BaseModel
 
@@ -86,10 +89,17 @@ async def award_coins(
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
-    # Check if user exists
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    # Credit atomically so concurrent awards and spends never overwrite each other
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$inc": {"coin_balance": amount}},
+        {"_id": 0, "coin_balance": 1},
+        return_document=ReturnDocument.BEFORE
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    user_cache.invalidate_user(user_id)
+    new_balance = user.get("coin_balance", 0) + amount
     
     # Create transaction
     transaction = {
@@ -104,15 +114,6 @@ async def award_coins(
     
     await db.coin_transactions.insert_one(transaction)
     
-    # Update user balance
-    current_balance = user.get("coin_balance", 0)
-    new_balance = current_balance + amount
-    
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"coin_balance": new_balance}}
-    )
-    
     return {
         "message": "Coins awarded successfully",
         "new_balance": new_balance
@@ -133,15 +134,21 @@ async def spend_coins(
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
-    # Check user balance
-    user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
-    current_balance = user.get("coin_balance", 0)
-    
-    if current_balance < amount:
+    # Debit only if the balance covers it, in the same atomic write
+    user = await db.users.find_one_and_update(
+        {"id": current_user.id, "coin_balance": {"$gte": amount}},
+        {"$inc": {"coin_balance": -amount}},
+        {"_id": 0, "coin_balance": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not user:
+        user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "coin_balance": 1}) or {}
         raise HTTPException(
             status_code=400,
-            detail=f"Insufficient coins. Balance: {current_balance}"
+            detail=f"Insufficient coins. Balance: {user.get('coin_balance', 0)}"
         )
+    user_cache.invalidate_user(current_user.id)
+    new_balance = user["coin_balance"] - amount
     
     # Create transaction
     transaction = {
@@ -156,13 +163,6 @@ async def spend_coins(
     
     await db.coin_transactions.insert_one(transaction)
     
-    # Update user balance
-    new_balance = current_balance - amount
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"coin_balance": new_balance}}
-    )
-    
     # Calculate discount amount (e.g., 1 coin = 100 CFA)
     discount_cfa = amount * 100
     
@@ -174,10 +174,15 @@ async def spend_coins(
 
 
 async def auto_award_coins_for_task(db, user_id: str, task_id: str, task_title: str):
-    """Auto-award coins after task completion (called by task completion logic)."""
+    """
+    Auto-award coins after task completion (called by task completion logic).
+    
+    Awarded at most once per user and task: the transaction id is derived from
+    both, so a repeated call stops at the duplicate insert.
+    """
     # Award 10 coins for completing a task
     transaction = {
-        "id": str(uuid4()),
+        "id": f"task_reward:{task_id}:{user_id}",
         "user_id": user_id,
         "amount": 10,
         "transaction_type": "task_reward",
@@ -186,17 +191,18 @@ async def auto_award_coins_for_task(db, user_id: str, task_id: str, task_title:
         "created_at": datetime.utcnow()
     }
     
-    await db.coin_transactions.insert_one(transaction)
+    try:
+        await db.coin_transactions.insert_one(transaction)
+    except DuplicateKeyError:
+        logger.info(f"Coins for task {task_id} already awarded to user {user_id}")
+        return
     
     # Update user balance
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    current_balance = user.get("coin_balance", 0)
-    new_balance = current_balance + 10
-    
     await db.users.update_one(
         {"id": user_id},
-        {"$set": {"coin_balance": new_balance}}
+        {"$inc": {"coin_balance": 10}}
     )
+    user_cache.invalidate_user(user_id)
     
     logger.info(f"Awarded 10 coins to user {user_id} for task completion")
 
@@ -220,5 +226,6 @@ async def award_welcome_bonus(db, user_id: str):
         {"id": user_id},
         {"$set": {"coin_balance": 50}}
     )
+    user_cache.invalidate_user(user_id)
     
     logger.info(f"Awarded 50 welcome coins to user {user_id}")
@@ -13,6 +13,7 @@ import logging
 
 from database import get_database
 from models import UserRole
+import outbox
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -107,18 +108,16 @@ async def create_dispute(
     
     await db.disputes.insert_one(dispute)
     
-    # Send notification to the other party
-    from notification_routes import create_notification
+    # Notify the other party
     notify_user_id = task["client_id"] if is_tasker else task.get("assigned_tasker_id")
     if notify_user_id:
-        await create_notification(
-            db=db,
+        await outbox.enqueue(db, outbox.notification(
             user_id=notify_user_id,
             notification_type="dispute_raised",
             task_id=task_id,
             task_title=task.get("title", "Task"),
             message=f"A dispute has been raised for task: {task.get('title')}"
-        )
+        ))
     
     return Dispute(**dispute)
 
@@ -205,23 +204,23 @@ async def resolve_dispute(
     
     await db.disputes.update_one({"id": dispute_id}, {"$set": update_data})
     
-    # Send notifications to both parties
-    from notification_routes import create_notification
-    await create_notification(
-        db=db,
-        user_id=dispute["client_id"],
-        notification_type="dispute_resolved",
-        task_id=dispute["task_id"],
-        task_title=dispute["task_title"],
-        message=f"Your dispute has been resolved: {resolution}"
-    )
-    await create_notification(
-        db=db,
-        user_id=dispute["tasker_id"],
-        notification_type="dispute_resolved",
-        task_id=dispute["task_id"],
-        task_title=dispute["task_title"],
-        message=f"Dispute resolved: {resolution}"
+    # Notify both parties
+    await outbox.enqueue(
+        db,
+        outbox.notification(
+            user_id=dispute["client_id"],
+            notification_type="dispute_resolved",
+            task_id=dispute["task_id"],
+            task_title=dispute["task_title"],
+            message=f"Your dispute has been resolved: {resolution}"
+        ),
+        outbox.notification(
+            user_id=dispute["tasker_id"],
+            notification_type="dispute_resolved",
+            task_id=dispute["task_id"],
+            task_title=dispute["task_title"],
+            message=f"Dispute resolved: {resolution}"
+        )
     )
     
     return {"message": "Dispute resolved successfully", "resolution": resolution}
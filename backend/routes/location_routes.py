@@ -1,16 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
+from typing import Any, Dict, Optional
+import asyncio
+import json
 import logging
+import os
 
 from models import LocationUpdate, TaskerLocation, UserRole
 from auth import get_current_user, oauth2_scheme
 from database import get_database
-from utils import calculate_distance, calculate_eta
+from utils import calculate_distance, calculate_eta, path_length_km
+from live_location import live_locations
+from realtime import hub
+import location_tracks
+import outbox
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["location"])
 
+STREAM_HEARTBEAT_SECONDS = 20
+# Floor for the per-subscriber push interval; clients may ask for slower, never faster
+STREAM_MIN_INTERVAL_SECONDS = float(os.getenv("LOCATION_STREAM_MIN_INTERVAL_SECONDS", "1"))
+STREAM_DEFAULT_INTERVAL_SECONDS = max(2.0, STREAM_MIN_INTERVAL_SECONDS)
+
+
+def location_room(task_id: str) -> str:
+    """Realtime hub room for a task's live location."""
+    return f"location:{task_id}"
+
+
+def _location_event(fix: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "location",
+        "task_id": fix["task_id"],
+        "tasker_id": fix["tasker_id"],
+        "latitude": fix["latitude"],
+        "longitude": fix["longitude"],
+        "recorded_at": fix["recorded_at"].isoformat(),
+        "distance_km": fix.get("distance_km"),
+        "eta_minutes": fix.get("eta_minutes"),
+        "seq": fix["seq"]
+    }
+
+
+def _accept_fix(task_id: str, tasker_id: str, latitude: float, longitude: float, **kwargs) -> Dict[str, Any]:
+    """Record a fix in the live location store and push it to the task's subscribers."""
+    previous = live_locations.get(task_id)
+    fix = live_locations.update(task_id, tasker_id, latitude, longitude, **kwargs)
+    # The store hands back the previous fix when this one arrived late
+    if fix is not previous:
+        hub.publish(location_room(task_id), _location_event(fix))
+    return fix
+
+
+def _tracking_snapshot(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Tracking state of a task from its latest fix, or the last flushed position."""
+    task_id = task["id"]
+    fix = live_locations.get(task_id) if task.get("is_tracking") else None
+    if fix:
+        return {
+            "is_tracking": True,
+            "tracking_started_at": task.get("tracking_started_at"),
+            "current_latitude": fix["latitude"],
+            "current_longitude": fix["longitude"],
+            "last_location_update": fix["recorded_at"],
+            "eta_minutes": fix.get("eta_minutes"),
+            "seq": fix["seq"]
+        }
+    
+    # Nothing received by this process yet: last flushed position
+    return {
+        "is_tracking": bool(task.get("is_tracking")),
+        "tracking_started_at": task.get("tracking_started_at"),
+        "current_latitude": task.get("current_latitude"),
+        "current_longitude": task.get("current_longitude"),
+        "last_location_update": task.get("last_location_update"),
+        "eta_minutes": None,
+        "seq": None
+    }
+
 
 @router.post("/location/update")
 async def update_tasker_location(
@@ -26,7 +97,7 @@ async def update_tasker_location(
         raise HTTPException(status_code=403, detail="Only taskers can update location")
     
     # Verify task assignment
-    task = await db.tasks.find_one({"id": location.task_id}, {"_id": 0})
+    task = await live_locations.get_task(db, location.task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -40,27 +111,19 @@ async def update_tasker_location(
             location.latitude, location.longitude,
             task["latitude"], task["longitude"]
         )
-        eta_minutes = calculate_eta(distance)
-    
-    # Create or update location record
-    location_data = TaskerLocation(
-        tasker_id=current_user.id,
-        task_id=location.task_id,
-        latitude=location.latitude,
-        longitude=location.longitude,
-        is_en_route=True,
-        estimated_arrival_minutes=eta_minutes
-    )
+        eta_minutes = calculate_eta(distance, city=task.get("city"))
     
-    await db.tasker_locations.update_one(
-        {"tasker_id": current_user.id, "task_id": location.task_id},
-        {"$set": location_data.model_dump()},
-        upsert=True
+    # Written to tasker_locations by the next live location flush
+    fix = _accept_fix(
+        location.task_id, current_user.id,
+        location.latitude, location.longitude,
+        eta_minutes=eta_minutes
     )
     
     return {
         "message": "Location updated",
-        "estimated_arrival_minutes": eta_minutes
+        "estimated_arrival_minutes": fix.get("eta_minutes"),
+        "seq": fix["seq"]
     }
 
 
@@ -83,7 +146,18 @@ async def get_tasker_location(
     if current_user.role == UserRole.CLIENT and task["client_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get location
+    # Latest fix from memory, falling back to the last flushed one
+    fix = live_locations.get(task_id)
+    if fix and fix["tasker_id"] == tasker_id:
+        return TaskerLocation(
+            tasker_id=tasker_id,
+            task_id=task_id,
+            latitude=fix["latitude"],
+            longitude=fix["longitude"],
+            timestamp=fix["recorded_at"],
+            estimated_arrival_minutes=fix.get("eta_minutes")
+        )
+    
     location = await db.tasker_locations.find_one(
         {"tasker_id": tasker_id, "task_id": task_id},
         {"_id": 0}
@@ -127,17 +201,17 @@ async def start_gps_tracking(
             "tracking_started_at": datetime.utcnow()
         }}
     )
+    live_locations.forget_task(task_id)
+    hub.publish(location_room(task_id), {"type": "tracking_started", "task_id": task_id})
     
-    # Create notification for client that tasker is on the way
-    from notification_routes import create_notification
-    await create_notification(
-        db=db,
+    # Notify the client that the tasker is on the way
+    await outbox.enqueue(db, outbox.notification(
         user_id=task["client_id"],
         notification_type="tasker_on_way",
         task_id=task_id,
         task_title=task.get("title", "Task"),
         message="Your tasker is on the way!"
-    )
+    ))
     
     logger.info(f"GPS tracking started for task {task_id}")
     return {"message": "GPS tracking started", "task_id": task_id}
@@ -164,6 +238,7 @@ async def stop_gps_tracking(
         raise HTTPException(status_code=403, detail="Task not assigned to you")
     
     # Update task to stop tracking
+    live_locations.discard(task_id)
     await db.tasks.update_one(
         {"id": task_id},
         {"$set": {
@@ -172,6 +247,7 @@ async def stop_gps_tracking(
             "current_longitude": None
         }}
     )
+    hub.publish(location_room(task_id), {"type": "tracking_stopped", "task_id": task_id})
     
     logger.info(f"GPS tracking stopped for task {task_id}")
     return {"message": "GPS tracking stopped"}
@@ -186,14 +262,13 @@ async def update_tracking_location(
 ):
     """Update tasker's current GPS location during tracking."""
     from auth import get_current_user as get_user
-    from math import radians, sin, cos, sqrt, atan2
     
     current_user = await get_user(token, db)
     
     if current_user.role != UserRole.TASKER:
         raise HTTPException(status_code=403, detail="Only taskers can update location")
     
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await live_locations.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -217,33 +292,181 @@ async def update_tracking_location(
     eta_minutes = None
     
     if job_lat and job_lng:
-        # Haversine formula
-        R = 6371  # Earth radius in km
-        lat1, lon1 = radians(latitude), radians(longitude)
-        lat2, lon2 = radians(job_lat), radians(job_lng)
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance_km = R * c
-        
-        # Estimate ETA (assuming 30 km/h average speed in city)
-        avg_speed_kmh = 30
-        eta_minutes = int((distance_km / avg_speed_kmh) * 60)
-    
-    # Update task location
-    await db.tasks.update_one(
-        {"id": task_id},
-        {"$set": {
-            "current_latitude": latitude,
-            "current_longitude": longitude,
-            "last_location_update": datetime.utcnow()
-        }}
+        distance_km = calculate_distance(latitude, longitude, job_lat, job_lng)
+        eta_minutes = calculate_eta(distance_km, city=task.get("city"))
+    
+    # Device timestamp (ms since epoch) lets late, out-of-order fixes be dropped
+    recorded_at = None
+    if location_data.get("timestamp"):
+        try:
+            recorded_at = min(datetime.utcfromtimestamp(location_data["timestamp"] / 1000), datetime.utcnow())
+        except (TypeError, ValueError, OverflowError):
+            raise HTTPException(status_code=400, detail="Invalid timestamp")
+    
+    # Written to the task by the next live location flush
+    fix = _accept_fix(
+        task_id, current_user.id, latitude, longitude,
+        recorded_at=recorded_at,
+        distance_km=round(distance_km, 2) if distance_km else None,
+        eta_minutes=eta_minutes
     )
     
+    # A late fix is dropped, so answer with the fix that is actually current
     return {
         "message": "Location updated",
-        "distance_km": round(distance_km, 2) if distance_km else None,
-        "eta_minutes": eta_minutes
+        "distance_km": fix.get("distance_km"),
+        "eta_minutes": fix.get("eta_minutes"),
+        "seq": fix["seq"]
     }
 
+
+@router.get("/tasks/{task_id}/tracking-status")
+async def get_tracking_status(
+    task_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
+):
+    """Current tracking state and latest tasker position for a task (task participants only)."""
+    from auth import get_current_user as get_user
+    current_user = await get_user(token, db)
+    
+    task = await live_locations.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if current_user.id not in (task.get("client_id"), task.get("assigned_tasker_id")):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return _tracking_snapshot(task)
+
+
+@router.get("/tasks/{task_id}/track")
+async def get_location_track(
+    task_id: str,
+    tolerance_m: float = Query(location_tracks.DEFAULT_TOLERANCE_M, ge=0, le=500),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Route the tasker actually travelled, as an encoded polyline (task participants only).
+    
+    The track is simplified with Douglas-Peucker: no fix is dropped that
+    deviates more than tolerance_m from the returned line (0 returns every fix).
+    """
+    from auth import get_current_user as get_user
+    current_user = await get_user(token, db)
+    
+    task = await live_locations.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if current_user.id not in (task.get("client_id"), task.get("assigned_tasker_id")):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    # Stored buckets plus fixes still waiting for the next flush
+    points = await location_tracks.load_track(db, task_id)
+    points.extend(live_locations.pending_track(task_id))
+    simplified = location_tracks.simplify_track(points, tolerance_m)
+    
+    return {
+        "task_id": task_id,
+        "polyline": location_tracks.encode_polyline(simplified),
+        "points": len(simplified),
+        "raw_points": len(points),
+        "distance_km": round(path_length_km(points), 2),
+        "started_at": points[0][2] if points else None,
+        "ended_at": points[-1][2] if points else None
+    }
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    """Serialize a location stream event as a Server-Sent Event."""
+    event_id = f"id: {event['seq']}\n" if event.get("seq") else ""
+    return f"{event_id}event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+
+
+@router.get("/tasks/{task_id}/location/stream")
+async def stream_task_location(
+    task_id: str,
+    request: Request,
+    token: Optional[str] = None,
+    min_interval: float = Query(STREAM_DEFAULT_INTERVAL_SECONDS, le=60),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Server-Sent Events stream of a task's tracking state (task participants only).
+    
+    Starts with a "snapshot" event (same fields as tracking-status), then
+    pushes "location" events as fixes arrive plus "tracking_started" /
+    "tracking_stopped". Location events are throttled per subscriber to one
+    every min_interval seconds (never below LOCATION_STREAM_MIN_INTERVAL_SECONDS);
+    fixes arriving faster are coalesced and the latest one is sent when the
+    interval elapses, so the final position is never lost.
+    
+    EventSource cannot send headers, so the token may be passed as a query
+    parameter.
+    """
+    from auth import get_current_user as get_user
+    
+    if not token:
+        authorization = request.headers.get("Authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    
+    current_user = await get_user(token, db)
+    
+    task = await live_locations.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if current_user.id not in (task.get("client_id"), task.get("assigned_tasker_id")):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    interval = max(min_interval, STREAM_MIN_INTERVAL_SECONDS)
+    room = location_room(task_id)
+    
+    async def event_stream():
+        # Subscribe before the snapshot so no fix slips in between
+        queue = hub.subscribe(room)
+        loop = asyncio.get_running_loop()
+        try:
+            yield "retry: 5000\n\n"
+            snapshot = _tracking_snapshot(await live_locations.get_task(db, task_id) or task)
+            yield _format_sse({**snapshot, "type": "snapshot", "task_id": task_id})
+            
+            last_sent = float("-inf")
+            pending = None
+            while not await request.is_disconnected():
+                if pending is not None:
+                    timeout = max(0.0, last_sent + interval - loop.time())
+                else:
+                    timeout = STREAM_HEARTBEAT_SECONDS
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if pending is not None:
+                        yield _format_sse(pending)
+                        last_sent, pending = loop.time(), None
+                    else:
+                        yield ": keep-alive\n\n"
+                    continue
+                
+                if event["type"] != "location":
+                    if event["type"] == "tracking_stopped":
+                        pending = None
+                    yield _format_sse(event)
+                elif loop.time() - last_sent >= interval:
+                    yield _format_sse(event)
+                    last_sent, pending = loop.time(), None
+                else:
+                    pending = event
+        finally:
+            hub.unsubscribe(room, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
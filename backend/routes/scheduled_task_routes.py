@@ -7,13 +7,15 @@ from fastapi import APIRouter, HTTPException, status, Depends, Form
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from uuid import uuid4
 import logging
 
 from database import get_database
 from models import UserRole, Task
 from pydantic import BaseModel
+import recurrence
+import recurring_scheduler
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -29,15 +31,21 @@ class RecurringTask(BaseModel):
     description: str
     category_id: str
     frequency: str  # 'daily', 'weekly', 'biweekly', 'monthly'
-    scheduled_time: str  # e.g., "09:00"
+    scheduled_time: str  # e.g., "09:00", wall clock time in `timezone`
     day_of_week: Optional[int] = None  # 0-6 for weekly
     day_of_month: Optional[int] = None  # 1-31 for monthly
+    timezone: Optional[str] = None  # IANA name, e.g. "Africa/Abidjan" (the default)
     hourly_rate: float
     estimated_hours: float
     next_occurrence: datetime
     is_active: bool
     created_at: datetime
     last_generated_at: Optional[datetime] = None
+    address: Optional[str] = None  # Where occurrences happen; defaults to the client's profile
+    city: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    paused_reason: Optional[str] = None  # Set when the scheduler paused the schedule
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
@@ -52,10 +60,20 @@ async def create_recurring_task(
     day_of_month: Optional[int] = Form(None),
     hourly_rate: float = Form(...),
     estimated_hours: float = Form(...),
+    address: Optional[str] = Form(None),
+    city: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    timezone: Optional[str] = Form(None),
     db: AsyncIOMotorDatabase = Depends(get_database),
     token: str = Depends(oauth2_scheme)
 ):
-    """Create a recurring task schedule."""
+    """
+    Create a recurring task schedule.
+    
+    Occurrences are booked as tasks by the recurring scheduler, at the given
+    address or, without one, at the client's profile address.
+    """
     from auth import get_current_user as get_user
     current_user = await get_user(token, db)
     
@@ -65,38 +83,12 @@ async def create_recurring_task(
             detail="Only clients can create recurring tasks"
         )
     
-    # Validate frequency
-    valid_frequencies = ['daily', 'weekly', 'biweekly', 'monthly']
-    if frequency not in valid_frequencies:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid frequency. Must be one of: {', '.join(valid_frequencies)}"
+    try:
+        next_occurrence = recurrence.first_occurrence(
+            frequency, scheduled_time, day_of_week, day_of_month, timezone
         )
-    
-    # Calculate next occurrence
-    now = datetime.utcnow()
-    next_occurrence = now
-    
-    if frequency == 'daily':
-        next_occurrence = now + timedelta(days=1)
-    elif frequency == 'weekly':
-        if day_of_week is None:
-            raise HTTPException(status_code=400, detail="day_of_week required for weekly tasks")
-        # Calculate next occurrence based on day_of_week
-        days_ahead = day_of_week - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
-        next_occurrence = now + timedelta(days=days_ahead)
-    elif frequency == 'biweekly':
-        next_occurrence = now + timedelta(days=14)
-    elif frequency == 'monthly':
-        if day_of_month is None:
-            raise HTTPException(status_code=400, detail="day_of_month required for monthly tasks")
-        # Simple implementation - set to next month
-        if now.month == 12:
-            next_occurrence = now.replace(year=now.year + 1, month=1, day=day_of_month)
-        else:
-            next_occurrence = now.replace(month=now.month + 1, day=day_of_month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Create recurring task
     recurring_task = {
@@ -110,15 +102,21 @@ async def create_recurring_task(
         "scheduled_time": scheduled_time,
         "day_of_week": day_of_week,
         "day_of_month": day_of_month,
+        "timezone": timezone,
         "hourly_rate": hourly_rate,
         "estimated_hours": estimated_hours,
         "next_occurrence": next_occurrence,
         "is_active": True,
         "created_at": datetime.utcnow(),
-        "last_generated_at": None
+        "last_generated_at": None,
+        "address": address,
+        "city": city,
+        "latitude": latitude,
+        "longitude": longitude
     }
     
     await db.recurring_tasks.insert_one(recurring_task)
+    recurring_scheduler.wake()
     
     return RecurringTask(**recurring_task)
 
@@ -164,8 +162,10 @@ async def toggle_recurring_task(
     new_status = not task.get("is_active", True)
     await db.recurring_tasks.update_one(
         {"id": task_id},
-        {"$set": {"is_active": new_status}}
+        {"$set": {"is_active": new_status}, "$unset": {"paused_reason": ""}}
     )
+    if new_status:
+        recurring_scheduler.wake()
     
     return {
         "message": f"Recurring task {'activated' if new_status else 'deactivated'}",
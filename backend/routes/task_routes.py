@@ -11,6 +11,9 @@ from models import (
 )
 from auth import get_current_user, oauth2_scheme
 from database import get_database
+from live_location import live_locations
+import outbox
+import tasker_bookings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["tasks"])
@@ -53,22 +56,31 @@ async def create_task(
         status=TaskStatus.ASSIGNED
     )
     
-    await db.tasks.insert_one(new_task.model_dump())
-    logger.info(f"Instant booking created: {new_task.id} by {current_user.email} for tasker {task.tasker_id}")
+    # Hold the tasker's time before the task exists so double bookings fail here
+    start, end = tasker_bookings.booking_window(new_task.task_date, new_task.duration_hours)
+    conflict = await tasker_bookings.reserve(db, task.tasker_id, new_task.id, start, end)
+    if conflict:
+        raise HTTPException(status_code=409, detail="Tasker is already booked at this time")
     
-    # Create notification for tasker about new booking
     try:
-        from notification_routes import create_notification
-        await create_notification(
-            db=db,
+        await db.tasks.insert_one(new_task.model_dump())
+    except Exception:
+        await tasker_bookings.release(db, new_task.id)
+        raise
+    logger.info(f"Instant booking created: {new_task.id} by {current_user.email} for tasker {task.tasker_id}")
+    
+    # Count the booking and notify the tasker in the background
+    await outbox.enqueue(
+        db,
+        outbox.tasker_stat("assigned", task.tasker_id),
+        outbox.notification(
             user_id=task.tasker_id,
             notification_type="new_booking",
             task_id=new_task.id,
             task_title=new_task.title,
             message=f"New booking: '{new_task.title}' from {current_user.full_name}"
         )
-    except Exception as e:
-        logger.error(f"Failed to create notification: {str(e)}")
+    )
     
     return new_task
 
@@ -143,19 +155,33 @@ async def update_task_status(
     if new_status == TaskStatus.COMPLETED:
         update_data["completed_at"] = datetime.utcnow()
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
+    messages = []
+    if new_status == TaskStatus.COMPLETED:
+        # Conditional so concurrent completions are only counted once
+        result = await db.tasks.update_one(
+            {"id": task_id, "status": {"$ne": TaskStatus.COMPLETED}},
+            {"$set": update_data}
+        )
+        if result.modified_count:
+            if task.get("assigned_tasker_id"):
+                messages.append(outbox.tasker_stat("completed", task["assigned_tasker_id"]))
+            messages.append(outbox.coin_award(task["client_id"], task_id, task.get("title", "Task")))
+    else:
+        await db.tasks.update_one({"id": task_id}, {"$set": update_data})
     
-    # Create notification for client when task is completed
+    if new_status in (TaskStatus.COMPLETED, TaskStatus.CANCELLED):
+        await tasker_bookings.release(db, task_id)
+    
+    # Notify the client when the task is completed
     if new_status == TaskStatus.COMPLETED and current_user.role == UserRole.TASKER:
-        from notification_routes import create_notification
-        await create_notification(
-            db=db,
+        messages.append(outbox.notification(
             user_id=task["client_id"],
             notification_type="task_completed",
             task_id=task_id,
             task_title=task.get("title", "Task"),
             message=f"Task '{task.get('title', 'Task')}' has been marked as completed!"
-        )
+        ))
+    await outbox.enqueue(db, *messages)
     
     updated_task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
     return Task(**updated_task)
@@ -170,7 +196,6 @@ async def cancel_task(
 ):
     """Cancel a task with optional penalty."""
     from auth import get_current_user as get_user
-    from notification_routes import create_notification
     current_user = await get_user(token, db)
     
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
@@ -217,18 +242,18 @@ async def cancel_task(
     }
     
     await db.tasks.update_one({"id": task_id}, {"$set": update_data})
+    await tasker_bookings.release(db, task_id)
     
     # Send notification to the other party
     notify_user_id = task["client_id"] if is_tasker else task.get("assigned_tasker_id")
     if notify_user_id:
-        await create_notification(
-            db=db,
+        await outbox.enqueue(db, outbox.notification(
             user_id=notify_user_id,
             notification_type="task_cancelled",
             task_id=task_id,
             task_title=task.get("title", "Task"),
             message=f"Task has been cancelled. Reason: {reason}"
-        )
+        ))
     
     return {
         "message": "Task cancelled successfully",
@@ -417,6 +442,14 @@ async def assign_task_to_tasker(
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
+    # Move the booking to the new tasker, refusing if they are busy then
+    if task.get("task_date") and task.get("assigned_tasker_id") != tasker_id:
+        start, end = tasker_bookings.booking_window(task["task_date"], task.get("duration_hours"))
+        if await tasker_bookings.reserve(db, tasker_id, task_id, start, end):
+            raise HTTPException(status_code=409, detail="Tasker is already booked at this time")
+        if task.get("assigned_tasker_id"):
+            await tasker_bookings.release(db, task_id, task["assigned_tasker_id"])
+    
     # Update task
     await db.tasks.update_one(
         {"id": task_id},
@@ -426,6 +459,15 @@ async def assign_task_to_tasker(
             "updated_at": datetime.utcnow()
         }}
     )
+    # The cached tracking view still names the previous tasker
+    live_locations.forget_task(task_id)
+    
+    if task.get("assigned_tasker_id") != tasker_id:
+        await outbox.enqueue(
+            db,
+            outbox.tasker_stat("assigned", tasker_id),
+            outbox.tasker_stat("assigned", task["assigned_tasker_id"], amount=-1) if task.get("assigned_tasker_id") else None
+        )
     
     # Update application status
     await db.task_applications.update_one(
@@ -472,16 +514,14 @@ async def accept_task(
         {"$set": {"status": TaskStatus.IN_PROGRESS, "updated_at": datetime.utcnow()}}
     )
     
-    # Create notification for client
-    from notification_routes import create_notification
-    await create_notification(
-        db=db,
+    # Notify the client
+    await outbox.enqueue(db, outbox.notification(
         user_id=task["client_id"],
         notification_type="task_accepted",
         task_id=task_id,
         task_title=task.get("title", "Task"),
         message=f"Your task '{task.get('title', 'Task')}' has been accepted!"
-    )
+    ))
     
     logger.info(f"Tasker {current_user.id} accepted task {task_id}")
     return {"message": "Task accepted"}
@@ -515,16 +555,15 @@ async def reject_task(
             "updated_at": datetime.utcnow()
         }}
     )
+    await tasker_bookings.release(db, task_id)
     
-    # Create notification for client
-    from notification_routes import create_notification
-    await create_notification(
-        db=db,
+    # Notify the client
+    await outbox.enqueue(db, outbox.notification(
         user_id=task["client_id"],
         notification_type="task_rejected",
         task_id=task_id,
         task_title=task.get("title", "Task")
-    )
+    ))
     
     logger.info(f"Tasker {current_user.id} rejected task {task_id}")
     return {"message": "Task rejected"}
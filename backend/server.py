@@ -8,6 +8,19 @@ import logging
 
 from database import connect_to_mongo, close_mongo_connection
 from seed_categories import seed_service_categories
+from indexes import ensure_indexes
+from unread_counters import reconcile_unread_counters
+from tasker_search import rebuild_tasker_search
+from tasker_stats import rebuild_tasker_stats
+from tasker_bookings import rebuild_tasker_bookings
+import background
+import live_location
+import matching
+import recurring_scheduler
+import outbox
+import payment_reconciliation
+import payment_webhooks
+import resilience
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -33,6 +46,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 # Startup and shutdown events
@@ -42,10 +56,64 @@ async def startup():
     from database import get_database
     db = await get_database()
     await seed_service_categories(db)
+    await ensure_indexes(db)
+    
+    # Search documents and rating aggregates for taskers created before they existed
+    await rebuild_tasker_search(db, only_missing=True)
+    await rebuild_tasker_stats(db, only_missing=True)
+    if await db.tasker_bookings.estimated_document_count() == 0:
+        await rebuild_tasker_bookings(db)
+    
+    # Build unread counters on first deploy, then keep repairing drift
+    if await db.unread_counters.estimated_document_count() == 0:
+        await reconcile_unread_counters(db)
+    background.start_periodic(
+        "reconcile_unread_counters",
+        int(os.getenv("UNREAD_RECONCILE_INTERVAL_SECONDS", "3600")),
+        lambda: reconcile_unread_counters(db)
+    )
+    
+    background.start_periodic(
+        "flush_live_locations",
+        live_location.FLUSH_INTERVAL_SECONDS,
+        lambda: live_location.live_locations.flush(db)
+    )
+    
+    await matching.match_index.rebuild(db)
+    background.start_periodic(
+        "rebuild_match_index",
+        matching.MATCH_INDEX_REFRESH_SECONDS,
+        lambda: matching.match_index.rebuild(db)
+    )
+    
+    # Every worker competes for the scheduler lease; only the holder generates tasks
+    background.start_loop("recurring_scheduler", lambda: recurring_scheduler.scheduler_loop(db))
+    
+    # Notifications, counters and coin awards queued by requests
+    background.start_loop("outbox_workers", lambda: outbox.run_workers(db))
+    
+    # Apply queued Paydunya IPNs in order (the lease holder processes them)
+    background.start_loop("payment_webhooks", lambda: payment_webhooks.webhook_loop(db))
+    
+    # Settle Paydunya invoices nobody verified (the lease holder runs it)
+    background.start_periodic(
+        "payment_reconciliation",
+        payment_reconciliation.RECONCILE_INTERVAL_SECONDS,
+        lambda: payment_reconciliation.run_reconciliation(db)
+    )
     logger.info("Application started successfully")
 
 @app.on_event("shutdown")
 async def shutdown():
+    await background.stop_all()
+    from database import get_database
+    try:
+        # Persist the GPS fixes received since the last flush
+        await live_location.live_locations.flush(await get_database())
+    except Exception as e:
+        logger.error(f"Final live location flush failed: {str(e)}")
+    from paydunya_service import close_paydunya_service
+    await close_paydunya_service()
     await close_mongo_connection()
     logger.info("Application shutdown complete")
 
@@ -74,6 +142,9 @@ app.include_router(timer_router)
 from routes.payment_routes import router as payment_router
 app.include_router(payment_router)
 
+from payment_routes import router as paydunya_router
+app.include_router(paydunya_router)
+
 from review_routes import router as review_router
 app.include_router(review_router)
 
@@ -83,6 +154,9 @@ app.include_router(notification_router)
 from message_routes import router as message_router
 app.include_router(message_router)
 
+from chat_gateway import router as chat_gateway_router
+app.include_router(chat_gateway_router)
+
 from routes.dispute_routes import router as dispute_router
 app.include_router(dispute_router)
 
@@ -101,6 +175,24 @@ app.include_router(badge_router)
 from routes.ai_assistant_routes import router as ai_assistant_router
 app.include_router(ai_assistant_router)
 
+# Process-local metrics
+@api_router.get("/metrics")
+async def metrics():
+    """Cache and realtime counters for this worker process."""
+    import user_cache
+    from realtime import hub
+    return {
+        "user_cache": user_cache.stats(),
+        "realtime": hub.stats(),
+        "live_locations": live_location.live_locations.stats(),
+        "match_index": matching.match_index.stats(),
+        "recurring_scheduler": recurring_scheduler.stats(),
+        "outbox": outbox.stats(),
+        "payment_reconciliation": payment_reconciliation.stats(),
+        "payment_webhooks": payment_webhooks.stats(),
+        "dependencies": resilience.stats()
+    }
+
 # Include the main API router
 app.include_router(api_router)
 
@@ -0,0 +1,156 @@
+"""
+Tasker Bookings
+Time intervals each tasker is committed to, kept in the tasker_bookings
+collection so double bookings are rejected when a task is booked instead of
+being discovered by people afterwards.
+
+    tasker_bookings { tasker_id, task_id, start, end, created_at }
+
+Only active tasks (assigned / in progress) hold intervals: reserve() is
+called when a task is booked or reassigned and release() when it is
+cancelled, rejected or completed.
+
+A task longer than MAX_INTERVAL_HOURS is stored as consecutive chunks, so
+every interval is at most that long. An interval overlapping [start, end)
+must then start within (start - MAX_INTERVAL_HOURS, end), which turns the
+overlap check into a bounded range scan of the (tasker_id, start, end)
+index instead of a scan of the tasker's whole history.
+
+Concurrent bookings of the same tasker are settled without transactions:
+a reservation is inserted first and then checked, and when two overlap the
+one stored first (created_at, then task_id) wins while the other is removed
+again.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne
+
+logger = logging.getLogger(__name__)
+
+MAX_INTERVAL_HOURS = 24
+ACTIVE_STATUSES = ("assigned", "in_progress")
+
+_MAX_INTERVAL = timedelta(hours=MAX_INTERVAL_HOURS)
+
+
+def booking_window(task_date: datetime, duration_hours: float) -> tuple:
+    """[start, end) of a task; a task without a duration still blocks one hour."""
+    return task_date, task_date + timedelta(hours=duration_hours or 1)
+
+
+def _chunks(tasker_id: str, task_id: str, start: datetime, end: datetime, created_at: datetime) -> List[dict]:
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + _MAX_INTERVAL, end)
+        chunks.append({
+            "id": str(uuid.uuid4()),
+            "tasker_id": tasker_id,
+            "task_id": task_id,
+            "start": chunk_start,
+            "end": chunk_end,
+            "created_at": created_at
+        })
+        chunk_start = chunk_end
+    return chunks
+
+
+def _overlap_query(start: datetime, end: datetime) -> dict:
+    return {"start": {"$gt": start - _MAX_INTERVAL, "$lt": end}, "end": {"$gt": start}}
+
+
+async def find_conflicts(
+    db: AsyncIOMotorDatabase,
+    tasker_id: str,
+    start: datetime,
+    end: datetime,
+    exclude_task_id: Optional[str] = None
+) -> List[dict]:
+    """Intervals of the tasker overlapping [start, end), oldest reservation first."""
+    query = {"tasker_id": tasker_id, **_overlap_query(start, end)}
+    if exclude_task_id:
+        query["task_id"] = {"$ne": exclude_task_id}
+    return await db.tasker_bookings.find(query, {"_id": 0}).sort(
+        [("created_at", 1), ("task_id", 1)]
+    ).to_list(None)
+
+
+async def reserve(
+    db: AsyncIOMotorDatabase,
+    tasker_id: str,
+    task_id: str,
+    start: datetime,
+    end: datetime
+) -> Optional[dict]:
+    """
+    Reserve [start, end) for a task.
+
+    Returns:
+        None when reserved, otherwise the conflicting interval (nothing is
+        reserved then)
+    """
+    conflicts = await find_conflicts(db, tasker_id, start, end, exclude_task_id=task_id)
+    if conflicts:
+        return conflicts[0]
+
+    await db.tasker_bookings.insert_many(_chunks(tasker_id, task_id, start, end, datetime.utcnow()))
+
+    # A concurrent reservation may have passed the same check: the older one
+    # stays. Both sides must compare the stored (created_at, task_id), since
+    # MongoDB keeps created_at to the millisecond only.
+    intervals = await find_conflicts(db, tasker_id, start, end)
+    if intervals and intervals[0]["task_id"] != task_id:
+        await release(db, task_id, tasker_id)
+        return intervals[0]
+    return None
+
+
+async def release(db: AsyncIOMotorDatabase, task_id: str, tasker_id: Optional[str] = None):
+    """Free the intervals held by a task (only those of tasker_id, when given)."""
+    query = {"task_id": task_id}
+    if tasker_id:
+        query["tasker_id"] = tasker_id
+    await db.tasker_bookings.delete_many(query)
+
+
+async def busy_taskers(
+    db: AsyncIOMotorDatabase,
+    start: datetime,
+    end: datetime,
+    tasker_ids: Optional[Iterable[str]] = None
+) -> Set[str]:
+    """Taskers (optionally among tasker_ids) with a booking overlapping [start, end)."""
+    query = _overlap_query(start, end)
+    if tasker_ids is not None:
+        query["tasker_id"] = {"$in": list(tasker_ids)}
+    return set(await db.tasker_bookings.distinct("tasker_id", query))
+
+
+async def rebuild_tasker_bookings(db: AsyncIOMotorDatabase) -> int:
+    """
+    Recreate every interval from the active tasks.
+
+    Returns:
+        Number of tasks reserved
+    """
+    operations = []
+    tasks = 0
+    async for task in db.tasks.find(
+        {"status": {"$in": list(ACTIVE_STATUSES)}, "assigned_tasker_id": {"$ne": None}, "task_date": {"$ne": None}},
+        {"_id": 0, "id": 1, "assigned_tasker_id": 1, "task_date": 1, "duration_hours": 1, "created_at": 1}
+    ):
+        start, end = booking_window(task["task_date"], task.get("duration_hours"))
+        created_at = task.get("created_at") or datetime.utcnow()
+        operations.extend(InsertOne(chunk) for chunk in _chunks(task["assigned_tasker_id"], task["id"], start, end, created_at))
+        tasks += 1
+
+    await db.tasker_bookings.delete_many({})
+    if operations:
+        await db.tasker_bookings.bulk_write(operations, ordered=False)
+    logger.info(f"Rebuilt tasker bookings: {tasks} active tasks")
+    return tasks
@@ -3,45 +3,85 @@ Tasker Routes
 Handles tasker-specific profile and service management.
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Form, File, UploadFile
+from fastapi import APIRouter, HTTPException, status, Depends, Form, File, UploadFile, Query, Response
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Optional, List
+from typing import Optional, List, Tuple, Any
+from pydantic import BaseModel
+import base64
+from datetime import datetime, timedelta
 import logging
 import json
 
 from database import get_database
-from models import UserResponse, UserRole
+import user_cache
+import tasker_search
+import tasker_bookings
+from models import UserResponse, UserRole, TaskerCard, TaskerMatch
+from matching import match_index
+from utils import geo_point
+from routes.badge_routes import refresh_badges
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 router = APIRouter(prefix="/api/taskers", tags=["taskers"])
 
+DEFAULT_MAX_TRAVEL_KM = 50.0  # Matches TaskerProfile.max_travel_distance default
 
-@router.get("/search", response_model=List[UserResponse])
-async def search_taskers(
+
+SEARCH_MAX_RESULTS = 1000
+SEARCH_COUNT_CAP = 10000  # X-Total-Count stops counting here
+CARD_SERVICES = 3  # Services shown on a tasker card
+
+# Lightweight projection for list views: no portfolio, certifications or
+# availability, and only the first few services.
+CARD_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "full_name": 1,
+    "city": 1,
+    "country": 1,
+    "profile_image": "$tasker_profile.profile_image",
+    "hourly_rate": "$tasker_profile.hourly_rate",
+    "average_rating": "$search.rating",
+    "total_reviews": "$search.total_reviews",
+    "completed_tasks": "$search.completed_tasks",
+    "is_available": "$search.is_available",
+    "max_travel_distance": "$tasker_profile.max_travel_distance",
+    "top_services": {"$slice": [{"$ifNull": ["$tasker_profile.services", []]}, CARD_SERVICES]},
+    "badges": {"$ifNull": ["$tasker_profile.badges", []]},
+    "distance_km": 1
+}
+
+
+def build_search_query(
     service: Optional[str] = None,
     is_available: Optional[bool] = None,
     city: Optional[str] = None,
     country: Optional[str] = None,
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    """
-    Search for taskers by service, location, and availability.
-    """
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> dict:
+    """Build the users filter shared by every tasker search endpoint (see tasker_search)."""
     query = {"role": "tasker"}
     
     if service:
-        # Search in tasker_profile.services
-        query["tasker_profile.services"] = {"$elemMatch": {"$or": [
-            {"category": service},
-            {"subcategory": service},
-            service  # For backward compatibility with string services
-        ]}}
+        # Category, subcategory or legacy string service name
+        query["search.service_keys"] = service
+    
+    if category_id:
+        query["search.category_ids"] = category_id
     
     if is_available is not None:
-        query["tasker_profile.is_available"] = is_available
+        query["search.is_available"] = is_available
+    
+    # A tasker matches a price range when any of their services falls in it
+    if max_price is not None:
+        query["search.min_price"] = {"$lte": max_price}
+    if min_price is not None:
+        query["search.max_price"] = {"$gte": min_price}
     
     if city:
         query["city"] = city
@@ -49,19 +89,307 @@ async def search_taskers(
     if country:
         query["country"] = country
     
-    taskers = await db.users.find(query, {"_id": 0, "hashed_password": 0}).to_list(1000)
+    return query
+
+
+def encode_search_cursor(sort_value: Any, tasker_id: str) -> str:
+    """Opaque keyset cursor for a tasker's (sort value, id) position."""
+    raw = json.dumps([sort_value, tasker_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverse of encode_search_cursor; raises 400 on a malformed cursor."""
+    try:
+        sort_value, tasker_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(tasker_id, str) or not isinstance(sort_value, (int, float, type(None))):
+            raise ValueError
+        return sort_value, tasker_id
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def run_tasker_search(
+    db: AsyncIOMotorDatabase,
+    query: dict,
+    projection: dict,
+    limit: int = SEARCH_MAX_RESULTS,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None,
+    with_total: bool = False
+) -> Tuple[List[dict], Optional[str], Optional[int]]:
+    """
+    Page through taskers matching a query.
+    
+    Without coordinates results are ordered by rating (best first), with
+    coordinates by distance (nearest first); ties are broken by id so the
+    order is stable and keyset cursors can resume from any row.
+    
+    Returns:
+        (taskers, next cursor or None on the last page, total or None)
+    """
+    geo = latitude is not None and longitude is not None
+    if geo:
+        sort_field = "distance_m"
+        sort_direction = 1
+        pipeline = _geo_near_stages(query, latitude, longitude, radius_km)
+    else:
+        sort_field = "search.rating"
+        sort_direction = -1
+        pipeline = [{"$match": query}]
+    
+    total = None
+    if with_total:
+        if geo:
+            counted = await db.users.aggregate(
+                pipeline + [{"$limit": SEARCH_COUNT_CAP}, {"$count": "total"}]
+            ).to_list(1)
+            total = counted[0]["total"] if counted else 0
+        else:
+            total = await db.users.count_documents(query, limit=SEARCH_COUNT_CAP)
+    
+    if cursor:
+        after_value, after_id = decode_search_cursor(cursor)
+        past = "$gt" if sort_direction == 1 else "$lt"
+        pipeline.append({"$match": {"$or": [
+            {sort_field: {past: after_value}},
+            {sort_field: after_value, "id": {"$gt": after_id}}
+        ]}})
+    
+    pipeline.append({"$sort": {sort_field: sort_direction, "id": 1}})
+    if offset:
+        pipeline.append({"$skip": offset})
+    # One extra row tells us whether another page exists
+    pipeline.append({"$limit": limit + 1})
+    if geo:
+        pipeline.append({"$addFields": {"distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 2]}}})
+    pipeline.append({"$addFields": {"_sort": f"${sort_field}"}})
+    if any(value != 0 for value in projection.values()):
+        projection = {**projection, "_sort": 1}  # Inclusion projection
+    pipeline.append({"$project": projection})
+    
+    taskers = await db.users.aggregate(pipeline).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(taskers) > limit:
+        taskers = taskers[:limit]
+        next_cursor = encode_search_cursor(taskers[-1]["_sort"], taskers[-1]["id"])
+    for tasker in taskers:
+        tasker.pop("_sort", None)
+    
+    return taskers, next_cursor, total
+
+
+def _geo_near_stages(
+    query: dict,
+    latitude: float,
+    longitude: float,
+    radius_km: Optional[float] = None
+) -> List[dict]:
+    """$geoNear stages around a point using the users.location 2dsphere index."""
+    geo_near = {
+        "near": geo_point(latitude, longitude),
+        "distanceField": "distance_m",
+        "key": "location",
+        "query": query,
+        "spherical": True
+    }
+    if radius_km:
+        geo_near["maxDistance"] = radius_km * 1000
+    
+    return [
+        {"$geoNear": geo_near},
+        # Honour how far each tasker is willing to travel
+        {"$match": {"$expr": {"$lte": [
+            "$distance_m",
+            {"$multiply": [
+                {"$ifNull": ["$tasker_profile.max_travel_distance", DEFAULT_MAX_TRAVEL_KM]},
+                1000
+            ]}
+        ]}}}
+    ]
+
+
+def _set_page_headers(response: Response, next_cursor: Optional[str], total: Optional[int]):
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+@router.get("/search", response_model=List[UserResponse])
+async def search_taskers(
+    response: Response,
+    service: Optional[str] = None,
+    is_available: Optional[bool] = None,
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=500),
+    limit: int = Query(SEARCH_MAX_RESULTS, ge=1, le=SEARCH_MAX_RESULTS),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Search for taskers by service, location, and availability.
+    
+    When latitude and longitude are given, only taskers whose
+    max_travel_distance reaches that point (and within radius_km, if set)
+    are returned, nearest first, with distance_km filled in.
+    
+    Page with limit/offset or with the X-Next-Cursor header passed back as
+    cursor. X-Total-Count is only sent on the first page.
+    """
+    query = build_search_query(service, is_available, city, country, category_id, min_price, max_price)
+    taskers, next_cursor, total = await run_tasker_search(
+        db, query, {"_id": 0, "hashed_password": 0, "distance_m": 0, "search": 0, "stat_ops": 0},
+        limit=limit, offset=offset, cursor=cursor,
+        latitude=latitude, longitude=longitude, radius_km=radius_km,
+        with_total=offset == 0 and not cursor
+    )
+    _set_page_headers(response, next_cursor, total)
     return [UserResponse(**tasker) for tasker in taskers]
 
 
+@router.get("/cards", response_model=List[TaskerCard])
+async def search_tasker_cards(
+    response: Response,
+    service: Optional[str] = None,
+    is_available: Optional[bool] = None,
+    city: Optional[str] = None,
+    country: Optional[str] = None,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Same search as /search, returning compact cards for list views.
+    """
+    query = build_search_query(service, is_available, city, country, category_id, min_price, max_price)
+    taskers, next_cursor, total = await run_tasker_search(
+        db, query, CARD_PROJECTION,
+        limit=limit, offset=offset, cursor=cursor,
+        latitude=latitude, longitude=longitude, radius_km=radius_km,
+        with_total=offset == 0 and not cursor
+    )
+    _set_page_headers(response, next_cursor, total)
+    return [TaskerCard(**tasker) for tasker in taskers]
+
+
+@router.get("/match", response_model=List[TaskerMatch])
+async def match_taskers(
+    category_id: str,
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    subcategory: Optional[str] = None,
+    task_date: Optional[datetime] = None,
+    duration_hours: float = Query(1, gt=0, le=24 * 14),
+    city: Optional[str] = None,
+    radius_km: Optional[float] = Query(None, gt=0, le=500),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Best available taskers for a booking request, best first.
+    
+    Candidates must reach the job location within their
+    max_travel_distance, offer the subcategory, work at task_date and have
+    no booking during [task_date, task_date + duration_hours). They are
+    ranked by distance, rating, completion rate and price (see matching);
+    city picks the ETA speed profile.
+    """
+    await match_index.ensure_fresh(db)
+    busy = None
+    if task_date:
+        busy = await tasker_bookings.busy_taskers(db, *tasker_bookings.booking_window(task_date, duration_hours))
+    ranked = match_index.match(
+        category_id, latitude, longitude,
+        subcategory=subcategory, task_date=task_date,
+        radius_km=radius_km, max_price=max_price, city=city,
+        exclude=busy, limit=limit
+    )
+    if not ranked:
+        return []
+    
+    cards = await db.users.aggregate([
+        {"$match": {"id": {"$in": [match["id"] for match in ranked]}}},
+        {"$project": CARD_PROJECTION}
+    ]).to_list(len(ranked))
+    cards_by_id = {card["id"]: card for card in cards}
+    return [
+        TaskerMatch(**{**cards_by_id[match["id"]], **match})
+        for match in ranked
+        if match["id"] in cards_by_id
+    ]
+
+
+AVAILABILITY_MAX_TASKERS = 200
+
+
+class AvailabilityRequest(BaseModel):
+    tasker_ids: List[str]
+    start: datetime
+    end: datetime
+
+
+@router.post("/availability")
+async def get_taskers_availability(
+    request: AvailabilityRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Split taskers into free and busy for the window [start, end), with a
+    single query on the booking index.
+    """
+    if request.end <= request.start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    tasker_ids = list(dict.fromkeys(request.tasker_ids))
+    if len(tasker_ids) > AVAILABILITY_MAX_TASKERS:
+        raise HTTPException(status_code=400, detail=f"At most {AVAILABILITY_MAX_TASKERS} taskers per request")
+    
+    busy = await tasker_bookings.busy_taskers(db, request.start, request.end, tasker_ids)
+    return {
+        "free": [tasker_id for tasker_id in tasker_ids if tasker_id not in busy],
+        "busy": [tasker_id for tasker_id in tasker_ids if tasker_id in busy]
+    }
+
+
+EARNINGS_HISTORY_LIMIT = 50
+
+
 @router.get("/earnings")
 async def get_tasker_earnings(
     period: str = "all",  # all, week, month
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: Optional[str] = Query(None, pattern="^(day|week)$"),
     db: AsyncIOMotorDatabase = Depends(get_database),
     token: str = Depends(oauth2_scheme)
 ):
-    """Get tasker earnings summary and history."""
+    """
+    Get tasker earnings summary and history.
+    
+    start/end (completed_at, end exclusive) override period. With bucket=day
+    or bucket=week, paid earnings in the range are also returned per
+    day/week (weeks start on Monday) for charts.
+    """
     from auth import get_current_user as get_user
-    from datetime import datetime, timedelta
     
     current_user = await get_user(token, db)
     
@@ -73,77 +401,91 @@ async def get_tasker_earnings(
     
     # Calculate date range
     now = datetime.utcnow()
-    date_filter = {}
-    
-    if period == "week":
-        week_ago = now - timedelta(days=7)
-        date_filter = {"completed_at": {"$gte": week_ago}}
-    elif period == "month":
-        month_ago = now - timedelta(days=30)
-        date_filter = {"completed_at": {"$gte": month_ago}}
-    
-    # Get all completed & paid tasks
-    base_query = {
-        "assigned_tasker_id": current_user.id,
-        "status": "completed",
-        "is_paid": True
-    }
-    
-    paid_tasks = await db.tasks.find({**base_query, **date_filter}, {"_id": 0}).to_list(1000)
-    
-    # Get pending tasks (completed but not paid)
-    pending_tasks = await db.tasks.find({
-        "assigned_tasker_id": current_user.id,
-        "status": "completed",
-        "is_paid": False
-    }, {"_id": 0}).to_list(1000)
-    
-    # Calculate totals
-    total_earnings = sum(task.get("total_amount", 0) for task in paid_tasks)
-    pending_earnings = sum(task.get("total_amount", 0) for task in pending_tasks)
-    
-    # Week and month earnings
     week_ago = now - timedelta(days=7)
     month_ago = now - timedelta(days=30)
     
-    week_earnings = sum(
-        task.get("total_amount", 0) 
-        for task in paid_tasks 
-        if task.get("completed_at") and task["completed_at"] >= week_ago
-    )
+    if start is None:
+        if period == "week":
+            start = week_ago
+        elif period == "month":
+            start = month_ago
     
-    month_earnings = sum(
-        task.get("total_amount", 0) 
-        for task in paid_tasks 
-        if task.get("completed_at") and task["completed_at"] >= month_ago
-    )
+    date_filter = {}
+    if start is not None:
+        date_filter["$gte"] = start
+    if end is not None:
+        date_filter["$lt"] = end
+    paid_match = {"is_paid": True}
+    if date_filter:
+        paid_match["completed_at"] = date_filter
     
-    # Payment history
-    payment_history = [
-        {
-            "title": task.get("title"),
-            "client_name": task.get("client_name", "Unknown"),
-            "completed_at": task.get("completed_at"),
-            "hours_worked": task.get("hours_worked"),
-            "total_amount": task.get("total_amount", 0),
-            "is_paid": task.get("is_paid", False),
-            "payment_method": task.get("payment_method", "cash")
-        }
-        for task in (paid_tasks + pending_tasks)
-    ]
+    def amount_since(since: datetime) -> dict:
+        return {"$sum": {"$cond": [{"$gte": ["$completed_at", since]}, "$total_amount", 0]}}
+    
+    facets = {
+        "paid": [
+            {"$match": paid_match},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": "$total_amount"},
+                "count": {"$sum": 1},
+                "week": amount_since(week_ago),
+                "month": amount_since(month_ago)
+            }}
+        ],
+        "pending": [
+            {"$match": {"is_paid": False}},
+            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}, "count": {"$sum": 1}}}
+        ],
+        "history": [
+            {"$match": {"$or": [paid_match, {"is_paid": False}]}},
+            {"$sort": {"completed_at": -1}},
+            {"$limit": EARNINGS_HISTORY_LIMIT},
+            {"$project": {
+                "_id": 0,
+                "title": {"$ifNull": ["$title", None]},
+                "client_name": {"$ifNull": ["$client_name", "Unknown"]},
+                "completed_at": {"$ifNull": ["$completed_at", None]},
+                "hours_worked": {"$ifNull": ["$hours_worked", None]},
+                "total_amount": {"$ifNull": ["$total_amount", 0]},
+                "is_paid": {"$ifNull": ["$is_paid", False]},
+                "payment_method": {"$ifNull": ["$payment_method", "cash"]}
+            }}
+        ]
+    }
+    if bucket:
+        facets["buckets"] = [
+            {"$match": paid_match},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$completed_at", "unit": bucket, "startOfWeek": "monday"}},
+                "earnings": {"$sum": "$total_amount"},
+                "tasks": {"$sum": 1}
+            }},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "start": "$_id", "earnings": 1, "tasks": 1}}
+        ]
     
-    # Sort by date descending
-    payment_history.sort(key=lambda x: x.get("completed_at") or datetime.min, reverse=True)
+    # Single pass over the tasker's completed tasks (tasker_status_paid_completed index)
+    result = (await db.tasks.aggregate([
+        {"$match": {"assigned_tasker_id": current_user.id, "status": "completed"}},
+        {"$facet": facets}
+    ]).to_list(1))[0]
     
-    return {
-        "total_earnings": total_earnings,
-        "pending_earnings": pending_earnings,
-        "pending_count": len(pending_tasks),
-        "week_earnings": week_earnings,
-        "month_earnings": month_earnings,
-        "total_tasks": len(paid_tasks),
-        "payment_history": payment_history[:50]  # Latest 50
+    paid = result["paid"][0] if result["paid"] else {}
+    pending = result["pending"][0] if result["pending"] else {}
+    
+    earnings = {
+        "total_earnings": paid.get("total", 0),
+        "pending_earnings": pending.get("total", 0),
+        "pending_count": pending.get("count", 0),
+        "week_earnings": paid.get("week", 0),
+        "month_earnings": paid.get("month", 0),
+        "total_tasks": paid.get("count", 0),
+        "payment_history": result["history"]
     }
+    if bucket:
+        earnings["buckets"] = result["buckets"]
+    return earnings
 
 
 @router.put("/profile", response_model=UserResponse)
@@ -216,9 +558,12 @@ async def update_tasker_profile(
             {"id": current_user.id},
             {"$set": update_data}
         )
+        user_cache.invalidate_user(current_user.id)
+        await tasker_search.sync_profile(db, current_user.id)
+        await refresh_badges(db, current_user.id)
         logger.info(f"MongoDB update result - matched: {result.matched_count}, modified: {result.modified_count}")
         logger.info(f"Tasker profile updated: {current_user.id}")
     
     # Get updated user
-    updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "hashed_password": 0})
+    updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "hashed_password": 0, "search": 0})
     return UserResponse(**updated_user)
@@ -0,0 +1,145 @@
+"""
+Tasker Search Document
+Flattened, indexable search fields embedded in each tasker's user document
+under "search", so tasker search never has to $elemMatch over the mixed
+string / ServiceDetail tasker_profile.services list.
+
+    search.service_keys   category, subcategory and legacy string services
+    search.category_ids   service_categories ids the tasker offers
+    search.min_price      cheapest service price (CFA)
+    search.max_price      most expensive service price (CFA)
+    search.category_prices  {category_id: cheapest price in that category}
+    search.is_available   mirrors tasker_profile.is_available
+    search.rating         average verified review rating
+    search.total_reviews  verified review count
+    search.completed_tasks
+
+Profile fields are refreshed by sync_profile() whenever the tasker profile
+changes and recomputed by rebuild_tasker_search(). The rating and task
+counters are maintained by tasker_stats; both writers start them at 0 when
+missing, so a tasker without reviews still sorts (and pages) by rating.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from matching import match_index
+
+logger = logging.getLogger(__name__)
+
+# Counters owned by tasker_stats, only defaulted here
+STAT_FIELDS = ("search.rating", "search.total_reviews", "search.completed_tasks")
+
+
+async def _category_lookup(db: AsyncIOMotorDatabase) -> Dict[str, str]:
+    """Map category id, English and French names (lowercased) to the category id."""
+    lookup = {}
+    async for category in db.service_categories.find({}, {"_id": 0, "id": 1, "name_en": 1, "name_fr": 1}):
+        for key in (category.get("id"), category.get("name_en"), category.get("name_fr")):
+            if key:
+                lookup[key.lower()] = category["id"]
+    return lookup
+
+
+def build_profile_fields(profile: Optional[dict], category_lookup: Dict[str, str]) -> Dict[str, Any]:
+    """Search fields derived from a tasker_profile sub-document."""
+    profile = profile or {}
+    default_rate = profile.get("hourly_rate") or 0.0
+
+    service_keys: List[str] = []
+    category_ids: List[str] = []
+    prices: List[float] = []
+    category_prices: Dict[str, float] = {}
+
+    for service in profile.get("services") or []:
+        if isinstance(service, str):
+            names = [service]
+            price = default_rate
+        elif isinstance(service, dict):
+            names = [service.get("category"), service.get("subcategory")]
+            if service.get("pricing_type") == "fixed":
+                price = service.get("fixed_price") or default_rate
+            else:
+                price = service.get("hourly_rate") or default_rate
+        else:
+            continue
+
+        for name in filter(None, names):
+            if name not in service_keys:
+                service_keys.append(name)
+            category_id = category_lookup.get(name.lower())
+            if category_id and category_id not in category_ids:
+                category_ids.append(category_id)
+            if category_id:
+                category_prices[category_id] = min(float(price), category_prices.get(category_id, float(price)))
+        prices.append(float(price))
+
+    if not prices:
+        prices = [float(default_rate)]
+
+    return {
+        "search.service_keys": service_keys,
+        "search.category_ids": category_ids,
+        "search.min_price": min(prices),
+        "search.max_price": max(prices),
+        "search.category_prices": category_prices,
+        "search.is_available": bool(profile.get("is_available", True)),
+    }
+
+
+def _search_update(fields: Dict[str, Any]) -> List[dict]:
+    """Pipeline update setting the profile fields and defaulting the stat counters to 0."""
+    stage = {field: {"$literal": value} for field, value in fields.items()}
+    for field in STAT_FIELDS:
+        stage[field] = {"$ifNull": [f"${field}", 0]}
+    return [{"$set": stage}]
+
+
+async def sync_profile(db: AsyncIOMotorDatabase, tasker_id: str):
+    """Refresh the profile-derived search fields after a profile change."""
+    user = await db.users.find_one({"id": tasker_id, "role": "tasker"}, {"_id": 0, "tasker_profile": 1})
+    if user is None:
+        return
+    fields = build_profile_fields(user.get("tasker_profile"), await _category_lookup(db))
+    await db.users.update_one(
+        {"id": tasker_id},
+        _search_update({**fields, "search.updated_at": datetime.utcnow()})
+    )
+    match_index.invalidate()
+
+
+async def rebuild_tasker_search(db: AsyncIOMotorDatabase, only_missing: bool = False) -> int:
+    """
+    Recompute the profile-derived search fields of every tasker.
+
+    Args:
+        only_missing: Only build taskers whose search document is missing or
+            predates search.category_prices or the stat defaults
+
+    Returns:
+        Number of taskers updated
+    """
+    category_lookup = await _category_lookup(db)
+
+    query = {"role": "tasker"}
+    if only_missing:
+        query["$or"] = [
+            {"search.category_prices": {"$exists": False}},
+            {"search.rating": {"$exists": False}}
+        ]
+
+    now = datetime.utcnow()
+    operations = []
+    async for user in db.users.find(query, {"_id": 0, "id": 1, "tasker_profile": 1}):
+        fields = build_profile_fields(user.get("tasker_profile"), category_lookup)
+        fields["search.updated_at"] = now
+        operations.append(UpdateOne({"id": user["id"]}, _search_update(fields)))
+
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+    logger.info(f"Rebuilt tasker search documents: {len(operations)} taskers")
+    return len(operations)
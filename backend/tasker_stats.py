@@ -0,0 +1,216 @@
+"""
+Tasker Stats
+Rating and completed-task aggregates kept on users.tasker_profile and
+maintained incrementally, so review writes and rating reads cost the same
+regardless of how many reviews a tasker has.
+
+    tasker_profile.rating_sum            sum of verified review ratings
+    tasker_profile.total_reviews         verified review count
+    tasker_profile.rating_distribution   {"1".."5": count}
+    tasker_profile.average_rating        rating_sum / total_reviews, 1 decimal
+    tasker_profile.completed_tasks       tasks that reached "completed"
+    tasker_profile.total_tasks           tasks ever assigned to the tasker
+    tasker_profile.badges                badge types earned (see badge_routes)
+
+The rating and counters are mirrored into the tasker search document
+(search.rating, search.total_reviews, search.completed_tasks) in the same
+writes, and badges are refreshed after every change. rebuild_tasker_stats()
+recomputes everything from reviews and tasks.
+
+Each increment may carry an op_id (the outbox message id). The last
+STAT_OPS_KEPT op ids are kept in users.stat_ops and the increment is
+conditional on its op_id not being there, so a retried message counts once;
+the average and badges are derived from the stored counters and simply
+refreshed again.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+import user_cache
+from models import TaskerProfile
+
+logger = logging.getLogger(__name__)
+
+STARS = (1, 2, 3, 4, 5)
+STAT_OPS_KEPT = 100
+
+# Pipeline update deriving the average from the stored sum and count. Being
+# computed from the document itself, concurrent reviews always converge.
+_REFRESH_AVERAGE = [{"$set": {
+    "tasker_profile.average_rating": {"$cond": [
+        {"$gt": ["$tasker_profile.total_reviews", 0]},
+        {"$round": [{"$divide": ["$tasker_profile.rating_sum", "$tasker_profile.total_reviews"]}, 1]},
+        0.0
+    ]},
+    "search.total_reviews": "$tasker_profile.total_reviews"
+}}, {"$set": {"search.rating": "$tasker_profile.average_rating"}}]
+
+
+async def _ensure_profile(db: AsyncIOMotorDatabase, tasker_id: str):
+    """Taskers who never saved a profile have tasker_profile: null, which $inc cannot traverse."""
+    await db.users.update_one(
+        {"id": tasker_id, "tasker_profile": None},
+        {"$set": {"tasker_profile": TaskerProfile().model_dump()}}
+    )
+
+
+async def _refresh_badges(db: AsyncIOMotorDatabase, tasker_id: str):
+    from routes.badge_routes import refresh_badges
+    await refresh_badges(db, tasker_id)
+
+
+async def _increment(db: AsyncIOMotorDatabase, tasker_id: str, increments: Dict[str, int], op_id: Optional[str]):
+    """Apply counter increments, at most once per op_id."""
+    query = {"id": tasker_id}
+    update = {"$inc": increments}
+    if op_id:
+        query["stat_ops"] = {"$ne": op_id}
+        update["$push"] = {"stat_ops": {"$each": [op_id], "$slice": -STAT_OPS_KEPT}}
+    await db.users.update_one(query, update)
+
+
+async def record_review(db: AsyncIOMotorDatabase, tasker_id: str, rating: int, op_id: Optional[str] = None):
+    """Add one verified review to the tasker's rating aggregates."""
+    if not tasker_id:
+        return
+    await _ensure_profile(db, tasker_id)
+    await _increment(db, tasker_id, {
+        "tasker_profile.rating_sum": rating,
+        "tasker_profile.total_reviews": 1,
+        f"tasker_profile.rating_distribution.{rating}": 1
+    }, op_id)
+    await db.users.update_one({"id": tasker_id}, _REFRESH_AVERAGE)
+    user_cache.invalidate_user(tasker_id)
+    await _refresh_badges(db, tasker_id)
+
+
+async def record_task_completed(db: AsyncIOMotorDatabase, tasker_id: str, op_id: Optional[str] = None):
+    """Count a task that just transitioned to completed."""
+    if not tasker_id:
+        return
+    await _ensure_profile(db, tasker_id)
+    await _increment(db, tasker_id, {"tasker_profile.completed_tasks": 1, "search.completed_tasks": 1}, op_id)
+    user_cache.invalidate_user(tasker_id)
+    await _refresh_badges(db, tasker_id)
+
+
+async def record_task_assigned(
+    db: AsyncIOMotorDatabase,
+    tasker_id: str,
+    amount: int = 1,
+    op_id: Optional[str] = None
+):
+    """Count a task assigned to (or, with amount=-1, taken away from) a tasker."""
+    if not tasker_id:
+        return
+    await _ensure_profile(db, tasker_id)
+    await _increment(db, tasker_id, {"tasker_profile.total_tasks": amount}, op_id)
+    user_cache.invalidate_user(tasker_id)
+    await _refresh_badges(db, tasker_id)
+
+
+async def get_rating_summary(db: AsyncIOMotorDatabase, tasker_id: str) -> Optional[dict]:
+    """Stored rating aggregates and completed task count of a tasker, or None if the tasker does not exist."""
+    user = await db.users.find_one(
+        {"id": tasker_id},
+        {
+            "_id": 0,
+            "tasker_profile.average_rating": 1,
+            "tasker_profile.total_reviews": 1,
+            "tasker_profile.rating_distribution": 1,
+            "tasker_profile.completed_tasks": 1
+        }
+    )
+    if user is None:
+        return None
+    profile = user.get("tasker_profile") or {}
+    distribution = profile.get("rating_distribution") or {}
+    return {
+        "average_rating": profile.get("average_rating", 0.0),
+        "total_reviews": profile.get("total_reviews", 0),
+        "rating_distribution": {star: distribution.get(str(star), 0) for star in STARS},
+        "total_completed_tasks": profile.get("completed_tasks", 0)
+    }
+
+
+async def rebuild_tasker_stats(db: AsyncIOMotorDatabase, only_missing: bool = False) -> int:
+    """
+    Recompute rating aggregates, task counters and badges from reviews and tasks.
+
+    Args:
+        only_missing: Only build taskers whose aggregates were never initialized
+
+    Returns:
+        Number of taskers updated
+    """
+    from routes.badge_routes import earned_badge_types
+    
+    review_match = {"verified_booking": True}
+    task_match = {"assigned_tasker_id": {"$ne": None}}
+    user_query = {"role": "tasker"}
+    if only_missing:
+        user_query["$or"] = [
+            {"tasker_profile.rating_sum": {"$exists": False}},
+            {"tasker_profile.total_tasks": {"$exists": False}}
+        ]
+
+    ratings: Dict[str, Dict[str, int]] = {}
+    async for row in db.reviews.aggregate([
+        {"$match": review_match},
+        {"$group": {"_id": {"tasker_id": "$tasker_id", "rating": "$rating"}, "count": {"$sum": 1}}}
+    ]):
+        ratings.setdefault(row["_id"]["tasker_id"], {})[str(row["_id"]["rating"])] = row["count"]
+
+    completed: Dict[str, int] = {}
+    assigned: Dict[str, int] = {}
+    async for row in db.tasks.aggregate([
+        {"$match": task_match},
+        {"$group": {
+            "_id": "$assigned_tasker_id",
+            "total": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}}
+        }}
+    ]):
+        completed[row["_id"]] = row["completed"]
+        assigned[row["_id"]] = row["total"]
+
+    operations = []
+    rebuilt_ids = []
+    async for user in db.users.find(user_query, {"_id": 0, "id": 1, "is_verified": 1, "tasker_profile": 1}):
+        distribution = ratings.get(user["id"], {})
+        total_reviews = sum(distribution.values())
+        rating_sum = sum(int(star) * count for star, count in distribution.items())
+        average = round(rating_sum / total_reviews, 1) if total_reviews else 0.0
+        stats = {
+            "rating_sum": rating_sum,
+            "total_reviews": total_reviews,
+            "rating_distribution": distribution,
+            "average_rating": average,
+            "completed_tasks": completed.get(user["id"], 0),
+            "total_tasks": assigned.get(user["id"], 0),
+        }
+        profile = {**(user.get("tasker_profile") or TaskerProfile().model_dump()), **stats}
+        profile["badges"] = stats["badges"] = earned_badge_types({**user, "tasker_profile": profile})
+
+        if user.get("tasker_profile") is None:
+            fields = {"tasker_profile": profile}
+        else:
+            fields = {f"tasker_profile.{key}": value for key, value in stats.items()}
+        fields.update({
+            "search.rating": average,
+            "search.total_reviews": total_reviews,
+            "search.completed_tasks": stats["completed_tasks"],
+        })
+        operations.append(UpdateOne({"id": user["id"]}, {"$set": fields}))
+        rebuilt_ids.append(user["id"])
+
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+        for tasker_id in rebuilt_ids:
+            user_cache.invalidate_user(tasker_id)
+    logger.info(f"Rebuilt tasker stats: {len(operations)} taskers")
+    return len(operations)
@@ -0,0 +1,114 @@
+"""
+Unread Counters
+Per-user unread notification and message counts, kept in the
+unread_counters collection and maintained with atomic $inc as items are
+created, read and deleted. The unread endpoints become a single point read.
+
+reconcile_unread_counters() recomputes every counter from the source
+collections and runs periodically to repair drift (e.g. from bulk deletes
+done outside the API).
+"""
+
+import logging
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS = "notifications"
+MESSAGES = "messages"
+
+
+async def increment(db: AsyncIOMotorDatabase, user_id: str, kind: str, amount: int = 1):
+    """Atomically add `amount` (negative to decrement) to a user's counter."""
+    if not amount:
+        return
+    await db.unread_counters.update_one(
+        {"user_id": user_id},
+        {"$inc": {kind: amount}},
+        upsert=True
+    )
+
+
+async def increment_many(db: AsyncIOMotorDatabase, amounts: Dict[str, int], kind: str):
+    """Add to many users' counters in one bulk write ({user_id: amount})."""
+    operations = [
+        UpdateOne({"user_id": user_id}, {"$inc": {kind: amount}}, upsert=True)
+        for user_id, amount in amounts.items()
+        if amount
+    ]
+    if operations:
+        await db.unread_counters.bulk_write(operations, ordered=False)
+
+
+async def get_counts(db: AsyncIOMotorDatabase, user_id: str) -> Dict[str, int]:
+    """Current unread counts for a user."""
+    counters = await db.unread_counters.find_one({"user_id": user_id}, {"_id": 0}) or {}
+    return {
+        NOTIFICATIONS: max(0, counters.get(NOTIFICATIONS, 0)),
+        MESSAGES: max(0, counters.get(MESSAGES, 0)),
+    }
+
+
+def _unchanged(counters: Dict[str, int]) -> Dict[str, object]:
+    """Filter matching a counter document only while it still holds the values read."""
+    query: Dict[str, object] = {"user_id": counters["user_id"]}
+    for kind in (NOTIFICATIONS, MESSAGES):
+        query[kind] = counters[kind] if kind in counters else {"$exists": False}
+    return query
+
+
+async def reconcile_unread_counters(db: AsyncIOMotorDatabase) -> int:
+    """
+    Recompute every user's counters from notifications and messages.
+    
+    Counters are read before the source collections are counted, and a
+    correction only applies to a counter that still holds the value read:
+    one that moved meanwhile (an item was created or read) is left for the
+    next run instead of having that $inc overwritten.
+    
+    Returns:
+        Number of counter documents that were corrected
+    """
+    snapshot = await db.unread_counters.find({}, {"_id": 0}).to_list(None)
+    actual: Dict[str, Dict[str, int]] = {}
+    
+    async for row in db.notifications.aggregate([
+        {"$match": {"is_read": False}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]):
+        actual.setdefault(row["_id"], {})[NOTIFICATIONS] = row["count"]
+    
+    async for row in db.messages.aggregate([
+        {"$match": {"is_read": False}},
+        {"$group": {"_id": "$receiver_id", "count": {"$sum": 1}}}
+    ]):
+        actual.setdefault(row["_id"], {})[MESSAGES] = row["count"]
+    
+    operations = []
+    for counters in snapshot:
+        expected = actual.pop(counters["user_id"], {})
+        if (counters.get(NOTIFICATIONS, 0) != expected.get(NOTIFICATIONS, 0)
+                or counters.get(MESSAGES, 0) != expected.get(MESSAGES, 0)):
+            operations.append(UpdateOne(
+                _unchanged(counters),
+                {"$set": {NOTIFICATIONS: expected.get(NOTIFICATIONS, 0), MESSAGES: expected.get(MESSAGES, 0)}}
+            ))
+    
+    # Users with unread items but no counter document yet; one created
+    # meanwhile by an $inc is left alone
+    for user_id, expected in actual.items():
+        operations.append(UpdateOne(
+            {"user_id": user_id},
+            {"$setOnInsert": {NOTIFICATIONS: expected.get(NOTIFICATIONS, 0), MESSAGES: expected.get(MESSAGES, 0)}},
+            upsert=True
+        ))
+    
+    corrected = 0
+    if operations:
+        result = await db.unread_counters.bulk_write(operations, ordered=False)
+        corrected = result.modified_count + result.upserted_count
+    logger.info(f"Reconciled unread counters: {corrected} corrected, {len(operations) - corrected} changed meanwhile")
+    return corrected
@@ -0,0 +1,95 @@
+"""
+Authenticated User Cache
+In-process TTL + LRU cache in front of auth.get_current_user.
+
+Two caches are kept:
+- decoded tokens, keyed by the SHA-256 of the raw JWT, so repeated requests
+  with the same token skip signature verification
+- UserInDB models, keyed by user id, so repeated requests skip the
+  users collection read
+
+Every route that writes to a user document must call invalidate_user() so
+the next request sees the change. Entries also expire after a short TTL,
+which bounds staleness across replicas.
+"""
+
+import hashlib
+import os
+import time
+from typing import Optional, Dict, Any
+
+from cachetools import TTLCache
+
+from models import UserInDB
+
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+_users: TTLCache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+_tokens: TTLCache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+_stats: Dict[str, int] = {
+    "user_hits": 0,
+    "user_misses": 0,
+    "token_hits": 0,
+    "token_misses": 0,
+    "invalidations": 0,
+}
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_token_user_id(token: str) -> Optional[str]:
+    """Return the user id of an already-verified, unexpired token."""
+    entry = _tokens.get(_token_key(token))
+    if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+        _stats["token_misses"] += 1
+        return None
+    _stats["token_hits"] += 1
+    return entry[0]
+
+
+def set_token_user_id(token: str, user_id: str, expires_at: Optional[float] = None):
+    """Remember a verified token. expires_at is the JWT `exp` as a UNIX timestamp."""
+    _tokens[_token_key(token)] = (user_id, expires_at)
+
+
+def get_user(user_id: str) -> Optional[UserInDB]:
+    """Return the cached user, or None on a miss."""
+    user = _users.get(user_id)
+    if user is None:
+        _stats["user_misses"] += 1
+    else:
+        _stats["user_hits"] += 1
+    return user
+
+
+def set_user(user: UserInDB):
+    """Cache a user loaded from the database."""
+    _users[user.id] = user
+
+
+def invalidate_user(user_id: str):
+    """Drop a user from the cache after their document was modified."""
+    _users.pop(user_id, None)
+    _stats["invalidations"] += 1
+
+
+def clear():
+    """Drop every cached user and token."""
+    _users.clear()
+    _tokens.clear()
+
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss counters and current sizes."""
+    user_lookups = _stats["user_hits"] + _stats["user_misses"]
+    return {
+        **_stats,
+        "users_cached": len(_users),
+        "tokens_cached": len(_tokens),
+        "user_hit_rate": round(_stats["user_hits"] / user_lookups, 3) if user_lookups else 0.0,
+    }
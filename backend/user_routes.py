@@ -11,7 +11,8 @@ import logging
 
 from database import get_database
 from models import UserResponse, UserRole, Language
-from utils import save_upload_file
+from utils import save_upload_file, geo_point
+import user_cache
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -60,12 +61,20 @@ async def update_profile(
         update_data["longitude"] = longitude
     if language:
         update_data["language"] = language
+    if latitude is not None or longitude is not None:
+        location = geo_point(
+            latitude if latitude is not None else current_user.latitude,
+            longitude if longitude is not None else current_user.longitude
+        )
+        if location:
+            update_data["location"] = location
     
     if update_data:
         await db.users.update_one(
             {"id": current_user.id},
             {"$set": update_data}
         )
+        user_cache.invalidate_user(current_user.id)
     
     # Get updated user
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "hashed_password": 0})
@@ -87,12 +96,20 @@ async def update_user_location(
         update_data["latitude"] = location_data["latitude"]
     if "longitude" in location_data:
         update_data["longitude"] = location_data["longitude"]
+    if update_data:
+        location = geo_point(
+            update_data.get("latitude", current_user.latitude),
+            update_data.get("longitude", current_user.longitude)
+        )
+        if location:
+            update_data["location"] = location
     
     if update_data:
         await db.users.update_one(
             {"id": current_user.id},
             {"$set": update_data}
         )
+        user_cache.invalidate_user(current_user.id)
     
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "hashed_password": 0})
     return UserResponse(**updated_user)
@@ -117,6 +134,7 @@ async def upload_profile_image(
                 {"id": current_user.id},
                 {"$set": {"tasker_profile.profile_image": file_path}}
             )
+            user_cache.invalidate_user(current_user.id)
         
         return {"file_path": file_path}
     except ValueError as e:
@@ -1,9 +1,11 @@
 """Utility functions for the application."""
+import io
 import os
 from pathlib import Path
 import uuid
 import math
-from typing import Tuple
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
 from fastapi import UploadFile
 from PIL import Image
 
@@ -22,6 +24,24 @@ MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 ALLOWED_DOC_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
 
+# Distance and ETA configuration
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_SPEED_KMH = float(os.getenv("ETA_DEFAULT_SPEED_KMH", "30"))
+
+
+def _parse_city_speeds(value: str) -> Dict[str, float]:
+    """Parse "abidjan:22,dakar:18" into {"abidjan": 22.0, "dakar": 18.0}."""
+    speeds = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        city, _, speed = item.rpartition(":")
+        if city and speed:
+            speeds[city.strip().lower()] = float(speed)
+    return speeds
+
+
+# Average travel speed per city (lowercased name), e.g. ETA_CITY_SPEEDS_KMH="abidjan:22,dakar:18"
+CITY_SPEEDS_KMH: Dict[str, float] = _parse_city_speeds(os.getenv("ETA_CITY_SPEEDS_KMH", ""))
+
 
 async def save_upload_file(file: UploadFile, upload_type: str = "profiles") -> str:
     """
@@ -80,10 +100,9 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     """
     Calculate distance between two coordinates using Haversine formula.
     
-    Returns distance in kilometers.
+    Returns distance in kilometers. Use haversine_km / distance_matrix_km
+    for many points at once.
     """
-    R = 6371  # Earth's radius in kilometers
-    
     lat1_rad = math.radians(lat1)
     lat2_rad = math.radians(lat2)
     delta_lat = math.radians(lat2 - lat1)
@@ -92,24 +111,115 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     
-    distance = R * c
-    return distance
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized Haversine distance in kilometers.
+    
+    Arguments are scalars or arrays in degrees and broadcast against each
+    other, so many-to-one is haversine_km(lats, lngs, lat, lng).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def equirectangular_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized equirectangular approximation in kilometers.
+    
+    Cheaper than Haversine and within a fraction of a percent at city
+    scale (tens of kilometers); broadcasts like haversine_km.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    return EARTH_RADIUS_KM * np.hypot(x, lat2 - lat1)
+
+
+_DISTANCE_METHODS = {"haversine": haversine_km, "equirectangular": equirectangular_km}
+
+
+def distance_matrix_km(
+    origins: Sequence[Tuple[float, float]],
+    destinations: Sequence[Tuple[float, float]],
+    method: str = "haversine"
+) -> np.ndarray:
+    """
+    Distances between every origin and every destination.
+    
+    Args:
+        origins: (latitude, longitude) pairs, n of them
+        destinations: (latitude, longitude) pairs, m of them
+        method: "haversine" or "equirectangular"
+    
+    Returns:
+        (n, m) array of kilometers
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    return _DISTANCE_METHODS[method](
+        origins[:, 0:1], origins[:, 1:2],
+        destinations[:, 0][np.newaxis, :], destinations[:, 1][np.newaxis, :]
+    )
+
+
+def distances_to_km(
+    points: Sequence[Tuple[float, float]],
+    latitude: float,
+    longitude: float,
+    method: str = "haversine"
+) -> np.ndarray:
+    """Distance in kilometers from each (latitude, longitude) point to one location."""
+    return distance_matrix_km(points, [(latitude, longitude)], method)[:, 0]
+
+
+def path_length_km(points: Sequence[Sequence[float]]) -> float:
+    """Length of a path through [latitude, longitude, ...] points, in kilometers."""
+    if len(points) < 2:
+        return 0.0
+    coords = np.asarray([(p[0], p[1]) for p in points], dtype=np.float64)
+    return float(haversine_km(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1]).sum())
+
+
+def geo_point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    """
+    Build a GeoJSON point for a 2dsphere index.
+    
+    Returns None unless both coordinates are set. Note GeoJSON order is
+    [longitude, latitude].
+    """
+    if latitude is None or longitude is None:
+        return None
+    return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+
+
+def city_speed_kmh(city: Optional[str] = None) -> float:
+    """Average travel speed for a city, falling back to DEFAULT_SPEED_KMH."""
+    if city:
+        return CITY_SPEEDS_KMH.get(city.strip().lower(), DEFAULT_SPEED_KMH)
+    return DEFAULT_SPEED_KMH
 
 
-def calculate_eta(distance_km: float, speed_kmh: float = 30) -> int:
+def calculate_eta(distance_km: float, speed_kmh: Optional[float] = None, city: Optional[str] = None) -> int:
     """
     Calculate estimated time of arrival in minutes.
     
     Args:
         distance_km: Distance in kilometers
-        speed_kmh: Average speed in km/h (default: 30 km/h for city traffic)
+        speed_kmh: Average speed in km/h (default: the city's speed profile)
+        city: City used to pick the speed when speed_kmh is not given
     
     Returns:
         ETA in minutes
     """
-    hours = distance_km / speed_kmh
+    hours = distance_km / (speed_kmh or city_speed_kmh(city))
     minutes = int(hours * 60)
     return minutes
 
 
-import io  # Add this import at the top
+def calculate_eta_batch(distances_km, speed_kmh: Optional[float] = None, city: Optional[str] = None) -> np.ndarray:
+    """Vectorized calculate_eta: minutes for an array of distances."""
+    hours = np.asarray(distances_km, dtype=np.float64) / (speed_kmh or city_speed_kmh(city))
+    return (hours * 60).astype(np.int64)
@@ -17,6 +17,21 @@ apiClient.interceptors.request.use((config) => {
 
 export default apiClient;
 
+// Build a ws(s):// URL for a backend path, authenticated with the stored token
+export const buildSocketUrl = (path) => {
+  const url = new URL(`${API_URL}${path}`, window.location.origin);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  url.searchParams.set('token', localStorage.getItem('token') || '');
+  return url.toString();
+};
+
+// Build an EventSource URL for a backend path (EventSource cannot send headers)
+export const buildStreamUrl = (path) => {
+  const url = new URL(`${API_URL}${path}`, window.location.origin);
+  url.searchParams.set('token', localStorage.getItem('token') || '');
+  return url.toString();
+};
+
 // API functions
 export const categoriesAPI = {
   getAll: () => apiClient.get('/categories'),
@@ -39,6 +54,7 @@ export const tasksAPI = {
 
 export const taskersAPI = {
   search: (params) => apiClient.get('/taskers/search', { params }),
+  cards: (params) => apiClient.get('/taskers/cards', { params }),
   updateProfile: (data) => apiClient.put('/taskers/profile', data),
   uploadCertification: (file) => {
     const formData = new FormData();
@@ -71,6 +87,8 @@ export const reviewsAPI = {
 export const locationAPI = {
   update: (data) => apiClient.post('/location/update', data),
   getTaskerLocation: (taskerId, taskId) => apiClient.get(`/location/tasker/${taskerId}/task/${taskId}`),
+  getTrack: (taskId, params) => apiClient.get(`/tasks/${taskId}/track`, { params }),
+  streamUrl: (taskId) => buildStreamUrl(`/api/tasks/${taskId}/location/stream`),
 };
 
 export const paymentsAPI = {
@@ -2,14 +2,20 @@ import React, { useState, useEffect } from 'react';
 import { Shield, Star, Award, CheckCircle, Zap, FileCheck } from 'lucide-react';
 import axios from 'axios';
 
-const BadgeDisplay = ({ taskerId, showTooltip = true }) => {
-  const [badges, setBadges] = useState([]);
-  const [loading, setLoading] = useState(true);
+// Pass `badges` (e.g. from POST /api/badges/batch) to skip the per-tasker request
+const BadgeDisplay = ({ taskerId, badges: preloadedBadges, showTooltip = true }) => {
+  const [badges, setBadges] = useState(preloadedBadges || []);
+  const [loading, setLoading] = useState(!preloadedBadges);
   const API_URL = process.env.REACT_APP_BACKEND_URL;
 
   useEffect(() => {
+    if (preloadedBadges) {
+      setBadges(preloadedBadges);
+      setLoading(false);
+      return;
+    }
     fetchBadges();
-  }, [taskerId]);
+  }, [taskerId, preloadedBadges]);
 
   const fetchBadges = async () => {
     try {
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import { translations } from '../utils/translations';
-import { messagesAPI } from '../api/client';
+import { messagesAPI, buildSocketUrl } from '../api/client';
 import { toast } from 'react-toastify';
 import { Send, X, MessageCircle, Minimize2 } from 'lucide-react';
 
@@ -16,9 +16,43 @@ const ChatBox = ({ task, onClose }) => {
 
   useEffect(() => {
     fetchMessages();
-    // Poll for new messages every 3 seconds
-    const interval = setInterval(fetchMessages, 3000);
-    return () => clearInterval(interval);
+
+    // Receive new messages and read receipts over the chat socket;
+    // fall back to slow polling only while the socket is down
+    let socket;
+    try {
+      socket = new WebSocket(buildSocketUrl(`/ws/chat/${task.id}`));
+      socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'new_message' || data.type === 'message_sent') {
+          setMessages((prev) =>
+            prev.some((msg) => msg.id === data.message.id) ? prev : [...prev, data.message]
+          );
+          if (data.type === 'new_message') {
+            socket.send(JSON.stringify({ type: 'read' }));
+          }
+        } else if (data.type === 'messages_read') {
+          setMessages((prev) =>
+            prev.map((msg) => (msg.receiver_id === data.reader_id ? { ...msg, is_read: true } : msg))
+          );
+        }
+      };
+    } catch (error) {
+      console.warn('Chat socket unavailable, using polling:', error);
+    }
+
+    const interval = setInterval(() => {
+      if (!socket || socket.readyState !== WebSocket.OPEN) {
+        fetchMessages();
+      }
+    }, 15000);
+
+    return () => {
+      clearInterval(interval);
+      if (socket) {
+        socket.close();
+      }
+    };
   }, [task.id]);
 
   useEffect(() => {
@@ -45,12 +79,14 @@ const ChatBox = ({ task, onClose }) => {
     if (!newMessage.trim()) return;
 
     try {
-      await messagesAPI.send({
+      const response = await messagesAPI.send({
         task_id: task.id,
         content: newMessage.trim(),
       });
+      setMessages((prev) =>
+        prev.some((msg) => msg.id === response.data.id) ? prev : [...prev, response.data]
+      );
       setNewMessage('');
-      await fetchMessages();
     } catch (error) {
       console.error('Error sending message:', error);
       toast.error(language === 'en' ? 'Failed to send message' : 'Échec de l\'envoi du message');
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { X, Send, MessageCircle } from 'lucide-react';
 import axios from 'axios';
 import { toast } from 'react-toastify';
+import { buildSocketUrl } from '../api/client';
 
 const ChatModal = ({ isOpen, onClose, task, currentUser, otherUser, language = 'en' }) => {
   const [messages, setMessages] = useState([]);
@@ -37,13 +38,8 @@ const ChatModal = ({ isOpen, onClose, task, currentUser, otherUser, language = '
     if (!task || !currentUser) return;
 
     try {
-      // Use wss:// for https and ws:// for http
-      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-      const backendUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
-      const wsUrl = backendUrl.replace('https://', '').replace('http://', '');
-      
       const websocket = new WebSocket(
-        `${protocol}//${wsUrl}/ws/chat/${task.id}/${currentUser.id}`
+        buildSocketUrl(`/ws/chat/${task.id}/${currentUser.id}`)
       );
 
       websocket.onopen = () => {
@@ -54,11 +50,24 @@ const ChatModal = ({ isOpen, onClose, task, currentUser, otherUser, language = '
         const data = JSON.parse(event.data);
         
         if (data.type === 'new_message') {
-          // Add incoming message
+          // Add incoming message and acknowledge it
           setMessages(prev => [...prev, data.message]);
+          websocket.send(JSON.stringify({ type: 'read' }));
         } else if (data.type === 'message_sent') {
-          // Message sent confirmation
-          console.log('Message sent successfully');
+          // Replace the optimistic copy with the stored message
+          setMessages(prev => {
+            const tempIndex = prev.findIndex(
+              msg => String(msg.id).startsWith('temp-') && msg.content === data.message.content
+            );
+            if (tempIndex === -1) return [...prev, data.message];
+            const next = [...prev];
+            next[tempIndex] = data.message;
+            return next;
+          });
+        } else if (data.type === 'messages_read') {
+          setMessages(prev => prev.map(msg =>
+            msg.receiver_id === data.reader_id ? { ...msg, is_read: true } : msg
+          ));
         }
       };
 
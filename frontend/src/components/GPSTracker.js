@@ -24,9 +24,34 @@ const GPSTracker = ({ task, onClose }) => {
 
   useEffect(() => {
     fetchLocation();
-    // Poll for location updates every 5 seconds
-    const interval = setInterval(fetchLocation, 5000);
-    return () => clearInterval(interval);
+    if (!task.assigned_tasker_id) return;
+
+    // Fixes are pushed as the tasker sends them
+    const source = new EventSource(locationAPI.streamUrl(task.id));
+    source.addEventListener('location', (event) => {
+      const fix = JSON.parse(event.data);
+      setTaskerLocation({
+        tasker_id: fix.tasker_id,
+        task_id: fix.task_id,
+        latitude: fix.latitude,
+        longitude: fix.longitude,
+        timestamp: fix.recorded_at,
+        estimated_arrival_minutes: fix.eta_minutes,
+      });
+      setError(null);
+      setLoading(false);
+    });
+
+    // Poll only while the stream is down (EventSource reconnects by itself)
+    const interval = setInterval(() => {
+      if (source.readyState !== EventSource.OPEN) {
+        fetchLocation();
+      }
+    }, 5000);
+    return () => {
+      clearInterval(interval);
+      source.close();
+    };
   }, [task.id, task.assigned_tasker_id]);
 
   const fetchLocation = async () => {
@@ -5,6 +5,7 @@ import L from 'leaflet';
 import axios from 'axios';
 import { toast } from 'react-toastify';
 import { Navigation, Clock, MapPin } from 'lucide-react';
+import { locationAPI } from '../api/client';
 
 // Custom icons for tasker and job location
 const taskerIcon = new L.Icon({
@@ -55,19 +56,38 @@ const LiveGPSTracker = ({ taskId, jobLocation, taskerName, language = 'fr' }) =>
   const [hasNotifiedProximity, setHasNotifiedProximity] = useState(false);
   const [previousDistance, setPreviousDistance] = useState(null);
   const intervalRef = useRef(null);
+  // Stream listeners are bound once; they call the latest applyTrackingStatus
+  const applyRef = useRef(null);
 
   useEffect(() => {
-    fetchTrackingStatus();
+    // Pushed updates: a snapshot on connect, then every location fix
+    const source = new EventSource(locationAPI.streamUrl(taskId));
+    const apply = (data) => applyRef.current && applyRef.current(data);
+    source.addEventListener('snapshot', (event) => apply(JSON.parse(event.data)));
+    source.addEventListener('location', (event) => {
+      const fix = JSON.parse(event.data);
+      apply({
+        is_tracking: true,
+        current_latitude: fix.latitude,
+        current_longitude: fix.longitude,
+        last_location_update: fix.recorded_at,
+      });
+    });
+    source.addEventListener('tracking_started', () => apply({ is_tracking: true }));
+    source.addEventListener('tracking_stopped', () => apply({ is_tracking: false }));
     
-    // Poll every 5 seconds for updates
+    // Poll only while the stream is down (EventSource reconnects by itself)
     intervalRef.current = setInterval(() => {
-      fetchTrackingStatus();
+      if (source.readyState !== EventSource.OPEN) {
+        fetchTrackingStatus();
+      }
     }, 5000);
     
     return () => {
       if (intervalRef.current) {
         clearInterval(intervalRef.current);
       }
+      source.close();
     };
   }, [taskId]);
 
@@ -81,67 +101,70 @@ const LiveGPSTracker = ({ taskId, jobLocation, taskerName, language = 'fr' }) =>
           },
         }
       );
+      applyTrackingStatus(response.data);
+    } catch (err) {
+      console.error('Error fetching tracking status:', err);
+    }
+  };
+
+  const applyTrackingStatus = (data) => {
+    const wasTracking = isTracking;
+    setIsTracking(data.is_tracking);
+    
+    // Show notification when tracking starts for the first time
+    if (data.is_tracking && !wasTracking && !hasNotified) {
+      toast.success(
+        `🚗 ${taskerName} ${language === 'en' ? 'is on the way!' : 'est en route!'}`,
+        {
+          position: "top-center",
+          autoClose: 5000,
+        }
+      );
+      setHasNotified(true);
+    }
+    
+    // If tracking stopped, reset notification flag
+    if (!data.is_tracking && wasTracking) {
+      setHasNotified(false);
+      setTrackingData(null);
+    }
+    
+    if (data.is_tracking && data.current_latitude && data.current_longitude) {
+      setTrackingData({
+        latitude: data.current_latitude,
+        longitude: data.current_longitude,
+        lastUpdate: data.last_location_update,
+      });
+      setError(null);
       
-      const data = response.data;
-      const wasTracking = isTracking;
-      setIsTracking(data.is_tracking);
-      
-      // Show notification when tracking starts for the first time
-      if (data.is_tracking && !wasTracking && !hasNotified) {
-        toast.success(
-          `🚗 ${taskerName} ${language === 'en' ? 'is on the way!' : 'est en route!'}`,
-          {
-            position: "top-center",
-            autoClose: 5000,
-          }
+      // Check proximity and notify if within 2km
+      if (jobLocation) {
+        const distance = calculateDistance(
+          data.current_latitude,
+          data.current_longitude,
+          jobLocation.latitude,
+          jobLocation.longitude
         );
-        setHasNotified(true);
-      }
-      
-      // If tracking stopped, reset notification flag
-      if (!data.is_tracking && wasTracking) {
-        setHasNotified(false);
-        setTrackingData(null);
-      }
-      
-      if (data.is_tracking && data.current_latitude && data.current_longitude) {
-        setTrackingData({
-          latitude: data.current_latitude,
-          longitude: data.current_longitude,
-          lastUpdate: data.last_location_update,
-        });
-        setError(null);
         
-        // Check proximity and notify if within 2km
-        if (jobLocation) {
-          const distance = calculateDistance(
-            data.current_latitude,
-            data.current_longitude,
-            jobLocation.latitude,
-            jobLocation.longitude
+        // Notify when tasker comes within 2km (only once)
+        if (distance <= 2 && !hasNotifiedProximity && previousDistance && previousDistance > 2) {
+          toast.info(
+            `📍 ${taskerName} ${language === 'en' ? 'is arriving soon! Less than 2 km away.' : 'arrive bientôt! Moins de 2 km.'}`,
+            {
+              position: "top-center",
+              autoClose: 7000,
+            }
           );
-          
-          // Notify when tasker comes within 2km (only once)
-          if (distance <= 2 && !hasNotifiedProximity && previousDistance && previousDistance > 2) {
-            toast.info(
-              `📍 ${taskerName} ${language === 'en' ? 'is arriving soon! Less than 2 km away.' : 'arrive bientôt! Moins de 2 km.'}`,
-              {
-                position: "top-center",
-                autoClose: 7000,
-              }
-            );
-            setHasNotifiedProximity(true);
-          }
-          
-          setPreviousDistance(distance);
+          setHasNotifiedProximity(true);
         }
-      } else if (data.is_tracking) {
-        setError(language === 'en' ? 'Waiting for location...' : 'En attente de la localisation...');
+        
+        setPreviousDistance(distance);
       }
-    } catch (err) {
-      console.error('Error fetching tracking status:', err);
+    } else if (data.is_tracking) {
+      setError(language === 'en' ? 'Waiting for location...' : 'En attente de la localisation...');
     }
   };
+  applyRef.current = applyTrackingStatus;
 
   const calculateDistance = (lat1, lon1, lat2, lon2) => {
     const R = 6371; // Earth radius in km
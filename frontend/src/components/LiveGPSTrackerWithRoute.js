@@ -2,9 +2,30 @@ import React, { useEffect, useRef, useState } from 'react';
 import mapboxgl from 'mapbox-gl';
 import 'mapbox-gl/dist/mapbox-gl.css';
 import { Navigation, Clock, MapPin } from 'lucide-react';
+import { locationAPI } from '../api/client';
 
 mapboxgl.accessToken = process.env.REACT_APP_MAPBOX_TOKEN;
 
+// Decode an encoded polyline (precision 5) into [lng, lat] pairs
+const decodePolyline = (encoded) => {
+  const coordinates = [];
+  let index = 0, lat = 0, lng = 0;
+  while (index < encoded.length) {
+    for (const axis of [0, 1]) {
+      let result = 0, shift = 0, byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      const delta = result & 1 ? ~(result >> 1) : result >> 1;
+      if (axis === 0) lat += delta; else lng += delta;
+    }
+    coordinates.push([lng / 1e5, lat / 1e5]);
+  }
+  return coordinates;
+};
+
 const LiveGPSTrackerWithRoute = ({ 
   taskId, 
   taskerLocation, 
@@ -98,8 +119,46 @@ const LiveGPSTrackerWithRoute = ({
 
     // Fetch and draw route
     fetchRoute(taskerLocation, jobLocation);
+    fetchTravelledPath();
   }, [taskerLocation, jobLocation, taskerName, language]);
 
+  // Path the tasker has actually travelled so far
+  const fetchTravelledPath = async () => {
+    if (!taskId) return;
+    try {
+      const response = await locationAPI.getTrack(taskId);
+      if (!map.current || response.data.points < 2) return;
+
+      const data = {
+        type: 'Feature',
+        properties: {},
+        geometry: { type: 'LineString', coordinates: decodePolyline(response.data.polyline) }
+      };
+
+      if (map.current.getSource('travelled')) {
+        map.current.getSource('travelled').setData(data);
+      } else {
+        map.current.addSource('travelled', { type: 'geojson', data });
+        map.current.addLayer({
+          id: 'travelled',
+          type: 'line',
+          source: 'travelled',
+          layout: {
+            'line-join': 'round',
+            'line-cap': 'round'
+          },
+          paint: {
+            'line-color': '#9ca3af',
+            'line-width': 4,
+            'line-dasharray': [2, 1]
+          }
+        });
+      }
+    } catch (error) {
+      console.error('Error fetching travelled path:', error);
+    }
+  };
+
   const fetchRoute = async (start, end) => {
     try {
       const query = await fetch(
@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { useAuth } from './AuthContext';
 import axios from 'axios';
+import { buildStreamUrl } from '../api/client';
 
 const NotificationContext = createContext();
 
@@ -18,13 +19,33 @@ export const NotificationProvider = ({ children }) => {
   const [unreadCount, setUnreadCount] = useState(0);
   const [lastNotificationId, setLastNotificationId] = useState(null);
 
-  // Fetch notifications when user logs in
+  // Fetch notifications when user logs in, then receive new ones over SSE
   useEffect(() => {
     if (user?.id) {
       fetchNotifications();
-      // Poll for new notifications every 10 seconds
-      const interval = setInterval(fetchNotifications, 10000);
-      return () => clearInterval(interval);
+
+      const source = new EventSource(buildStreamUrl('/api/notifications/stream'));
+      source.addEventListener('notification', (event) => {
+        const notification = JSON.parse(event.data);
+        setNotifications((prev) =>
+          prev.some((n) => n.id === notification.id) ? prev : [notification, ...prev].slice(0, 50)
+        );
+        setUnreadCount((prev) => prev + 1);
+        setLastNotificationId(notification.id);
+        showToastNotification(notification);
+      });
+
+      // Poll only while the stream is down (EventSource reconnects by itself)
+      const interval = setInterval(() => {
+        if (source.readyState !== EventSource.OPEN) {
+          fetchNotifications();
+        }
+      }, 30000);
+
+      return () => {
+        clearInterval(interval);
+        source.close();
+      };
     }
   }, [user]);
 
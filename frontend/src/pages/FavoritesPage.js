@@ -13,6 +13,7 @@ const FavoritesPage = () => {
   const { user } = useAuth();
   const navigate = useNavigate();
   const [favorites, setFavorites] = useState([]);
+  const [badgesByTasker, setBadgesByTasker] = useState({});
   const [loading, setLoading] = useState(true);
   const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -31,6 +32,7 @@ const FavoritesPage = () => {
         headers: { Authorization: `Bearer ${token}` }
       });
       setFavorites(response.data);
+      fetchBadges(response.data.map(f => f.tasker_id));
     } catch (error) {
       console.error('Error fetching favorites:', error);
       toast.error('Failed to load favorites');
@@ -39,6 +41,16 @@ const FavoritesPage = () => {
     }
   };
 
+  const fetchBadges = async (taskerIds) => {
+    if (taskerIds.length === 0) return;
+    try {
+      const response = await axios.post(`${API_URL}/api/badges/batch`, { tasker_ids: taskerIds });
+      setBadgesByTasker(response.data);
+    } catch (error) {
+      console.error('Error fetching badges:', error);
+    }
+  };
+
   const removeFavorite = async (taskerId) => {
     try {
       const token = localStorage.getItem('token');
@@ -136,7 +148,7 @@ const FavoritesPage = () => {
 
                 {/* Badges */}
                 <div className="mb-4">
-                  <BadgeDisplay taskerId={favorite.tasker_id} />
+                  <BadgeDisplay taskerId={favorite.tasker_id} badges={badgesByTasker[favorite.tasker_id] || []} />
                 </div>
 
                 {/* Services */}
@@ -0,0 +1,24 @@
+"""Shared fixtures: backend modules on the import path and an in-memory database."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+
+@pytest.fixture
+def run():
+    """Run coroutines on one event loop for the whole test."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory Motor database."""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["test"]
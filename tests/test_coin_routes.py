@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from models import UserInDB
+from routes import coin_routes
+
+
+@pytest.fixture
+def users(run, db):
+    admin = UserInDB(email="a@example.com", full_name="A", phone="1", role="admin", hashed_password="x")
+    client_user = UserInDB(email="c@example.com", full_name="C", phone="2", role="client", hashed_password="x")
+    run(db.users.insert_many([admin.model_dump(), {**client_user.model_dump(), "coin_balance": 50}]))
+    return (
+        auth.create_access_token({"sub": admin.id}),
+        auth.create_access_token({"sub": client_user.id}),
+        client_user.id
+    )
+
+
+def _balance(run, db, user_id):
+    return run(db.users.find_one({"id": user_id}))["coin_balance"]
+
+
+def test_concurrent_spends_never_overdraw(run, db, users):
+    _, token, user_id = users
+
+    async def spend():
+        try:
+            return await coin_routes.spend_coins(amount=30, task_id="T1", db=db, token=token)
+        except HTTPException as e:
+            return e
+
+    async def race():
+        return await asyncio.gather(spend(), spend())
+
+    results = run(race())
+
+    assert sorted(isinstance(result, HTTPException) for result in results) == [False, True]
+    assert any(isinstance(result, dict) and result["new_balance"] == 20 for result in results)
+    assert _balance(run, db, user_id) == 20
+    assert run(db.coin_transactions.count_documents({"user_id": user_id})) == 1
+
+
+def test_insufficient_balance_leaves_it_unchanged(run, db, users):
+    _, token, user_id = users
+
+    with pytest.raises(HTTPException) as error:
+        run(coin_routes.spend_coins(amount=60, task_id="T1", db=db, token=token))
+
+    assert error.value.status_code == 400 and "Balance: 50" in error.value.detail
+    assert _balance(run, db, user_id) == 50
+
+
+def test_concurrent_awards_all_count(run, db, users):
+    admin_token, _, user_id = users
+
+    async def race():
+        return await asyncio.gather(*(
+            coin_routes.award_coins(
+                user_id=user_id, amount=5, transaction_type="promo", description="promo", task_id=None,
+                db=db, token=admin_token
+            )
+            for _ in range(3)
+        ))
+
+    results = run(race())
+
+    assert sorted(result["new_balance"] for result in results) == [55, 60, 65]
+    assert _balance(run, db, user_id) == 65
+
+
+def test_award_to_unknown_user(run, db, users):
+    admin_token, _, _ = users
+
+    with pytest.raises(HTTPException) as error:
+        run(coin_routes.award_coins(
+            user_id="missing", amount=5, transaction_type="promo", description="promo", task_id=None,
+            db=db, token=admin_token
+        ))
+
+    assert error.value.status_code == 404
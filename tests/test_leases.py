@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from leases import WORKER_ID, acquire_lease, release_lease
+
+
+@pytest.fixture
+def leases(run, db):
+    run(db.leases.create_index("name", unique=True))
+    return db
+
+
+def test_lease_is_exclusive_until_released(run, leases):
+    assert run(acquire_lease(leases, "job", 60, owner="a"))
+    assert not run(acquire_lease(leases, "job", 60, owner="b"))
+    # The holder renews it
+    assert run(acquire_lease(leases, "job", 60, owner="a"))
+    assert run(acquire_lease(leases, "other-job", 60, owner="b"))
+
+    run(release_lease(leases, "job", owner="b"))  # Not the holder: no effect
+    assert not run(acquire_lease(leases, "job", 60, owner="b"))
+    run(release_lease(leases, "job", owner="a"))
+    assert run(acquire_lease(leases, "job", 60, owner="b"))
+
+
+def test_expired_lease_is_taken_over(run, leases):
+    assert run(acquire_lease(leases, "job", 60, owner="a"))
+    run(leases.leases.update_one({"name": "job"}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}))
+
+    assert run(acquire_lease(leases, "job", 60, owner="b"))
+    assert not run(acquire_lease(leases, "job", 60, owner="a"))
+    assert run(leases.leases.find_one({"name": "job"}))["owner"] == "b"
+
+
+def test_default_owner_is_this_worker(run, leases):
+    assert run(acquire_lease(leases, "job", 60))
+    assert run(leases.leases.find_one({"name": "job"}))["owner"] == WORKER_ID
@@ -0,0 +1,120 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+import location_tracks
+from location_tracks import append_points, encode_polyline, load_track, simplify_track
+
+ORIGIN = (5.35, -4.0)  # Abidjan
+METRE = 1 / 111195  # Degrees of latitude per metre
+
+
+def _decode_polyline(encoded, precision=5):
+    points, index, lat, lng = [], 0, 0, 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / 10 ** precision, lng / 10 ** precision))
+    return points
+
+
+def _reference_simplify(points, tolerance_m):
+    """Textbook recursive Douglas-Peucker on the same projection."""
+    xy = location_tracks._to_xy(points)
+
+    def keep(start, end):
+        if end - start < 2:
+            return [start]
+        a, b = xy[start], xy[end]
+        best, best_index = -1.0, None
+        for i in range(start + 1, end):
+            p = xy[i]
+            ab, ap = b - a, p - a
+            t = max(0.0, min(1.0, float(ap @ ab) / float(ab @ ab))) if float(ab @ ab) else 0.0
+            distance = math.dist(p, a + t * ab)
+            if distance > best:
+                best, best_index = distance, i
+        if best <= tolerance_m:
+            return [start]
+        return keep(start, best_index) + keep(best_index, end)
+
+    return [points[i] for i in keep(0, len(points) - 1)] + [points[-1]]
+
+
+def _walk(count, step_m, seed):
+    rng = random.Random(seed)
+    lat, lng = ORIGIN
+    points, heading = [], 0.0
+    for i in range(count):
+        heading += rng.uniform(-0.6, 0.6)
+        lat += math.cos(heading) * step_m * METRE
+        lng += math.sin(heading) * step_m * METRE
+        points.append([lat, lng, datetime(2026, 1, 1) + timedelta(seconds=i)])
+    return points
+
+
+def test_encode_polyline_matches_the_reference_example():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode_polyline_round_trips():
+    points = _walk(200, 15, seed=1)
+    decoded = _decode_polyline(encode_polyline(points))
+    assert len(decoded) == len(points)
+    for (lat, lng), point in zip(decoded, points):
+        assert abs(lat - point[0]) <= 0.5e-5 + 1e-12
+        assert abs(lng - point[1]) <= 0.5e-5 + 1e-12
+
+
+def test_simplify_keeps_endpoints_and_drops_noise_below_tolerance():
+    rng = random.Random(2)
+    line = [
+        [ORIGIN[0] + i * 10 * METRE, ORIGIN[1] + rng.uniform(-3, 3) * METRE, i]
+        for i in range(100)
+    ]
+    assert simplify_track(line, tolerance_m=10) == [line[0], line[-1]]
+
+
+def test_simplify_keeps_a_detour_beyond_tolerance():
+    line = [[ORIGIN[0] + i * 10 * METRE, ORIGIN[1], i] for i in range(21)]
+    line[10][1] += 50 * METRE
+    simplified = simplify_track(line, tolerance_m=10)
+    assert line[10] in simplified
+    assert simplified[0] == line[0] and simplified[-1] == line[-1]
+
+
+def test_simplify_matches_recursive_douglas_peucker():
+    for seed in range(5):
+        points = _walk(400, 8, seed)
+        for tolerance in (2, 10, 40):
+            assert simplify_track(points, tolerance) == _reference_simplify(points, tolerance)
+
+
+def test_short_tracks_and_zero_tolerance_are_untouched():
+    points = _walk(10, 5, seed=3)
+    assert simplify_track(points[:2]) == points[:2]
+    assert simplify_track(points, tolerance_m=0) == points
+
+
+def test_points_roll_over_into_new_buckets(run, db, monkeypatch):
+    monkeypatch.setattr(location_tracks, "BUCKET_SIZE", 4)
+    points = _walk(10, 5, seed=4)
+    for batch in (points[:3], points[3:6], points[6:8], points[8:]):
+        run(append_points(db, [("T1", "k1", batch)]))
+
+    buckets = run(db.location_tracks.find({"task_id": "T1"}).to_list(None))
+    # A bucket below the limit takes the whole next flush
+    assert sorted(b["count"] for b in buckets) == [4, 6]
+    assert run(load_track(db, "T1")) == points
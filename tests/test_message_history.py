@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+from database import get_database
+from message_routes import router
+from models import UserInDB
+
+T0 = datetime(2026, 3, 1, 12)
+
+
+@pytest.fixture
+def chat(run, db):
+    client_user = UserInDB(email="c@example.com", full_name="C", phone="1", role="client", hashed_password="x")
+    tasker = UserInDB(email="t@example.com", full_name="T", phone="2", role="tasker", hashed_password="x")
+    run(db.users.insert_many([client_user.model_dump(), tasker.model_dump()]))
+    run(db.tasks.insert_one({"id": "T1", "client_id": client_user.id, "assigned_tasker_id": tasker.id, "title": "t"}))
+    # Pairs of messages share a timestamp, so only the id orders them
+    messages = [
+        {"id": f"m{i:02d}", "task_id": "T1", "sender_id": tasker.id, "receiver_id": client_user.id,
+         "content": str(i), "created_at": T0 + timedelta(seconds=i // 2), "is_read": False}
+        for i in range(9)
+    ]
+    run(db.messages.insert_many([dict(m) for m in messages]))
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def test_db():
+        return db
+
+    app.dependency_overrides[get_database] = test_db
+    with TestClient(app) as client:
+        client.headers["Authorization"] = f"Bearer {auth.create_access_token({'sub': client_user.id})}"
+        yield client, [m["id"] for m in messages]
+
+
+def _page(client, **params):
+    response = client.get("/api/messages/task/T1/history", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _ids(page):
+    return [m["id"] for m in page["messages"]]
+
+
+def test_scrolling_back_visits_every_message_once(chat):
+    client, ids = chat
+    page = _page(client, limit=4)
+    seen = _ids(page)
+    assert seen == ids[-4:] and page["has_more"]
+
+    while page["has_more"]:
+        page = _page(client, limit=4, before=page["before_cursor"])
+        seen = _ids(page) + seen
+
+    assert seen == ids
+
+
+def test_newer_messages_after_a_cursor_or_message(chat):
+    client, ids = chat
+    first = _page(client, limit=3, before=_page(client, limit=6)["before_cursor"])
+    assert _ids(first) == ids[:3]
+
+    assert _ids(_page(client, after=first["after_cursor"])) == ids[3:]
+    assert _ids(_page(client, since_id="m04")) == ids[5:]
+
+
+def test_invalid_cursors_are_rejected(chat):
+    client, _ = chat
+    assert client.get("/api/messages/task/T1/history", params={"before": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/messages/task/T1/history", params={"since_id": "missing"}).status_code == 404
+    both = {"before": "x", "after": "y"}
+    assert client.get("/api/messages/task/T1/history", params=both).status_code == 400
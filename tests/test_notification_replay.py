@@ -0,0 +1,27 @@
+from notification_routes import create_notifications, missed_notifications
+
+
+def _batch(user_id, count, title):
+    return [
+        {"user_id": user_id, "notification_type": "task_update", "task_id": "T1", "task_title": f"{title}{i}"}
+        for i in range(count)
+    ]
+
+
+def test_replay_after_a_notification_includes_its_batch_siblings(run, db):
+    batch = run(create_notifications(db, _batch("u1", 5, "a") + _batch("u2", 1, "other")))
+    later = run(create_notifications(db, _batch("u1", 2, "b")))
+    mine = sorted((n for n in batch if n["user_id"] == "u1"), key=lambda n: n["id"])
+
+    missed = run(missed_notifications(db, "u1", mine[1]["id"]))
+
+    assert {n["id"] for n in missed} == {n["id"] for n in mine[2:] + later}
+    assert missed == sorted(missed, key=lambda n: (n["created_at"], n["id"]))
+
+
+def test_replay_ignores_unknown_or_foreign_anchor(run, db):
+    other = run(create_notifications(db, _batch("u2", 1, "x")))
+    run(create_notifications(db, _batch("u1", 2, "y")))
+
+    assert run(missed_notifications(db, "u1", "missing")) == []
+    assert run(missed_notifications(db, "u1", other[0]["id"])) == []
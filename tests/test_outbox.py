@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbox
+from leases import WORKER_ID
+from outbox import DONE, FAILED, PENDING, PROCESSING
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Test message kinds: "ok" succeeds, "broken" raises; calls are recorded."""
+    calls = []
+
+    async def ok(db, payload):
+        calls.append(payload)
+
+    async def broken(db, payload):
+        calls.append(payload)
+        raise RuntimeError("handler down")
+
+    monkeypatch.setitem(outbox._handlers, "ok", ok)
+    monkeypatch.setitem(outbox._handlers, "broken", broken)
+    return calls
+
+
+def _message(run, db, kind, **fields):
+    message = {**outbox.new_message(kind, {"n": 1}), **fields}
+    run(outbox.enqueue(db, message, None))
+    return run(db.outbox.find_one({"id": message["id"]}, {"_id": 0}))
+
+
+def _claimed(message):
+    return {**message, "status": PROCESSING, "locked_by": WORKER_ID, "attempts": message["attempts"] + 1}
+
+
+def _stored(run, db, message):
+    return run(db.outbox.find_one({"id": message["id"]}, {"_id": 0}))
+
+
+def test_claim_takes_the_oldest_available_message(run, db):
+    now = datetime.utcnow()
+    _message(run, db, "ok", available_at=now + timedelta(minutes=5))
+    oldest = _message(run, db, "ok", available_at=now - timedelta(minutes=2))
+    _message(run, db, "ok", available_at=now - timedelta(minutes=1))
+
+    run(outbox.claim(db))
+
+    stored = _stored(run, db, oldest)
+    assert stored["status"] == PROCESSING and stored["locked_by"] == WORKER_ID and stored["attempts"] == 1
+    assert run(db.outbox.count_documents({"status": PROCESSING})) == 1
+
+
+def test_processed_message_is_done(run, db, handlers):
+    message = _message(run, db, "ok")
+    run(db.outbox.update_one({"id": message["id"]}, {"$set": {"status": PROCESSING, "locked_by": WORKER_ID}}))
+
+    run(outbox.process(db, _claimed(message)))
+
+    stored = _stored(run, db, message)
+    assert handlers == [{"n": 1}]
+    assert stored["status"] == DONE and "locked_by" not in stored
+
+
+def test_failed_message_is_retried_with_backoff_then_parked(run, db, handlers):
+    message = _message(run, db, "broken")
+    run(db.outbox.update_one({"id": message["id"]}, {"$set": {"status": PROCESSING, "locked_by": WORKER_ID}}))
+
+    run(outbox.process(db, _claimed(message)))
+
+    stored = _stored(run, db, message)
+    assert stored["status"] == PENDING and "RuntimeError" in stored["last_error"]
+    assert stored["available_at"] > datetime.utcnow()
+
+    last_try = {**stored, "attempts": outbox.MAX_ATTEMPTS - 1}
+    run(db.outbox.update_one({"id": message["id"]}, {"$set": {"status": PROCESSING, "locked_by": WORKER_ID}}))
+    run(outbox.process(db, _claimed(last_try)))
+    assert _stored(run, db, message)["status"] == FAILED
+
+
+def test_outcome_is_not_recorded_for_a_lease_taken_over(run, db, handlers):
+    message = _message(run, db, "ok")
+    run(db.outbox.update_one({"id": message["id"]}, {"$set": {"status": PROCESSING, "locked_by": "another-worker"}}))
+
+    run(outbox.process(db, _claimed(message)))
+
+    assert _stored(run, db, message)["status"] == PROCESSING
+
+
+def test_stale_leases_are_requeued(run, db):
+    now = datetime.utcnow()
+    stale = _message(run, db, "ok", status=PROCESSING, locked_by="dead", locked_until=now - timedelta(seconds=1))
+    live = _message(run, db, "ok", status=PROCESSING, locked_by="alive", locked_until=now + timedelta(minutes=1))
+
+    assert run(outbox.requeue_stale(db)) == 1
+    assert _stored(run, db, stale)["status"] == PENDING
+    assert _stored(run, db, live)["status"] == PROCESSING
+
+
+def test_retry_delay_grows_and_is_capped():
+    for attempts in range(1, 20):
+        delay = outbox.retry_delay(attempts)
+        base = min(outbox.RETRY_BASE_SECONDS * 2 ** (attempts - 1), outbox.RETRY_MAX_SECONDS)
+        assert base / 2 <= delay <= base
+
+
+def test_lease_is_settled_only_by_the_claiming_worker(run, db, handlers):
+    message = _message(run, db, "ok")
+    run(outbox.claim(db, "worker-1"))
+    assert _stored(run, db, message)["locked_by"] == "worker-1"
+
+    run(outbox.process(db, _claimed(message), "worker-2"))
+    assert _stored(run, db, message)["status"] == PROCESSING
+
+    run(outbox.process(db, _claimed(message), "worker-1"))
+    assert _stored(run, db, message)["status"] == DONE
+
+
+def test_tasker_stat_message_carries_its_id_as_op_id():
+    message = outbox.tasker_stat("completed", "t1")
+
+    assert message["payload"] == {"event": "completed", "tasker_id": "t1", "op_id": message["id"]}
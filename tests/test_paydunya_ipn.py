@@ -0,0 +1,76 @@
+import hashlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import paydunya_service
+from database import get_database
+from payment_routes import router
+
+MASTER_KEY = "test-master-key"
+URL = "/api/payments/webhook/paydunya-ipn"
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setenv("PAYDUNYA_MASTER_KEY", MASTER_KEY)
+    monkeypatch.setattr(paydunya_service, "_paydunya_service", None)
+    app = FastAPI()
+    app.include_router(router)
+
+    async def test_db():
+        return db
+
+    app.dependency_overrides[get_database] = test_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _signed(**fields):
+    return {"data[hash]": hashlib.sha512(MASTER_KEY.encode()).hexdigest(), **fields}
+
+
+def test_ipn_without_valid_hash_is_rejected(client, run, db):
+    for form in ({"token": "tok", "status": "completed"}, {"data[hash]": "forged", "token": "tok", "status": "completed"}):
+        response = client.post(URL, data=form)
+        assert response.status_code == 403
+    assert run(db.paydunya_webhooks.count_documents({})) == 0
+
+
+def test_signed_ipn_is_queued_without_its_hash(client, run, db):
+    response = client.post(URL, data=_signed(token="tok", status="completed"))
+
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    event = run(db.paydunya_webhooks.find_one({}, {"_id": 0}))
+    assert event["token"] == "tok"
+    assert "data[hash]" not in event["data"]
+
+
+def test_no_ipn_is_accepted_without_a_master_key(client, monkeypatch):
+    monkeypatch.setenv("PAYDUNYA_MASTER_KEY", "")
+    monkeypatch.setattr(paydunya_service, "_paydunya_service", None)
+    forged = {"data[hash]": hashlib.sha512(b"").hexdigest(), "token": "tok", "status": "completed"}
+
+    assert client.post(URL, data=forged).status_code == 403
+
+
+def test_ipn_that_cannot_be_stored_is_not_acknowledged(client, monkeypatch):
+    async def storage_down(db, data):
+        raise RuntimeError("database unreachable")
+
+    monkeypatch.setattr("payment_webhooks.record_ipn", storage_down)
+
+    response = client.post(URL, data=_signed(token="tok", status="completed"))
+
+    assert response.status_code == 503
+
+
+def test_duplicate_ipn_is_acknowledged(client, run, db):
+    run(db.paydunya_webhooks.create_index("dedupe_key", unique=True, partialFilterExpression={"dedupe_key": {"$exists": True}}))
+    for _ in range(2):
+        response = client.post(URL, data=_signed(token="tok", status="completed"))
+        assert response.status_code == 200 and response.json()["success"] is True
+
+    assert response.json()["message"] == "Duplicate IPN ignored"
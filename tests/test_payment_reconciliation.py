@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import payment_reconciliation
+
+
+class FakePaydunya:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.verified = []
+
+    async def verify_payment(self, token):
+        self.verified.append(token)
+        return True, {"status": self.statuses[token]}
+
+
+@pytest.fixture
+def payments(run, db, monkeypatch):
+    """Three pending invoices, old enough to reconcile, with their tasks."""
+    run(db.leases.create_index("name", unique=True))
+    old = datetime.utcnow() - timedelta(hours=1)
+    for n in range(3):
+        run(db.paydunya_payments.insert_one({
+            "paydunya_token": f"tok{n}", "task_id": f"T{n}", "status": "pending",
+            "created_at": old, "updated_at": old + timedelta(seconds=n)
+        }))
+        run(db.tasks.insert_one({"id": f"T{n}", "is_paid": False}))
+
+    def use(statuses):
+        service = FakePaydunya(statuses)
+        monkeypatch.setattr(payment_reconciliation, "get_paydunya_service", lambda: service)
+        return service
+    return use
+
+
+def _payment(run, db, token):
+    return run(db.paydunya_payments.find_one({"paydunya_token": token}))
+
+
+def test_unknown_gateway_status_is_not_stored(run, db, payments):
+    payments({"tok0": "completed", "tok1": "weird", "tok2": None})
+
+    checkpoint = run(payment_reconciliation.run_reconciliation(db))
+
+    assert _payment(run, db, "tok0")["status"] == "completed"
+    assert run(db.tasks.find_one({"id": "T0"}))["is_paid"] is True
+    for token in ("tok1", "tok2"):
+        payment = _payment(run, db, token)
+        assert payment["status"] == "pending"
+        assert payment["reconcile_error"].startswith("Unknown status")
+    assert checkpoint["checked"] == 3 and checkpoint["settled"] == 1 and checkpoint["errors"] == 2
+
+
+def test_run_stops_when_the_lease_cannot_be_renewed(run, db, payments, monkeypatch):
+    service = payments({"tok0": "completed", "tok1": "completed", "tok2": "completed"})
+    monkeypatch.setattr(payment_reconciliation, "BATCH_SIZE", 1)
+    renewals = iter([True, False])
+
+    async def acquire_lease(db, name, ttl):
+        return next(renewals)
+
+    monkeypatch.setattr(payment_reconciliation, "acquire_lease", acquire_lease)
+
+    checkpoint = run(payment_reconciliation.run_reconciliation(db))
+
+    assert service.verified == ["tok0"]
+    assert checkpoint["completed_at"] is None
+    assert run(db.job_checkpoints.find_one({"name": payment_reconciliation.JOB_NAME}))["position_token"] == "tok0"
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import payment_webhooks
+from payment_webhooks import DONE, IGNORED, PENDING, _process_token, apply_event, process_pending, record_ipn
+
+
+@pytest.fixture
+def payments(run, db):
+    run(db.paydunya_webhooks.create_index(
+        "dedupe_key", unique=True, partialFilterExpression={"dedupe_key": {"$exists": True}}
+    ))
+    run(db.paydunya_payments.insert_one({"paydunya_token": "tok", "task_id": "T1", "status": "pending"}))
+    run(db.tasks.insert_one({"id": "T1", "is_paid": False}))
+    return db
+
+
+def _event(status, token="tok", **fields):
+    return {"id": f"{token}-{status}", "token": token, "payment_status": status, "data": {}, "attempts": 0, **fields}
+
+
+def _payment_status(run, db, token="tok"):
+    return run(db.paydunya_payments.find_one({"paydunya_token": token}))["status"]
+
+
+def test_intake_dedupes_and_ignores_unusable_notifications(run, payments):
+    assert run(record_ipn(payments, {"data[invoice][token]": "tok", "data[status]": "completed"}))
+    assert not run(record_ipn(payments, {"token": "tok", "status": "completed"}))
+    assert run(record_ipn(payments, {"token": "tok", "status": "paid_by_me"}))
+    assert run(record_ipn(payments, {"status": "completed"}))
+
+    states = {
+        (e["token"], e["payment_status"]): e["state"]
+        for e in run(payments.paydunya_webhooks.find({}, {"_id": 0}).to_list(None))
+    }
+    assert states == {
+        ("tok", "completed"): PENDING,
+        ("tok", "paid_by_me"): IGNORED,
+        (None, "completed"): IGNORED,
+    }
+
+
+def test_completed_notification_marks_the_task_paid(run, payments):
+    assert run(apply_event(payments, _event("completed"))) == "applied"
+    assert _payment_status(run, payments) == "completed"
+    assert run(payments.tasks.find_one({"id": "T1"}))["is_paid"] is True
+
+
+@pytest.mark.parametrize("current, incoming, outcome, final", [
+    ("completed", "cancelled", "stale", "completed"),
+    ("completed", "pending", "stale", "completed"),
+    ("cancelled", "pending", "stale", "cancelled"),
+    ("cancelled", "completed", "applied", "completed"),
+    ("pending", "failed", "applied", "failed"),
+    ("failed", "failed", "unchanged", "failed"),
+])
+def test_payments_only_move_forward(run, payments, current, incoming, outcome, final):
+    run(payments.paydunya_payments.update_one({"paydunya_token": "tok"}, {"$set": {"status": current}}))
+
+    assert run(apply_event(payments, _event(incoming))) == outcome
+    assert _payment_status(run, payments) == final
+
+
+def test_unknown_status_or_payment_is_never_written(run, payments):
+    with pytest.raises(ValueError):
+        run(apply_event(payments, _event("paid_by_me")))
+    assert _payment_status(run, payments) == "pending"
+    assert run(apply_event(payments, _event("completed", token="other"))) == "unknown_payment"
+
+
+def _queue(run, db, *events):
+    created = datetime(2026, 1, 1)
+    run(db.paydunya_webhooks.insert_many([
+        {"state": PENDING, "created_at": created + timedelta(seconds=i), **event}
+        for i, event in enumerate(events)
+    ]))
+
+
+def _states(run, db):
+    return {e["id"]: e["state"] for e in run(db.paydunya_webhooks.find({}, {"_id": 0}).to_list(None))}
+
+
+def test_token_events_apply_in_order(run, payments):
+    updates, settled = run(_process_token(payments, [_event("pending"), _event("cancelled"), _event("completed")]))
+
+    assert settled == 3
+    assert _payment_status(run, payments) == "completed"
+    assert len(updates) == 3
+
+
+def test_failing_event_holds_back_later_events_of_its_token(run, payments, monkeypatch):
+    applied = []
+
+    async def flaky(db, event):
+        if event["payment_status"] == "failed":
+            raise RuntimeError("db down")
+        applied.append(event["id"])
+        return "applied"
+
+    monkeypatch.setattr(payment_webhooks, "apply_event", flaky)
+    _queue(run, payments, _event("failed"), _event("completed"))
+
+    assert run(process_pending(payments)) == (2, 0)
+    assert applied == []
+    retried = run(payments.paydunya_webhooks.find_one({"id": "tok-failed"}))
+    assert retried["state"] == PENDING and retried["attempts"] == 1
+    assert retried["retry_at"] > datetime.utcnow()
+    assert "RuntimeError" in retried["last_error"]
+
+
+def test_event_is_parked_after_max_attempts_and_the_token_moves_on(run, payments, monkeypatch):
+    async def broken(db, event):
+        if event["payment_status"] == "failed":
+            raise RuntimeError("db down")
+        return "applied"
+
+    monkeypatch.setattr(payment_webhooks, "apply_event", broken)
+    _queue(run, payments, _event("failed", attempts=payment_webhooks.MAX_ATTEMPTS - 1), _event("completed"))
+
+    assert run(process_pending(payments)) == (2, 2)
+    assert _states(run, payments) == {"tok-failed": payment_webhooks.FAILED, "tok-completed": DONE}
+
+
+def test_backed_off_events_do_not_hold_back_other_tokens(run, payments, monkeypatch):
+    monkeypatch.setattr(payment_webhooks, "BATCH_SIZE", 2)
+    run(payments.paydunya_payments.insert_one({"paydunya_token": "tok2", "task_id": "T2", "status": "pending"}))
+    later = datetime.utcnow() + timedelta(minutes=5)
+    _queue(
+        run, payments,
+        _event("failed", token="stuck-a", retry_at=later, attempts=1),
+        _event("failed", token="stuck-b", retry_at=later, attempts=1),
+        _event("completed", token="stuck-a"),
+        _event("completed"),
+        _event("completed", token="tok2"),
+    )
+
+    assert run(process_pending(payments)) == (2, 2)
+    states = _states(run, payments)
+    assert states["tok-completed"] == states["tok2-completed"] == DONE
+    assert states["stuck-a-completed"] == PENDING
+    assert run(process_pending(payments)) == (0, 0)
+
+
+def test_due_retry_is_processed_before_later_events(run, payments):
+    _queue(
+        run, payments,
+        _event("cancelled", retry_at=datetime.utcnow() - timedelta(seconds=1), attempts=1),
+        _event("completed"),
+    )
+
+    assert run(process_pending(payments)) == (2, 2)
+    assert _payment_status(run, payments) == "completed"
@@ -0,0 +1,107 @@
+import calendar
+import random
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+import recurrence
+from recurrence import expand, first_occurrence
+
+UTC = ZoneInfo("UTC")
+ZONES = [None, "Africa/Abidjan", "Europe/Paris", "America/New_York", "Asia/Kolkata"]
+
+
+def _scalar_expand(schedule, start, count):
+    """One occurrence at a time with zoneinfo: the behaviour expand() vectorizes."""
+    tz = ZoneInfo(schedule.get("timezone") or recurrence.DEFAULT_TIMEZONE)
+    anchor = schedule["next_occurrence"].replace(tzinfo=UTC).astimezone(tz)
+    try:
+        minute = recurrence.parse_scheduled_time(schedule.get("scheduled_time"))
+    except ValueError:
+        minute = anchor.hour * 60 + anchor.minute
+    start = max(start, schedule["next_occurrence"])
+
+    occurrences, step = [], 0
+    while len(occurrences) < count:
+        if schedule["frequency"] == "monthly":
+            month_index = anchor.month - 1 + step
+            year, month = anchor.year + month_index // 12, month_index % 12 + 1
+            day_of_month = schedule.get("day_of_month") or anchor.day
+            day = date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+        else:
+            day = anchor.date() + timedelta(days=step * recurrence.FREQUENCY_DAYS[schedule["frequency"]])
+        local = datetime.combine(day, time(minute // 60, minute % 60), tzinfo=tz)
+        occurrence = local.astimezone(UTC).replace(tzinfo=None)
+        if occurrence >= start:
+            occurrences.append(occurrence)
+        step += 1
+    return occurrences
+
+
+def _random_schedule(rng):
+    frequency = rng.choice(recurrence.FREQUENCIES)
+    return {
+        "frequency": frequency,
+        "next_occurrence": datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(366 * 24 * 60)),
+        "scheduled_time": rng.choice([None, f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"]),
+        "day_of_month": rng.randrange(1, 32) if frequency == "monthly" and rng.random() < 0.8 else None,
+        "timezone": rng.choice(ZONES),
+    }
+
+
+def test_expand_matches_scalar_implementation():
+    rng = random.Random(20)
+    schedules = [_random_schedule(rng) for _ in range(400)]
+    starts = [datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(500 * 24 * 60)) for _ in schedules]
+
+    result = expand(schedules, starts, count=6)
+
+    assert result.shape == (400, 6)
+    for schedule, start, row in zip(schedules, starts, result.astype(datetime).tolist()):
+        assert row == _scalar_expand(schedule, start, 6), schedule
+
+
+def test_monthly_day_is_clamped_without_shifting_later_months():
+    schedule = {"frequency": "monthly", "next_occurrence": datetime(2026, 1, 31, 9), "scheduled_time": "09:00",
+                "day_of_month": 31, "timezone": "Africa/Abidjan"}
+
+    days = [d.date() for d in expand([schedule], datetime(2026, 1, 1), 4)[0].astype(datetime)]
+
+    assert days == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+
+
+def test_wall_clock_time_is_kept_across_dst():
+    schedule = {"frequency": "weekly", "next_occurrence": datetime(2026, 3, 20, 8), "scheduled_time": "09:00",
+                "timezone": "Europe/Paris"}
+
+    hours = [d.hour for d in expand([schedule], datetime(2026, 3, 20), 3)[0].astype(datetime)]
+
+    assert hours == [8, 8, 7]  # 09:00 CET, then 09:00 CEST from March 29
+
+
+def test_first_occurrence():
+    now = datetime(2026, 3, 4, 12)  # A Wednesday, noon in Abidjan (UTC+0)
+    assert first_occurrence("daily", "10:00", now=now) == datetime(2026, 3, 5, 10)
+    assert first_occurrence("daily", "13:30", now=now) == datetime(2026, 3, 4, 13, 30)
+    assert first_occurrence("weekly", "09:00", day_of_week=0, now=now) == datetime(2026, 3, 9, 9)
+    assert first_occurrence("monthly", "09:00", day_of_month=31, now=datetime(2026, 4, 2)) == datetime(2026, 4, 30, 9)
+    assert first_occurrence("daily", "10:00", timezone="Asia/Kolkata", now=now) == datetime(2026, 3, 5, 4, 30)
+
+
+@pytest.mark.parametrize("arguments", [
+    {"frequency": "hourly", "scheduled_time": "09:00"},
+    {"frequency": "weekly", "scheduled_time": "09:00"},
+    {"frequency": "monthly", "scheduled_time": "09:00", "day_of_month": 32},
+    {"frequency": "daily", "scheduled_time": "25:00"},
+    {"frequency": "daily", "scheduled_time": "09:00", "timezone": "Mars/Olympus"},
+])
+def test_first_occurrence_rejects_invalid_input(arguments):
+    with pytest.raises(ValueError):
+        first_occurrence(**arguments)
+
+
+def test_expand_of_nothing():
+    assert expand([], datetime(2026, 1, 1), 3).shape == (0, 3)
+    assert np.issubdtype(expand([], datetime(2026, 1, 1)).dtype, np.datetime64)
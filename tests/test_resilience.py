@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Dependency, DependencyUnavailable, deadline, remaining_budget,
+    with_deadline
+)
+
+
+async def _ok():
+    return "ok"
+
+
+async def _boom():
+    raise RuntimeError("boom")
+
+
+async def _open(dep: Dependency):
+    for _ in range(dep.breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            await dep.call(_boom)
+    assert dep.breaker.state == OPEN
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert 29 < breaker.retry_after() <= 30
+
+
+def test_half_open_trial_closes_or_reopens(run):
+    dep = Dependency("svc", failure_threshold=2, reset_seconds=0.01)
+
+    async def scenario():
+        await _open(dep)
+        with pytest.raises(DependencyUnavailable) as rejected:
+            await dep.call(_ok)
+        assert rejected.value.status_code == 503
+        assert "Retry-After" in rejected.value.headers
+
+        await asyncio.sleep(0.02)
+        with pytest.raises(RuntimeError):
+            await dep.call(_boom)
+        assert dep.breaker.state == OPEN
+
+        await asyncio.sleep(0.02)
+        assert await dep.call(_ok) == "ok"
+        assert dep.breaker.state == CLOSED
+
+    run(scenario())
+
+
+def test_cancelled_half_open_call_gives_its_trial_back(run):
+    dep = Dependency("svc", failure_threshold=1, reset_seconds=0.01)
+
+    async def scenario():
+        await _open(dep)
+        await asyncio.sleep(0.02)
+
+        call = asyncio.ensure_future(dep.call(asyncio.sleep, 10))
+        await asyncio.sleep(0.01)
+        assert dep.breaker.state == HALF_OPEN
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+        assert dep.active == 0
+        assert await dep.call(_ok) == "ok"
+        assert dep.breaker.state == CLOSED
+
+    run(scenario())
+
+
+def test_half_open_call_rejected_for_a_full_bulkhead_gives_its_trial_back(run):
+    dep = Dependency("svc", max_concurrent=1, max_wait_seconds=0.01, failure_threshold=1, reset_seconds=0.01)
+
+    async def scenario():
+        await _open(dep)
+        await asyncio.sleep(0.02)
+        await dep._slots.acquire()  # Another call holds the only slot
+        with pytest.raises(DependencyUnavailable) as rejected:
+            await dep.call(_ok)
+        assert rejected.value.reason == "bulkhead_full"
+        dep._slots.release()
+
+        assert await dep.call(_ok) == "ok"
+
+    run(scenario())
+
+
+def test_expired_deadline_is_rejected_without_using_a_trial(run):
+    dep = Dependency("svc", failure_threshold=1, reset_seconds=0.01)
+
+    async def scenario():
+        await _open(dep)
+        await asyncio.sleep(0.02)
+        with deadline(0):
+            with pytest.raises(DependencyUnavailable) as rejected:
+                await dep.call(_ok)
+        assert rejected.value.reason == "deadline"
+        assert await dep.call(_ok) == "ok"
+
+    run(scenario())
+
+
+def test_timeout_counts_as_failure(run):
+    dep = Dependency("svc", timeout_seconds=0.01, failure_threshold=1)
+
+    async def scenario():
+        with pytest.raises(DependencyUnavailable) as rejected:
+            await dep.call(asyncio.sleep, 1)
+        assert rejected.value.reason == "deadline"
+        assert dep.timeouts == 1
+        assert dep.breaker.state == OPEN
+
+    run(scenario())
+
+
+def test_failure_result_is_returned_and_counted(run):
+    dep = Dependency("svc", failure_threshold=1)
+
+    assert run(dep.call(_ok, is_failure=lambda result: result == "ok")) == "ok"
+    assert dep.breaker.state == OPEN
+
+
+def test_handler_deadline_cuts_the_dependency_call():
+    dep = Dependency("svc", timeout_seconds=5)
+    app = FastAPI()
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    @app.get("/items/{item_id}")
+    @with_deadline(0.3)
+    async def handler(item_id: str, q: int = 0):
+        await asyncio.sleep(0.1)
+        budget = remaining_budget()
+        try:
+            await dep.call(slow)
+        except DependencyUnavailable as e:
+            return {"item_id": item_id, "q": q, "budget": budget, "reason": e.reason}
+
+    with TestClient(app) as client:
+        body = client.get("/items/a", params={"q": 2}).json()
+
+    assert body["item_id"] == "a" and body["q"] == 2
+    assert 0 < body["budget"] < 0.25
+    assert body["reason"] == "deadline"
+    assert dep.timeouts == 1
+    assert remaining_budget() is None
@@ -0,0 +1,25 @@
+import sys
+import threading
+import types
+
+import review_routes
+
+
+def test_translation_runs_on_the_bounded_translator_pool(run, monkeypatch):
+    threads = []
+
+    class FakeTranslator:
+        def __init__(self, source, target):
+            self.target = target
+
+        def translate(self, text):
+            threads.append(threading.current_thread().name)
+            return f"{text} ({self.target})"
+
+    monkeypatch.setitem(sys.modules, "deep_translator", types.SimpleNamespace(GoogleTranslator=FakeTranslator))
+
+    result = run(review_routes.translate_review(review_routes.TranslateRequest(text="Bonjour", target_lang="en")))
+
+    assert result["translated_text"] == "Bonjour (en)"
+    assert threads and threads[0].startswith("translator")
+    assert review_routes._translate_pool._max_workers == review_routes.TRANSLATOR.max_concurrent
@@ -0,0 +1,38 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+from database import get_database
+from live_location import live_locations
+from models import UserInDB
+from routes.task_routes import router
+
+
+@pytest.fixture
+def client(run, db):
+    client_user = UserInDB(email="c@example.com", full_name="C", phone="1", role="client", hashed_password="x")
+    run(db.users.insert_one(client_user.model_dump()))
+    run(db.tasks.insert_one({"id": "T1", "client_id": client_user.id, "assigned_tasker_id": "old", "status": "assigned"}))
+    run(db.task_applications.insert_one({"id": "A1", "task_id": "T1", "tasker_id": "new", "status": "pending"}))
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def test_db():
+        return db
+
+    app.dependency_overrides[get_database] = test_db
+    with TestClient(app) as test_client:
+        test_client.headers["Authorization"] = f"Bearer {auth.create_access_token({'sub': client_user.id})}"
+        yield test_client
+    live_locations.forget_task("T1")
+
+
+def test_reassignment_drops_the_cached_tracking_view(client, run, db):
+    assert run(live_locations.get_task(db, "T1"))["assigned_tasker_id"] == "old"
+
+    response = client.post("/api/tasks/T1/assign/new")
+
+    assert response.status_code == 200, response.text
+    assert run(live_locations.get_task(db, "T1"))["assigned_tasker_id"] == "new"
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import tasker_bookings
+from tasker_bookings import busy_taskers, release, reserve
+
+T0 = datetime(2026, 3, 2, 9)
+
+
+def _hours(start, end):
+    return T0 + timedelta(hours=start), T0 + timedelta(hours=end)
+
+
+def test_overlapping_reservation_is_rejected(run, db):
+    assert run(reserve(db, "k1", "A", *_hours(0, 2))) is None
+
+    conflict = run(reserve(db, "k1", "B", *_hours(1, 3)))
+
+    assert conflict["task_id"] == "A"
+    assert run(db.tasker_bookings.count_documents({"task_id": "B"})) == 0
+
+
+def test_adjacent_other_tasker_and_same_task_reservations_pass(run, db):
+    assert run(reserve(db, "k1", "A", *_hours(0, 2))) is None
+    assert run(reserve(db, "k1", "B", *_hours(2, 3))) is None
+    assert run(reserve(db, "k2", "C", *_hours(0, 2))) is None
+    # Rescheduling a task is not a conflict with itself
+    assert run(reserve(db, "k1", "A", *_hours(1, 2))) is None
+
+
+def test_long_task_is_chunked_and_still_conflicts_at_its_end(run, db):
+    assert run(reserve(db, "k1", "A", *_hours(0, 60))) is None
+
+    chunks = run(db.tasker_bookings.find({"task_id": "A"}).sort("start", 1).to_list(None))
+    assert [(c["end"] - c["start"]).total_seconds() / 3600 for c in chunks] == [24, 24, 12]
+    assert chunks[0]["start"] == T0 and chunks[-1]["end"] == T0 + timedelta(hours=60)
+    assert run(reserve(db, "k1", "B", *_hours(59, 61)))["task_id"] == "A"
+    assert run(busy_taskers(db, *_hours(30, 31))) == {"k1"}
+    assert run(busy_taskers(db, *_hours(60, 61))) == set()
+
+
+def _race(monkeypatch):
+    """The first conflict check misses a reservation made concurrently."""
+    find_conflicts = tasker_bookings.find_conflicts
+    calls = []
+
+    async def racing(*args, **kwargs):
+        calls.append(1)
+        return [] if len(calls) == 1 else await find_conflicts(*args, **kwargs)
+
+    monkeypatch.setattr(tasker_bookings, "find_conflicts", racing)
+
+
+def _concurrent(db, run, task_id, created_at):
+    start, end = _hours(0, 2)
+    run(db.tasker_bookings.insert_one(
+        {"id": task_id, "tasker_id": "k1", "task_id": task_id, "start": start, "end": end, "created_at": created_at}
+    ))
+
+
+def test_concurrent_reservation_made_first_wins(run, db, monkeypatch):
+    _concurrent(db, run, "OLDER", datetime.utcnow() - timedelta(seconds=1))
+    _race(monkeypatch)
+
+    assert run(reserve(db, "k1", "B", *_hours(1, 3)))["task_id"] == "OLDER"
+    assert run(db.tasker_bookings.count_documents({"task_id": "B"})) == 0
+
+
+def test_concurrent_reservation_made_later_loses(run, db, monkeypatch):
+    _concurrent(db, run, "NEWER", datetime.utcnow() + timedelta(seconds=1))
+    _race(monkeypatch)
+
+    assert run(reserve(db, "k1", "B", *_hours(1, 3))) is None
+    assert run(db.tasker_bookings.count_documents({"task_id": "B"})) == 1
+
+
+def test_release_frees_the_interval(run, db):
+    run(reserve(db, "k1", "A", *_hours(0, 2)))
+    run(release(db, "A"))
+
+    assert run(reserve(db, "k1", "B", *_hours(0, 2))) is None
+
+
+def test_concurrent_reservations_in_the_same_millisecond_keep_exactly_one(run, db, monkeypatch):
+    # Both were created at 12:00:00.000xxx; MongoDB stores 12:00:00.000 for each
+    instant = datetime(2026, 5, 4, 12, 0, 0, 700)
+    _concurrent(db, run, "Z", instant.replace(microsecond=0))
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return instant
+
+    monkeypatch.setattr(tasker_bookings, "datetime", Clock)
+    _race(monkeypatch)
+
+    # Same stored created_at: the task id breaks the tie, so B stays and Z would yield
+    assert run(reserve(db, "k1", "B", *_hours(1, 3))) is None
+    assert run(db.tasker_bookings.count_documents({"task_id": "B"})) == 1
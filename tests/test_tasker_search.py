@@ -0,0 +1,59 @@
+"""Tasker search documents and rating-ordered keyset paging."""
+
+import tasker_search
+from tasker_routes import CARD_PROJECTION, run_tasker_search
+
+
+async def _add_tasker(db, tasker_id, rating=None):
+    await db.users.insert_one({
+        "id": tasker_id,
+        "role": "tasker",
+        "full_name": tasker_id,
+        "tasker_profile": {"hourly_rate": 5000.0, "services": ["Plumbing"], "is_available": True}
+    })
+    await tasker_search.sync_profile(db, tasker_id)
+    if rating is not None:
+        await db.users.update_one({"id": tasker_id}, {"$set": {"search.rating": rating, "search.total_reviews": 1}})
+
+
+def test_sync_profile_defaults_missing_stats_only(run, db):
+    async def scenario():
+        await _add_tasker(db, "new")
+        await db.users.update_one({"id": "new"}, {"$inc": {"search.completed_tasks": 2}})
+        await tasker_search.sync_profile(db, "new")
+        return (await db.users.find_one({"id": "new"}))["search"]
+
+    search = run(scenario())
+    assert search["rating"] == 0
+    assert search["total_reviews"] == 0
+    assert search["completed_tasks"] == 2
+
+
+def test_paging_by_rating_crosses_taskers_without_reviews(run, db):
+    async def scenario():
+        await _add_tasker(db, "a", rating=4.5)
+        await _add_tasker(db, "b")
+        await _add_tasker(db, "c", rating=3.0)
+        await _add_tasker(db, "d")
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor, _ = await run_tasker_search(db, {"role": "tasker"}, CARD_PROJECTION, limit=1, cursor=cursor)
+            seen.extend(tasker["id"] for tasker in page)
+            if cursor is None:
+                return seen
+
+    assert run(scenario()) == ["a", "c", "b", "d"]
+
+
+def test_rebuild_backfills_stats_of_existing_taskers(run, db):
+    async def scenario():
+        await db.users.insert_one({"id": "old", "role": "tasker", "tasker_profile": None, "search": {"category_prices": {}}})
+        updated = await tasker_search.rebuild_tasker_search(db, only_missing=True)
+        return updated, (await db.users.find_one({"id": "old"}))["search"]
+
+    updated, search = run(scenario())
+    assert updated == 1
+    assert search["rating"] == 0
+    assert search["total_reviews"] == 0
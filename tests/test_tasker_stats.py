@@ -0,0 +1,55 @@
+import tasker_stats
+
+
+def test_rating_summary_reads_stored_aggregates(run, db):
+    run(db.users.insert_one({"id": "t1", "role": "tasker", "tasker_profile": {
+        "rating_sum": 14,
+        "total_reviews": 3,
+        "rating_distribution": {"4": 1, "5": 2},
+        "average_rating": 4.7,
+        "completed_tasks": 1,
+        "total_tasks": 2,
+    }}))
+    run(tasker_stats.record_task_completed(db, "t1"))
+
+    summary = run(tasker_stats.get_rating_summary(db, "t1"))
+
+    assert summary == {
+        "average_rating": 4.7,
+        "total_reviews": 3,
+        "rating_distribution": {1: 0, 2: 0, 3: 0, 4: 1, 5: 2},
+        "total_completed_tasks": 2,
+    }
+
+
+def test_rating_summary_of_new_or_missing_tasker(run, db):
+    run(db.users.insert_one({"id": "t1", "role": "tasker", "tasker_profile": None}))
+
+    assert run(tasker_stats.get_rating_summary(db, "t1"))["total_completed_tasks"] == 0
+    assert run(tasker_stats.get_rating_summary(db, "missing")) is None
+
+
+def test_retried_increment_counts_once(run, db):
+    run(db.users.insert_one({"id": "t1", "role": "tasker", "tasker_profile": None}))
+
+    run(tasker_stats.record_task_completed(db, "t1", op_id="m1"))
+    run(tasker_stats.record_task_completed(db, "t1", op_id="m1"))
+    run(tasker_stats.record_task_completed(db, "t1", op_id="m2"))
+    run(tasker_stats.record_task_assigned(db, "t1", op_id="m3"))
+    run(tasker_stats.record_task_assigned(db, "t1", op_id="m3"))
+
+    user = run(db.users.find_one({"id": "t1"}))
+    assert user["tasker_profile"]["completed_tasks"] == 2
+    assert user["search"]["completed_tasks"] == 2
+    assert user["tasker_profile"]["total_tasks"] == 1
+    assert user["stat_ops"] == ["m1", "m2", "m3"]
+
+
+def test_applied_op_ids_are_capped(run, db, monkeypatch):
+    monkeypatch.setattr(tasker_stats, "STAT_OPS_KEPT", 2)
+    run(db.users.insert_one({"id": "t1", "role": "tasker", "tasker_profile": None}))
+
+    for op_id in ("m1", "m2", "m3"):
+        run(tasker_stats.record_task_assigned(db, "t1", op_id=op_id))
+
+    assert run(db.users.find_one({"id": "t1"}))["stat_ops"] == ["m2", "m3"]
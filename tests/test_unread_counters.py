@@ -0,0 +1,50 @@
+from unread_counters import MESSAGES, NOTIFICATIONS, get_counts, increment, reconcile_unread_counters
+
+
+def test_reconcile_corrects_drifted_counters(run, db):
+    run(db.notifications.insert_many([
+        {"user_id": "u1", "is_read": False},
+        {"user_id": "u1", "is_read": True},
+        {"user_id": "u2", "is_read": False},
+    ]))
+    run(db.messages.insert_one({"receiver_id": "u1", "is_read": False}))
+    run(db.unread_counters.insert_one({"user_id": "u1", NOTIFICATIONS: 5, MESSAGES: -1}))
+
+    assert run(reconcile_unread_counters(db)) == 2
+    assert run(get_counts(db, "u1")) == {NOTIFICATIONS: 1, MESSAGES: 1}
+    assert run(get_counts(db, "u2")) == {NOTIFICATIONS: 1, MESSAGES: 0}
+    assert run(reconcile_unread_counters(db)) == 0
+
+
+def test_reconcile_keeps_increments_made_while_counting(run, db):
+    run(db.unread_counters.insert_one({"user_id": "u1", NOTIFICATIONS: 3}))
+    racing = _WriteWhileCounting(db, "u1")
+
+    assert run(reconcile_unread_counters(racing)) == 0
+    assert run(get_counts(db, "u1"))[NOTIFICATIONS] == 4
+
+
+class _WriteWhileCounting:
+    """Database whose first notifications count runs after a notification was created."""
+
+    def __init__(self, db, user_id):
+        self._db = db
+        self._user_id = user_id
+
+    def __getattr__(self, name):
+        collection = getattr(self._db, name)
+        if name != "notifications":
+            return collection
+        outer = self
+
+        class Notifications:
+            def __getattr__(self, attr):
+                return getattr(collection, attr)
+
+            async def aggregate(self, pipeline):
+                await collection.insert_one({"user_id": outer._user_id, "is_read": False})
+                await increment(outer._db, outer._user_id, NOTIFICATIONS)
+                async for row in collection.aggregate(pipeline):
+                    yield row
+
+        return Notifications()
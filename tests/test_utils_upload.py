@@ -0,0 +1,30 @@
+import io
+
+from fastapi import UploadFile
+from PIL import Image
+
+import utils
+
+
+def _upload(size, name="photo.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="PNG")
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename=name)
+
+
+def _saved(tmp_path, monkeypatch, run, upload):
+    (tmp_path / "tasks").mkdir()
+    monkeypatch.setattr(utils, "UPLOAD_DIR", tmp_path)
+    relative = run(utils.save_upload_file(upload, "tasks"))
+    return Image.open(tmp_path / "tasks" / relative.rsplit("/", 1)[-1])
+
+
+def test_oversized_image_is_resized(tmp_path, monkeypatch, run):
+    with _saved(tmp_path, monkeypatch, run, _upload((3000, 1500))) as image:
+        assert image.size == (2000, 1000)
+
+
+def test_small_image_keeps_its_size(tmp_path, monkeypatch, run):
+    with _saved(tmp_path, monkeypatch, run, _upload((640, 480))) as image:
+        assert image.size == (640, 480)